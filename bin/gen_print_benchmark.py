@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+r"""
+See help text for details.
+"""
+
+import sys
+
+save_dir_path = sys.path.pop(0)
+
+modules = ['gen_arg', 'gen_print', 'gen_valid']
+for module in modules:
+    exec("from " + module + " import *")
+
+sys.path.insert(0, save_dir_path)
+
+import timeit
+
+parser = argparse.ArgumentParser(
+    usage='%(prog)s [OPTIONS]',
+    description="%(prog)s will measure the per-call cost of the gen_print stack introspection functions "
+                + "(get_stack_var, get_arg_name, sprint_var, sprint_executing, sprint_call_stack) when "
+                + "called from a call stack of the given depth.",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    prefix_chars='-+')
+parser.add_argument(
+    '--iterations',
+    default=2000,
+    type=int,
+    help='The number of calls to time for each function.')
+parser.add_argument(
+    '--stack_depth',
+    default=30,
+    type=int,
+    help='The number of additional stack frames from which each function is to be called.  Robot keyword '
+         + 'calls typically run 30 or more frames deep.')
+
+
+# Populate stock_list with options we want.
+stock_list = [("test_mode", 0), ("quiet", 0), ("debug", 0)]
+
+
+def time_func(func, iterations):
+    r"""
+    Return the average number of microseconds taken by a call to func.
+
+    Description of argument(s):
+    func                            The function to be timed.
+    iterations                      The number of calls to time.
+    """
+
+    return timeit.timeit(func, number=iterations) / iterations * 1000000
+
+
+def run_at_depth(depth, func):
+    r"""
+    Call func from a call stack which is depth frames deeper than the caller's.
+
+    Description of argument(s):
+    depth                           The number of stack frames to add.
+    func                            The function to be called.
+    """
+
+    if depth > 0:
+        return run_at_depth(depth - 1, func)
+    return func()
+
+
+def benchmark(iterations):
+    r"""
+    Time each introspection function and return a dictionary of microseconds per call.
+
+    Description of argument(s):
+    iterations                      The number of calls to time for each function.
+    """
+
+    bench_var = "value"
+
+    def get_stack_var_bench():
+        # The variable is not defined anywhere in the stack so that the whole stack is searched, as is the
+        # case for shell_cmd's quiet lookup.
+        return get_stack_var('no_such_var_xyz', 0)
+
+    def get_arg_name_bench():
+        return get_arg_name(0, 1, 1)
+
+    def sprint_var_bench():
+        return sprint_var(bench_var)
+
+    def sprint_executing_bench():
+        return sprint_executing()
+
+    def sprint_call_stack_bench():
+        return sprint_call_stack()
+
+    results = collections.OrderedDict()
+    results['get_stack_var'] = time_func(get_stack_var_bench, iterations)
+    results['get_arg_name'] = time_func(get_arg_name_bench, iterations)
+    results['sprint_var'] = time_func(sprint_var_bench, iterations)
+    results['sprint_executing'] = time_func(sprint_executing_bench, iterations)
+    results['sprint_call_stack'] = time_func(sprint_call_stack_bench, max(iterations // 10, 1))
+    return results
+
+
+def main():
+    gen_setup()
+    usec_per_call = run_at_depth(stack_depth, lambda: benchmark(iterations))
+    print_vars(iterations, stack_depth)
+    print_var(usec_per_call)
+
+
+main()
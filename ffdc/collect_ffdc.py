@@ -6,6 +6,7 @@ CLI FFDC Collector.
 
 import os
 import sys
+import time
 import click
 
 # ---------Set sys.path for cli command execution---------------------------------------
@@ -19,6 +20,7 @@ for root, dirs, files in os.walk(full_path):
         sys.path.append(os.path.join(root, found_dir))
 
 from ffdc_collector import ffdc_collector
+from ffdc_multi_collector import load_inventory, inventory_ok, collect_ffdc_multi, format_summary
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -26,8 +28,8 @@ from ffdc_collector import ffdc_collector
               help="Hostname/IP of the remote host")
 @click.option('-u', '--username',
               help="Username of the remote host.")
-@click.option('-p', '--password',
-              help="Password of the remote host.")
+@click.option('-p', '--password', envvar='FFDC_PASSWORD',
+              help="Password of the remote host.  Default: the FFDC_PASSWORD environment variable.")
 @click.option('-c', '--config', default=abs_path + "/ffdc_config.yaml",
               show_default=True, help="YAML Configuration file for log collection.")
 @click.option('-l', '--location', default="/tmp",
@@ -44,6 +46,27 @@ from ffdc_collector import ffdc_collector
 @click.option('--log_level', default="INFO",
               show_default=True,
               help="Log level (CRITICAL, ERROR, WARNING, INFO, DEBUG)")
+@click.option('--parallel_channels', default=1,
+              show_default=True,
+              help="Number of SSH channels used to run commands concurrently.")
+@click.option('--bulk_copy', is_flag=True, default=False,
+              help="Copy files through a single tar stream instead of one SCP session per file.")
+@click.option('--incremental', default='none',
+              type=click.Choice(['none', 'mtime', 'sha256'], case_sensitive=False),
+              show_default=True,
+              help="Re-use files collected by the prior run when unchanged (by size and mtime, or also by"
+                   " remote sha256) and copy only the new tail of grown append-only files.")
+@click.option('--inventory',
+              help="YAML or CSV file listing remote hosts to collect from concurrently."
+                   " Fields: hostname, username, password, type."
+                   " Missing fields default to the -u, -p and -t options.")
+@click.option('--max_workers', default=4,
+              show_default=True,
+              help="Maximum number of inventory hosts to collect from at the same time.")
+@click.option('--max_ssh_sessions', default=0,
+              show_default=True,
+              help="Maximum number of SSH sessions open at the same time across inventory hosts."
+                   " 0 means no limit.")
 def cli_ffdc(remote,
              username,
              password,
@@ -53,14 +76,24 @@ def cli_ffdc(remote,
              protocol,
              env_vars,
              econfig,
-             log_level):
+             log_level,
+             parallel_channels,
+             bulk_copy,
+             incremental,
+             inventory,
+             max_workers,
+             max_ssh_sessions):
     r"""
     Stand alone CLI to generate and collect FFDC from the selected target.
     """
 
     click.echo("\n********** FFDC (First Failure Data Collection) Starts **********")
 
-    if input_options_ok(remote, username, password, config, type):
+    if inventory:
+        cli_ffdc_multi(inventory, username, password, config, location, type, protocol, env_vars,
+                       econfig, log_level, parallel_channels, bulk_copy, incremental, max_workers,
+                       max_ssh_sessions)
+    elif input_options_ok(remote, username, password, config, type):
         this_ffdc = ffdc_collector(remote,
                                    username,
                                    password,
@@ -70,7 +103,10 @@ def cli_ffdc(remote,
                                    protocol,
                                    env_vars,
                                    econfig,
-                                   log_level)
+                                   log_level,
+                                   parallel_channels,
+                                   bulk_copy,
+                                   incremental)
         this_ffdc.collect_ffdc()
 
         if len(os.listdir(this_ffdc.ffdc_dir_path)) == 0:
@@ -84,6 +120,50 @@ def cli_ffdc(remote,
     click.echo("\n********** FFDC Finishes **********\n\n")
 
 
+def cli_ffdc_multi(inventory,
+                   username,
+                   password,
+                   config,
+                   location,
+                   type,
+                   protocol,
+                   env_vars,
+                   econfig,
+                   log_level,
+                   parallel_channels,
+                   bulk_copy,
+                   incremental,
+                   max_workers,
+                   max_ssh_sessions):
+    r"""
+    Collect FFDC from every host listed in the inventory file and print a consolidated summary.
+    """
+
+    if not os.path.isfile(inventory):
+        print("\
+        \n\tERROR: Inventory file %s is not found.  Please verify path and filename." % inventory)
+        return
+    if not os.path.isfile(config):
+        print("\
+        \n\tERROR: Config file %s is not found.  Please verify path and filename." % config)
+        return
+
+    host_list = load_inventory(inventory, username, password, type)
+    if not inventory_ok(host_list):
+        return
+
+    start_time = time.time()
+    results = collect_ffdc_multi(host_list, config, location, protocol, env_vars, econfig, log_level,
+                                 parallel_channels, bulk_copy, incremental, max_workers, max_ssh_sessions)
+
+    click.echo("\n" + format_summary(results) + "\n")
+    failed_count = len([result for result in results if result['status'] != 'OK'])
+    click.echo("\tFFDC Collection from %d of %d hosts has succeeded."
+               % (len(results) - failed_count, len(results)))
+    click.echo("\tTotal elapsed time " + time.strftime("%H:%M:%S", time.gmtime(time.time() - start_time))
+               + "\n\n")
+
+
 def input_options_ok(remote, username, password, config, type):
     r"""
     Verify script options exist via CLI options or environment variables.
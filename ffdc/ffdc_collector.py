@@ -13,6 +13,7 @@ import time
 import logging
 import platform
 from errno import EACCES, EPERM
+import shutil
 import subprocess
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,6 +24,8 @@ for root, dirs, files in os.walk(script_dir):
         sys.path.append(os.path.join(root, dir))
 
 from ssh_utility import SSHRemoteclient
+from ffdc_manifest import FFDCManifest
+from ffdc_plan import load_ffdc_plan, FFDCTemplate
 from telnet_utility import TelnetRemoteclient
 
 r"""
@@ -114,6 +117,9 @@ class ffdc_collector:
 
     """
 
+    # Output redirection targets in a shell command, e.g. '/tmp/x' in 'dmesg >>/tmp/x 2>&1'.
+    redirect_regex = re.compile(r'(?<![0-9&>])>>?\s*([^\s&;|>]+)')
+
     def __init__(self,
                  hostname,
                  username,
@@ -124,7 +130,11 @@ class ffdc_collector:
                  remote_protocol,
                  env_vars,
                  econfig,
-                 log_level):
+                 log_level,
+                 parallel_channels=1,
+                 bulk_copy=False,
+                 incremental='none',
+                 manifest_dir=None):
         r"""
         Description of argument(s):
 
@@ -137,6 +147,21 @@ class ffdc_collector:
         remote_protocol     Protocol to use to collect data
         env_vars            User define CLI env vars '{"key : "value"}'
         econfig             User define env vars YAML file
+        log_level           Log level (CRITICAL, ERROR, WARNING, INFO, DEBUG)
+        parallel_channels   Number of SSH channels used to run COMMANDS concurrently.
+                            1 runs the commands serially.
+        bulk_copy           If True, FILES and SCP groups are copied through a single
+                            tar stream per section instead of one SCP session per file.
+        incremental         Incremental collection mode.  Files already collected by a prior
+                            run are hard-linked from it instead of being copied again.
+                            none    - Copy every file.
+                            mtime   - Re-use files whose size and mtime are unchanged.
+                            sha256  - As mtime and also re-use files whose size is unchanged
+                                      and whose remote sha256 matches.
+                            In both incremental modes, a file which has only grown since the
+                            prior run has just its new tail copied.
+        manifest_dir        The directory holding the incremental manifest.  It must be the same
+                            for every run of the host.  Defaults to <location>/<remote_type>.
 
         """
 
@@ -153,9 +178,21 @@ class ffdc_collector:
         self.remote_protocol = remote_protocol.upper()
         self.env_vars = env_vars
         self.econfig = econfig
+        self.parallel_channels = int(parallel_channels)
+        self.bulk_copy = bulk_copy
+        self.incremental = str(incremental or 'none').lower()
+        self.manifest = None
         self.start_time = 0
         self.elapsed_time = ''
         self.logger = None
+        # Run accounting, e.g. for the multi-host summary.
+        self.verified_protocols = []
+        self.commands_ok = 0
+        self.commands_failed = 0
+        # Optional semaphore (e.g. multiprocessing.Semaphore) which caps the number of SSH sessions open
+        # across several collectors.  It is acquired for as long as this collector's SSH session is open.
+        self.ssh_session_semaphore = None
+        self.ssh_session_acquired = False
 
         # Set prefix values for scp files and directory.
         # Since the time stamp is at second granularity, these values are set here
@@ -170,14 +207,15 @@ class ffdc_collector:
         # Verify top level directory exists for storage
         self.validate_local_store(self.location)
 
+        if self.incremental != 'none':
+            # One manifest per host, by default next to the host's collection directories.
+            manifest_dir = manifest_dir or self.location
+            self.validate_local_store(manifest_dir)
+            self.manifest = FFDCManifest(manifest_dir + "/" + self.hostname + "_manifest.json")
+
         if self.verify_script_env():
             # Load default or user define YAML configuration file.
-            with open(self.ffdc_config, 'r') as file:
-                try:
-                    self.ffdc_actions = yaml.load(file, Loader=yaml.SafeLoader)
-                except yaml.YAMLError as e:
-                    self.logger.error(e)
-                    sys.exit(-1)
+            self.load_plan()
 
             if self.target_type not in self.ffdc_actions.keys():
                 self.logger.error(
@@ -191,6 +229,43 @@ class ffdc_collector:
         self.env_dict = {}
         self.load_env()
 
+    def load_plan(self):
+        r"""
+        Load the compiled plan of the YAML configuration file and exit if the file has errors.
+
+        """
+
+        try:
+            self.ffdc_plan = load_ffdc_plan(self.ffdc_config)
+        except yaml.YAMLError as e:
+            self.logger.error(e)
+            sys.exit(-1)
+        for warning in self.ffdc_plan.warnings:
+            self.logger.warning("\t[WARN] %s: %s" % (self.ffdc_config, warning))
+        if self.ffdc_plan.errors:
+            for error in self.ffdc_plan.errors:
+                self.logger.error("\tERROR: %s: %s" % (self.ffdc_config, error))
+            sys.exit(-1)
+        for func_path in self.ffdc_plan.resolve_plugins(self.resolve_plugin_func):
+            self.logger.warning("\t[WARN] %s: plugin function %s is not available."
+                                % (self.ffdc_config, func_path))
+        self.ffdc_actions = self.ffdc_plan.config
+
+    @staticmethod
+    def resolve_plugin_func(func_path):
+        r"""
+        Return the plugin function with the given dotted path or None if there is no such function.
+
+        Description of argument(s):
+        func_path           Plugin function path (e.g. 'plugin.redfish.enumerate_request').
+        """
+
+        names = func_path.split('.')
+        func = globals().get(names[0])
+        for name in names[1:]:
+            func = getattr(func, name, None)
+        return func if callable(func) else None
+
     def verify_script_env(self):
 
         # Import to log version
@@ -275,6 +350,7 @@ class ffdc_collector:
         self.logger.info("\n\t %s protocol type: %s" % (self.target_type, check_protocol_list))
 
         verified_working_protocol = self.verify_protocol(check_protocol_list)
+        self.verified_protocols = verified_working_protocol
 
         if verified_working_protocol:
             self.logger.info("\n\t---- Completed protocol pre-requisite check ----\n")
@@ -297,6 +373,10 @@ class ffdc_collector:
 
         """
 
+        if self.ssh_session_semaphore is not None and not self.ssh_session_acquired:
+            self.ssh_session_semaphore.acquire()
+            self.ssh_session_acquired = True
+
         self.ssh_remoteclient = SSHRemoteclient(self.hostname,
                                                 self.username,
                                                 self.password)
@@ -311,8 +391,19 @@ class ffdc_collector:
             return True
         else:
             self.logger.info("\n\t[Check] %s SSH connection.\t [NOT AVAILABLE]" % self.hostname)
+            self.release_ssh_session()
             return False
 
+    def release_ssh_session(self):
+        r"""
+        Release this collector's slot in ssh_session_semaphore, if it holds one.
+
+        """
+
+        if self.ssh_session_acquired:
+            self.ssh_session_acquired = False
+            self.ssh_session_semaphore.release()
+
     def telnet_to_target_system(self):
         r"""
         Open a telnet connection to targeted system.
@@ -371,8 +462,28 @@ class ffdc_collector:
         self.elapsed_time = time.strftime("%H:%M:%S", time.gmtime(time.time() - self.start_time))
         if self.ssh_remoteclient:
             self.ssh_remoteclient.ssh_remoteclient_disconnect()
+            self.release_ssh_session()
         if self.telnet_remoteclient:
             self.telnet_remoteclient.tn_remoteclient_disconnect()
+        self.close_plugin_sessions()
+
+    def close_plugin_sessions(self):
+        r"""
+        Close the sessions which plugins (e.g. plugin.redfish_session) hold open to this host.
+
+        Plugins must not rely on atexit for this since multi-host worker processes exit without running
+        atexit handlers.
+        """
+
+        plugin_package = globals().get('plugin')
+        for name, module in list(vars(plugin_package).items()) if plugin_package else []:
+            close_sessions = getattr(module, 'close_sessions', None)
+            if name.startswith('_') or not callable(close_sessions):
+                continue
+            try:
+                close_sessions(self.hostname)
+            except Exception as e:
+                self.logger.warning("\t[WARN] plugin.%s.close_sessions failed: %s" % (name, e))
 
     def protocol_ssh(self,
                      protocol,
@@ -469,6 +580,10 @@ class ffdc_collector:
 
             if not plugin_call:
                 result = self.run_tool_cmd(each_cmd)
+            if result == 'PLUGIN_EVAL_ERROR':
+                self.commands_failed += 1
+            else:
+                self.commands_ok += 1
             if result:
                 try:
                     file_name = self.get_file_list(self.ffdc_actions[target_type][sub_type])[index]
@@ -592,6 +707,10 @@ class ffdc_collector:
         if not list_of_commands:
             return
 
+        if self.parallel_channels > 1:
+            self.ssh_execute_ffdc_commands_parallel(list_of_commands, form_filename)
+            return
+
         progress_counter = 0
         for command in list_of_commands:
             command_txt, command_timeout = self.unpack_command(command)
@@ -603,15 +722,102 @@ class ffdc_collector:
                 self.ssh_remoteclient.execute_command(command_txt, command_timeout)
 
             if cmd_exit_code:
+                self.commands_failed += 1
                 self.logger.warning(
                     "\n\t\t[WARN] %s exits with code %s." % (command_txt, str(cmd_exit_code)))
                 self.logger.warning("\t\t[WARN] %s " % err)
+            else:
+                self.commands_ok += 1
 
             progress_counter += 1
             self.print_progress(progress_counter)
 
         self.logger.info("\n\t[Run] Commands execution completed.\t\t [OK]")
 
+    def ssh_execute_ffdc_commands_parallel(self,
+                                           list_of_commands,
+                                           form_filename=False):
+        r"""
+        Send commands to targeted system over several SSH channels at once.
+
+        See schedule_commands for how the commands are ordered.
+
+        Description of argument(s):
+        list_of_commands                 commands from the configuration file.
+        form_filename                    if true, pre-pend self.target_type to filename
+        """
+
+        unpacked_commands = []
+        for command in list_of_commands:
+            command_txt, command_timeout = self.unpack_command(command)
+            if form_filename:
+                command_txt = str(command_txt % self.target_type)
+            unpacked_commands.append((command_txt, command_timeout))
+
+        progress_counter = 0
+        for command_groups in self.schedule_commands(unpacked_commands):
+            for command_txt, command_timeout, result in \
+                    self.ssh_remoteclient.execute_commands_parallel(command_groups,
+                                                                    self.parallel_channels):
+                cmd_exit_code, err, response = result
+                if cmd_exit_code:
+                    self.commands_failed += 1
+                    self.logger.warning(
+                        "\n\t\t[WARN] %s exits with code %s." % (command_txt, str(cmd_exit_code)))
+                    self.logger.warning("\t\t[WARN] %s " % err)
+                else:
+                    self.commands_ok += 1
+
+                progress_counter += 1
+                self.print_progress(progress_counter)
+
+        self.logger.info("\n\t[Run] Commands execution completed.\t\t [OK]")
+
+    def schedule_commands(self,
+                          unpacked_commands):
+        r"""
+        Split commands into stages of independent command groups and return the list of stages.
+
+        Commands which redirect output to the same file are put in the same group so that they keep their
+        order.  A command with no output redirection (e.g. 'rm -rf /tmp/*BMC_*' or 'fanctl dump') may have
+        side effects that other commands depend on, so it runs alone in its own stage, after everything
+        that precedes it and before everything that follows it.
+
+        Example:
+        ['rm -rf /tmp/x*', 'echo a >> /tmp/x1', 'cat b >> /tmp/x1', 'dmesg > /tmp/x2']
+        becomes
+        [[['rm -rf /tmp/x*']], [['echo a >> /tmp/x1', 'cat b >> /tmp/x1'], ['dmesg > /tmp/x2']]]
+
+        Description of argument(s):
+        unpacked_commands                A list of (command, timeout) tuples.
+        """
+
+        stages = []
+        groups = []
+        group_by_file = {}
+        for command in unpacked_commands:
+            output_files = set(self.redirect_regex.findall(command[0]))
+            owning_groups = set(group_by_file[f] for f in output_files if f in group_by_file)
+            if not output_files or len(owning_groups) > 1:
+                # Barrier: close the current stage and run this command alone.
+                if groups:
+                    stages.append(groups)
+                stages.append([[command]])
+                groups = []
+                group_by_file = {}
+                continue
+            if owning_groups:
+                group_ix = owning_groups.pop()
+            else:
+                group_ix = len(groups)
+                groups.append([])
+            groups[group_ix].append(command)
+            for f in output_files:
+                group_by_file[f] = group_ix
+        if groups:
+            stages.append(groups)
+        return stages
+
     def group_copy(self,
                    ffdc_actions_for_target_type):
         r"""
@@ -629,6 +835,9 @@ class ffdc_collector:
             if not list_of_commands:
                 return
 
+            if self.bulk_copy and self.group_bulk_copy(list_of_commands):
+                return
+
             for command in list_of_commands:
                 try:
                     command = self.yaml_env_and_plugin_vars_populate(command)
@@ -642,9 +851,13 @@ class ffdc_collector:
                 # If file does not exist, code take no action.
                 # cmd_exit_code is ignored for this scenario.
                 if response:
-                    scp_result = \
-                        self.ssh_remoteclient.scp_file_from_remote(response.split('\n'),
-                                                                   self.ffdc_dir_path)
+                    if self.manifest:
+                        scp_result = any(self.incremental_copy(
+                            [(path, self.ffdc_dir_path) for path in response.split('\n') if path]))
+                    else:
+                        scp_result = \
+                            self.ssh_remoteclient.scp_file_from_remote(response.split('\n'),
+                                                                       self.ffdc_dir_path)
                     if scp_result:
                         self.logger.info("\t\tSuccessfully copied from " + self.hostname + ':' + command)
                 else:
@@ -653,6 +866,40 @@ class ffdc_collector:
         else:
             self.logger.info("\n\n\tSkip copying files from remote system %s.\n" % self.hostname)
 
+    def group_bulk_copy(self,
+                        list_of_commands):
+        r"""
+        Copy the files listed by a group of 'ls' commands through a single tar stream.
+
+        Return False, without copying anything, if any command is not a plain 'ls' listing (the caller
+        should then fall back to group_copy's per-command processing).
+
+        Description of argument(s):
+        list_of_commands    'ls' commands (e.g. 'ls -AX /var/lib/systemd/coredump/core.*').
+        """
+
+        commands = []
+        sources = []
+        for command in list_of_commands:
+            try:
+                command = self.yaml_env_and_plugin_vars_populate(command)
+            except IndexError:
+                return False
+            words = command.split()
+            if not words or words[0] != 'ls' or any(c in command for c in '|;&<>$`'):
+                return False
+            patterns = [word for word in words[1:] if not word.startswith('-')]
+            commands.append((command, len(sources), len(patterns)))
+            sources += [(pattern, self.ffdc_dir_path) for pattern in patterns]
+
+        copied = self.ssh_remoteclient.tar_files_from_remote(sources)
+        for command, first_ix, num_patterns in commands:
+            if any(copied[first_ix:first_ix + num_patterns]):
+                self.logger.info("\t\tSuccessfully copied from " + self.hostname + ':' + command)
+            else:
+                self.logger.info("\t\t%s has no result" % command)
+        return True
+
     def scp_ffdc(self,
                  targ_dir_path,
                  targ_file_prefix,
@@ -670,7 +917,7 @@ class ffdc_collector:
 
         """
 
-        progress_counter = 0
+        sources = []
         for filename in file_list:
             if form_filename:
                 filename = str(filename % self.target_type)
@@ -679,7 +926,21 @@ class ffdc_collector:
 
             # If source file name contains wild card, copy filename as is.
             if '*' in source_file_path:
-                scp_result = self.ssh_remoteclient.scp_file_from_remote(source_file_path, self.ffdc_dir_path)
+                sources.append((source_file_path, self.ffdc_dir_path))
+            else:
+                sources.append((source_file_path, targ_file_path))
+
+        if self.manifest:
+            scp_results = self.incremental_copy(sources)
+        elif self.bulk_copy:
+            scp_results = self.ssh_remoteclient.tar_files_from_remote(sources)
+        else:
+            scp_results = None
+
+        progress_counter = 0
+        for source_ix, (source_file_path, targ_file_path) in enumerate(sources):
+            if scp_results is not None:
+                scp_result = scp_results[source_ix]
             else:
                 scp_result = self.ssh_remoteclient.scp_file_from_remote(source_file_path, targ_file_path)
 
@@ -694,6 +955,90 @@ class ffdc_collector:
                 progress_counter += 1
                 self.print_progress(progress_counter)
 
+    def incremental_copy(self,
+                         sources):
+        r"""
+        Copy files from the remote host, re-using the copies made by prior collections wherever possible.
+
+        Each remote file is compared with its manifest entry:
+        - A file whose size and mtime are unchanged (or, in sha256 mode, whose size and remote sha256 are
+          unchanged) is hard-linked from the prior collection.
+        - A file which has grown and whose leading bytes still hash to the prior sha256 (i.e. an append-only
+          log) gets the prior copy plus only the new tail bytes.
+        - Any other file is copied in full.
+
+        Return a list with one boolean per source indicating whether anything was copied for it.
+
+        Description of argument(s):
+        sources         A list of (remote_path, local_path) tuples.  remote_path may contain shell
+                        wildcards.  If local_path is a directory, each remote file is stored in it under its
+                        own name.
+        """
+
+        stat_results = self.ssh_remoteclient.stat_remote_files([source for source, local in sources])
+        if stat_results is None:
+            self.logger.warning("\n\t[WARN] Remote stat failed.  Copying all files.")
+            return [self.ssh_remoteclient.scp_file_from_remote(source, local) for source, local in sources]
+
+        copied = [False] * len(sources)
+        full_copies = []
+        linked = appended = appended_bytes = 0
+        for source_ix, (source, local) in enumerate(sources):
+            for remote_file in stat_results[source_ix]:
+                remote_path = remote_file['path']
+                local_path = local
+                if os.path.isdir(local):
+                    local_path = os.path.join(local, os.path.basename(remote_path))
+                prior = self.manifest.lookup(remote_path) if remote_file['regular'] else None
+                if prior is None or prior['local_path'] == local_path:
+                    full_copies.append((source_ix, remote_file, local_path))
+                    continue
+
+                if prior['size'] == remote_file['size'] \
+                        and (prior['mtime'] == remote_file['mtime']
+                             or (self.incremental == 'sha256'
+                                 and self.ssh_remoteclient.remote_sha256(remote_path) == prior['sha256'])):
+                    FFDCManifest.link_file(prior['local_path'], local_path)
+                    self.manifest.update(remote_path, remote_file['size'], remote_file['mtime'], local_path,
+                                         prior['sha256'])
+                    linked += 1
+                    copied[source_ix] = True
+                    continue
+
+                if prior['size'] < remote_file['size'] and \
+                        self.ssh_remoteclient.remote_sha256(remote_path, prior['size']) == prior['sha256']:
+                    shutil.copyfile(prior['local_path'], local_path)
+                    num_bytes = self.ssh_remoteclient.append_remote_file_tail(remote_path, prior['size'],
+                                                                              local_path)
+                    if num_bytes is not None:
+                        self.manifest.update(remote_path, prior['size'] + num_bytes, remote_file['mtime'],
+                                             local_path)
+                        appended += 1
+                        appended_bytes += num_bytes
+                        copied[source_ix] = True
+                        continue
+
+                full_copies.append((source_ix, remote_file, local_path))
+
+        if self.bulk_copy and full_copies:
+            full_results = self.ssh_remoteclient.tar_files_from_remote(
+                [(remote_file['path'], local_path) for source_ix, remote_file, local_path in full_copies])
+        else:
+            full_results = [self.ssh_remoteclient.scp_file_from_remote(remote_file['path'], local_path)
+                            for source_ix, remote_file, local_path in full_copies]
+        for (source_ix, remote_file, local_path), result in zip(full_copies, full_results):
+            if not result:
+                continue
+            copied[source_ix] = True
+            if remote_file['regular'] and os.path.isfile(local_path):
+                self.manifest.update(remote_file['path'], os.path.getsize(local_path), remote_file['mtime'],
+                                     local_path)
+
+        self.manifest.save()
+        self.logger.info("\t\tIncremental copy: %d linked, %d appended (%d bytes), %d copied in full."
+                         % (linked, appended, appended_bytes, len(full_copies)))
+        return copied
+
     def set_ffdc_default_store_path(self):
         r"""
         Set a default value for self.ffdc_dir_path and self.ffdc_prefix.
@@ -898,27 +1243,30 @@ class ffdc_collector:
 
         self.logger.info(json.dumps(mask_dict, indent=8, sort_keys=False))
 
-    def execute_python_eval(self, eval_string):
+    def execute_plugin_func(self, plugin_call, args):
         r"""
-        Execute qualified python function string using eval.
+        Call the plugin function and return its result.
 
         Description of argument(s):
-        eval_string        Execute the python object.
+        plugin_call        The compiled plugin block (see ffdc_plan.FFDCPluginCall).
+        args               The list of arguments for the function.
 
         Example:
-                eval(plugin.foo_func.foo_func(10))
+                plugin.foo_func.foo_func(10)
         """
         try:
             self.logger.info("\tExecuting plugin func()")
-            self.logger.debug("\tCall func: %s" % eval_string)
-            result = eval(eval_string)
+            self.logger.debug("\tCall func: %s" % plugin_call.func_path)
+            if plugin_call.func is None:
+                raise NameError("plugin function %s is not available" % plugin_call.func_path)
+            result = plugin_call.func(*args)
             self.logger.info("\treturn: %s" % str(result))
         except (ValueError,
                 SyntaxError,
                 NameError,
                 AttributeError,
                 TypeError) as e:
-            self.logger.error("\tERROR: execute_python_eval: %s" % e)
+            self.logger.error("\tERROR: execute_plugin_func: %s" % e)
             # Set the plugin error state.
             plugin_error_dict['exit_on_error'] = True
             self.logger.info("\treturn: PLUGIN_EVAL_ERROR")
@@ -928,7 +1276,7 @@ class ffdc_collector:
 
     def execute_plugin_block(self, plugin_cmd_list):
         r"""
-        Pack the plugin command to qualifed python string object.
+        Execute a plugin block using its compiled form from the plan.
 
         Description of argument(s):
         plugin_list_dict      Plugin block read from YAML
@@ -954,77 +1302,49 @@ class ffdc_collector:
                 - arg1
                 - arg2
         """
+        resp = 'PLUGIN_EVAL_ERROR'
         try:
-            idx = self.key_index_list_dict('plugin_name', plugin_cmd_list)
-            plugin_name = plugin_cmd_list[idx]['plugin_name']
-            # Equal separator means plugin function returns result.
-            if ' = ' in plugin_name:
-                # Ex. ['result', 'plugin.foo_func.my_func']
-                plugin_name_args = plugin_name.split(' = ')
-                # plugin func return data.
-                for arg in plugin_name_args:
-                    if arg == plugin_name_args[-1]:
-                        plugin_name = arg
-                    else:
-                        plugin_resp = arg.split(',')
-                        # ['result1','result2']
-                        for x in plugin_resp:
-                            global_plugin_list.append(x)
-                            global_plugin_dict[x] = ""
-
-            # Walk the plugin args ['arg1,'arg2']
-            # If the YAML plugin statement 'plugin_args' is not declared.
-            if any('plugin_args' in d for d in plugin_cmd_list):
-                idx = self.key_index_list_dict('plugin_args', plugin_cmd_list)
-                plugin_args = plugin_cmd_list[idx]['plugin_args']
-                if plugin_args:
-                    plugin_args = self.yaml_args_populate(plugin_args)
-                else:
-                    plugin_args = []
-            else:
-                plugin_args = self.yaml_args_populate([])
+            plugin_call = self.ffdc_plan.plugin_call(plugin_cmd_list)
+            if plugin_call is None:
+                raise ValueError("invalid plugin block %s" % plugin_cmd_list)
 
-            # Pack the args arg1, arg2, .... argn into
-            # "arg1","arg2","argn"  string as params for function.
-            parm_args_str = self.yaml_args_string(plugin_args)
-            if parm_args_str:
-                plugin_func = plugin_name + '(' + parm_args_str + ')'
-            else:
-                plugin_func = plugin_name + '()'
+            # Plugin func return data, e.g. ['result1','result2'].
+            for var in plugin_call.return_vars:
+                global_plugin_list.append(var)
+                global_plugin_dict[var] = ""
+
+            # Fill in the env and plugin vars of the args ['arg1,'arg2'].
+            plugin_args = [self.render_template(arg) if isinstance(arg, FFDCTemplate) else arg
+                           for arg in plugin_call.args]
 
             # Execute plugin function.
-            if global_plugin_dict:
-                resp = self.execute_python_eval(plugin_func)
-                # Update plugin vars dict if there is any.
-                if resp != 'PLUGIN_EVAL_ERROR':
-                    self.response_args_data(resp)
-            else:
-                resp = self.execute_python_eval(plugin_func)
+            resp = self.execute_plugin_func(plugin_call, self.plugin_func_args(plugin_args))
+            # Update plugin vars dict if there is any.
+            if global_plugin_dict and resp != 'PLUGIN_EVAL_ERROR':
+                self.response_args_data(resp)
         except Exception as e:
             # Set the plugin error state.
             plugin_error_dict['exit_on_error'] = True
             self.logger.error("\tERROR: execute_plugin_block: %s" % e)
-            pass
+            return 'PLUGIN_EVAL_ERROR'
 
         # There is a real error executing the plugin function.
         if resp == 'PLUGIN_EVAL_ERROR':
             return resp
 
         # Check if plugin_expects_return (int, string, list,dict etc)
-        if any('plugin_expects_return' in d for d in plugin_cmd_list):
-            idx = self.key_index_list_dict('plugin_expects_return', plugin_cmd_list)
-            plugin_expects = plugin_cmd_list[idx]['plugin_expects_return']
-            if plugin_expects:
-                if resp:
-                    if self.plugin_expect_type(plugin_expects, resp) == 'INVALID':
-                        self.logger.error("\tWARN: Plugin error check skipped")
-                    elif not self.plugin_expect_type(plugin_expects, resp):
-                        self.logger.error("\tERROR: Plugin expects return data: %s"
-                                          % plugin_expects)
-                        plugin_error_dict['exit_on_error'] = True
-                elif not resp:
-                    self.logger.error("\tERROR: Plugin func failed to return data")
+        plugin_expects = plugin_call.expects_return
+        if plugin_expects:
+            if resp:
+                if self.plugin_expect_type(plugin_expects, resp) == 'INVALID':
+                    self.logger.error("\tWARN: Plugin error check skipped")
+                elif not self.plugin_expect_type(plugin_expects, resp):
+                    self.logger.error("\tERROR: Plugin expects return data: %s"
+                                      % plugin_expects)
                     plugin_error_dict['exit_on_error'] = True
+            elif not resp:
+                self.logger.error("\tERROR: Plugin func failed to return data")
+                plugin_error_dict['exit_on_error'] = True
 
         return resp
 
@@ -1079,57 +1399,39 @@ class ffdc_collector:
         # clear all the list element for next plugin block execute.
         global_plugin_list.clear()
 
-    def yaml_args_string(self, plugin_args):
+    def plugin_func_args(self, plugin_args):
         r"""
-        Pack the args into string.
+        Return the list of arguments to be passed to a plugin function.
+
+        Empty arguments are omitted.  An argument naming a plugin var whose value is a list or dict is
+        replaced by that value.
 
         plugin_args            arg list ['arg1','arg2,'argn']
         """
-        args_str = ''
-        for args in plugin_args:
-            if args:
-                if isinstance(args, (int, float)):
-                    args_str += str(args)
-                elif args in global_plugin_type_list:
-                    args_str += str(global_plugin_dict[args])
+        func_args = []
+        for arg in plugin_args:
+            if not arg:
+                continue
+            if isinstance(arg, str):
+                if arg in global_plugin_type_list:
+                    func_args.append(global_plugin_dict[arg])
                 else:
-                    args_str += '"' + str(args.strip('\r\n\t')) + '"'
-            # Skip last list element.
-            if args != plugin_args[-1]:
-                args_str += ","
-        return args_str
+                    func_args.append(arg.strip('\r\n\t'))
+            else:
+                func_args.append(arg)
+        return func_args
 
-    def yaml_args_populate(self, yaml_arg_list):
+    def render_template(self, template):
         r"""
-        Decode env and plugin vars and populate.
+        Return the string of a compiled template with its env and plugin vars filled in.
 
         Description of argument(s):
-        yaml_arg_list         arg list read from YAML
-
-        Example:
-          - plugin_args:
-            - arg1
-            - arg2
-
-                  yaml_arg_list:  [arg2, arg2]
+        template             ffdc_plan.FFDCTemplate object.
         """
-        # Get the env loaded keys as list ['hostname', 'username', 'password'].
-        env_vars_list = list(self.env_dict)
-
-        if isinstance(yaml_arg_list, list):
-            tmp_list = []
-            for arg in yaml_arg_list:
-                if isinstance(arg, (int, float)):
-                    tmp_list.append(arg)
-                    continue
-                elif isinstance(arg, str):
-                    arg_str = self.yaml_env_and_plugin_vars_populate(str(arg))
-                    tmp_list.append(arg_str)
-                else:
-                    tmp_list.append(arg)
-
-            # return populated list.
-            return tmp_list
+        text, missing_env_var_names = template.render(global_plugin_dict, global_plugin_type_list)
+        for var in missing_env_var_names:
+            self.logger.error("\tERROR:yaml_env_vars_populate: env var %s is not set" % var)
+        return text
 
     def yaml_env_and_plugin_vars_populate(self, yaml_arg_str):
         r"""
@@ -1142,46 +1444,7 @@ class ffdc_collector:
             - cat ${MY_VAR}
             - ls -AX my_plugin_var
         """
-        # Parse the string for env vars ${env_vars}.
-        try:
-            # Example, list of matching env vars ['username', 'password', 'hostname']
-            # Extra escape \ for special symbols. '\$\{([^\}]+)\}' works good.
-            var_name_regex = '\\$\\{([^\\}]+)\\}'
-            env_var_names_list = re.findall(var_name_regex, yaml_arg_str)
-            for var in env_var_names_list:
-                env_var = os.environ[var]
-                env_replace = '${' + var + '}'
-                yaml_arg_str = yaml_arg_str.replace(env_replace, env_var)
-        except Exception as e:
-            self.logger.error("\tERROR:yaml_env_vars_populate: %s" % e)
-            pass
-
-        # Parse the string for plugin vars.
-        try:
-            # Example, list of plugin vars ['my_username', 'my_data']
-            plugin_var_name_list = global_plugin_dict.keys()
-            for var in plugin_var_name_list:
-                # skip env var list already populated above code block list.
-                if var in env_var_names_list:
-                    continue
-                # If this plugin var exist but empty in dict, don't replace.
-                # This is either a YAML plugin statement incorrectly used or
-                # user added a plugin var which is not going to be populated.
-                if yaml_arg_str in global_plugin_dict:
-                    if isinstance(global_plugin_dict[var], (list, dict)):
-                        # List data type or dict can't be replaced, use directly
-                        # in eval function call.
-                        global_plugin_type_list.append(var)
-                    else:
-                        yaml_arg_str = yaml_arg_str.replace(str(var), str(global_plugin_dict[var]))
-                # Just a string like filename or command.
-                else:
-                    yaml_arg_str = yaml_arg_str.replace(str(var), str(global_plugin_dict[var]))
-        except (IndexError, ValueError) as e:
-            self.logger.error("\tERROR: yaml_plugin_vars_populate: %s" % e)
-            pass
-
-        return yaml_arg_str
+        return self.render_template(self.ffdc_plan.template(yaml_arg_str))
 
     def plugin_error_check(self, plugin_dict):
         r"""
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+r"""
+Collect FFDC from several remote hosts concurrently.
+
+Each host is handled by a separate ffdc_collector running in its own worker process so that one hung or
+slow host does not hold up the others.
+"""
+
+import os
+import csv
+import sys
+import time
+import multiprocessing
+
+import yaml
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(script_dir)
+
+from ffdc_collector import ffdc_collector
+
+# The inventory fields.  Fields missing from an inventory entry are taken from the CLI options.
+inventory_fields = ['hostname', 'username', 'password', 'type']
+
+# Set in each worker process by init_worker.
+ssh_session_semaphore = None
+
+
+def load_inventory(inventory_file,
+                   username=None,
+                   password=None,
+                   remote_type=None):
+    r"""
+    Load a host inventory from a YAML or CSV file and return it as a list of dictionaries.
+
+    A YAML inventory is a list of entries:
+
+    - hostname: bmc1
+      username: root
+      password: 0penBmc
+      type: OPENBMC
+    - hostname: bmc2
+
+    A CSV inventory has a header line naming the fields:
+
+    hostname,username,password,type
+    bmc1,root,0penBmc,OPENBMC
+    bmc2,,,
+
+    Description of argument(s):
+    inventory_file      The path to the inventory file.  A .csv suffix selects the CSV format, anything else
+                        is read as YAML.
+    username            The default username for entries which do not specify one.
+    password            The default password for entries which do not specify one.
+    remote_type         The default OS type for entries which do not specify one.
+    """
+
+    defaults = {'username': username, 'password': password, 'type': remote_type}
+
+    with open(inventory_file, 'r') as file:
+        if inventory_file.lower().endswith('.csv'):
+            entries = list(csv.DictReader(file))
+        else:
+            entries = yaml.load(file, Loader=yaml.SafeLoader) or []
+
+    inventory = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'hostname': entry}
+        host = {}
+        for field in inventory_fields:
+            value = entry.get(field)
+            host[field] = str(value).strip() if value not in (None, '') else defaults.get(field)
+        if not host['hostname']:
+            continue
+        inventory.append(host)
+
+    return inventory
+
+
+def inventory_ok(inventory):
+    r"""
+    Verify that every inventory entry has all the fields needed for a collection.  Print an error for each
+    missing field and return False if any are found.
+
+    Description of argument(s):
+    inventory           A list of dictionaries as returned by load_inventory.
+    """
+
+    all_options_ok = True
+    if not inventory:
+        print("\n\tERROR: The inventory does not list any remote hosts.")
+        return False
+    for host in inventory:
+        for field in inventory_fields:
+            if not host[field]:
+                all_options_ok = False
+                print("\n\tERROR: %s of remote host %s is not specified in the inventory or CLI options."
+                      % (field, host['hostname']))
+    return all_options_ok
+
+
+def init_worker(semaphore):
+    r"""
+    Worker process initializer.
+
+    Description of argument(s):
+    semaphore           The semaphore capping the number of SSH sessions open across all workers.
+    """
+
+    global ssh_session_semaphore
+    ssh_session_semaphore = semaphore
+
+
+def get_dir_size(dir_path):
+    r"""
+    Return the total size in bytes of the files under dir_path.
+
+    Description of argument(s):
+    dir_path            The directory to measure.
+    """
+
+    total_bytes = 0
+    for root, dirs, files in os.walk(dir_path):
+        for file_name in files:
+            try:
+                total_bytes += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                pass
+    return total_bytes
+
+
+def collect_host(host, collector_args):
+    r"""
+    Run an ffdc_collector for one host and return a dictionary summarizing the result.
+
+    This function runs in a worker process.  ffdc_collector reports fatal errors with sys.exit, so
+    SystemExit is caught and recorded as a failed collection rather than killing the worker.
+
+    Description of argument(s):
+    host                A dictionary with hostname, username, password and type keys.
+    collector_args      A dictionary of the remaining ffdc_collector arguments (ffdc_config, location,
+                        remote_protocol, env_vars, econfig, log_level, parallel_channels, bulk_copy,
+                        incremental, manifest_dir).
+    """
+
+    result = {'hostname': host['hostname'],
+              'status': 'FAILED',
+              'protocols': [],
+              'commands_ok': 0,
+              'commands_failed': 0,
+              'files': 0,
+              'bytes': 0,
+              'elapsed': 0.0,
+              'path': '',
+              'error': ''}
+
+    start_time = time.time()
+    this_ffdc = None
+    try:
+        this_ffdc = ffdc_collector(host['hostname'],
+                                   host['username'],
+                                   host['password'],
+                                   collector_args['ffdc_config'],
+                                   os.path.join(collector_args['location'], host['hostname']),
+                                   host['type'],
+                                   collector_args['remote_protocol'],
+                                   collector_args['env_vars'],
+                                   collector_args['econfig'],
+                                   collector_args['log_level'],
+                                   collector_args['parallel_channels'],
+                                   collector_args['bulk_copy'],
+                                   collector_args['incremental'],
+                                   collector_args['manifest_dir'])
+        this_ffdc.ssh_session_semaphore = ssh_session_semaphore
+        this_ffdc.collect_ffdc()
+        result['status'] = 'OK'
+    except SystemExit as e:
+        result['error'] = "exit code %s" % e.code
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        if this_ffdc is not None:
+            this_ffdc.release_ssh_session()
+            # Worker processes exit without running atexit handlers.
+            this_ffdc.close_plugin_sessions()
+            result['protocols'] = list(this_ffdc.verified_protocols)
+            result['commands_ok'] = this_ffdc.commands_ok
+            result['commands_failed'] = this_ffdc.commands_failed
+            result['path'] = this_ffdc.ffdc_dir_path
+            if os.path.isdir(this_ffdc.ffdc_dir_path):
+                result['files'] = len(os.listdir(this_ffdc.ffdc_dir_path))
+                result['bytes'] = get_dir_size(this_ffdc.ffdc_dir_path)
+        result['elapsed'] = time.time() - start_time
+
+    if result['status'] == 'OK' and result['files'] == 0:
+        result['status'] = 'FAILED'
+        result['error'] = "no files were retrieved"
+
+    return result
+
+
+def collect_ffdc_multi(inventory,
+                       ffdc_config,
+                       location,
+                       remote_protocol,
+                       env_vars,
+                       econfig,
+                       log_level,
+                       parallel_channels=1,
+                       bulk_copy=False,
+                       incremental='none',
+                       max_workers=4,
+                       max_ssh_sessions=0):
+    r"""
+    Collect FFDC from every host in the inventory using a pool of worker processes and return a list of
+    result dictionaries (see collect_host) in inventory order.
+
+    Each worker process handles a single host (maxtasksperchild=1) so that logging handlers and plugin
+    state never leak from one host's collection into another's.  The FFDC of each host is stored under
+    <location>/<YYYYMMDD-HHMMSS>/<hostname>.  The incremental manifests are kept outside the batch directory,
+    as <location>/manifests/<hostname>_manifest.json, so that later runs find the prior collection.
+
+    Description of argument(s):
+    inventory           A list of dictionaries as returned by load_inventory.
+    ffdc_config         Configuration file listing commands and files for FFDC.
+    location            Where to store collected FFDC.
+    remote_protocol     Protocol to use to collect data.
+    env_vars            User define CLI env vars '{"key : "value"}'.
+    econfig             User define env vars YAML file.
+    log_level           Log level (CRITICAL, ERROR, WARNING, INFO, DEBUG).
+    parallel_channels   Number of SSH channels each collector uses to run COMMANDS concurrently.
+    bulk_copy           Copy files through a single tar stream per section.
+    incremental         Incremental collection mode (none, mtime or sha256).
+    max_workers         The maximum number of hosts to collect from at the same time.
+    max_ssh_sessions    The maximum number of SSH sessions open at the same time across all hosts.  0 means
+                        no limit beyond max_workers.
+    """
+
+    collector_args = {'ffdc_config': ffdc_config,
+                      'location': os.path.join(location, time.strftime("%Y%m%d-%H%M%S")),
+                      'remote_protocol': remote_protocol,
+                      'env_vars': env_vars,
+                      'econfig': econfig,
+                      'log_level': log_level,
+                      'parallel_channels': parallel_channels,
+                      'bulk_copy': bulk_copy,
+                      'incremental': incremental,
+                      'manifest_dir': os.path.join(location, "manifests")}
+    if str(incremental).lower() != 'none':
+        # Created here since the workers would race to create it.
+        os.makedirs(collector_args['manifest_dir'], exist_ok=True)
+
+    max_workers = max(1, min(int(max_workers), len(inventory)))
+    max_ssh_sessions = int(max_ssh_sessions)
+    semaphore = multiprocessing.BoundedSemaphore(max_ssh_sessions) if max_ssh_sessions > 0 else None
+
+    with multiprocessing.Pool(processes=max_workers,
+                              initializer=init_worker,
+                              initargs=(semaphore,),
+                              maxtasksperchild=1) as pool:
+        async_results = [pool.apply_async(collect_host, (host, collector_args)) for host in inventory]
+        results = [async_result.get() for async_result in async_results]
+
+    return results
+
+
+def format_size(num_bytes):
+    r"""
+    Return num_bytes as a human readable string (e.g. "1.5M").
+
+    Description of argument(s):
+    num_bytes           A byte count.
+    """
+
+    for suffix in ['B', 'K', 'M', 'G']:
+        if num_bytes < 1024 or suffix == 'G':
+            break
+        num_bytes /= 1024.0
+    return ("%d%s" % (num_bytes, suffix)) if suffix == 'B' else ("%.1f%s" % (num_bytes, suffix))
+
+
+def format_summary(results):
+    r"""
+    Return a consolidated, printable summary table of multi-host collection results.
+
+    Example result:
+
+    Host            Status  Protocols            Cmds OK  Cmds Failed  Files  Size     Elapsed
+    bmc1            OK      SSH,REDFISH,IPMI          48            2     62  3.4M     95.2s
+    bmc2            FAILED                             0            0      0  0B        3.1s  exit code -1
+
+    Description of argument(s):
+    results             A list of result dictionaries as returned by collect_ffdc_multi.
+    """
+
+    row_format = "{:<24}  {:<6}  {:<20}  {:>7}  {:>11}  {:>5}  {:>7}  {:>8}  {}"
+    lines = [row_format.format('Host', 'Status', 'Protocols', 'Cmds OK', 'Cmds Failed', 'Files', 'Size',
+                               'Elapsed', '')]
+    for result in results:
+        lines.append(row_format.format(result['hostname'],
+                                       result['status'],
+                                       ",".join(result['protocols']),
+                                       result['commands_ok'],
+                                       result['commands_failed'],
+                                       result['files'],
+                                       format_size(result['bytes']),
+                                       "%.1fs" % result['elapsed'],
+                                       result['error']).rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+
+class FFDCManifest:
+    r"""
+    Class to keep track of the remote files already collected from a host so that later collections only
+    need to fetch what is new or changed.
+
+    The manifest is a JSON file, one per host, which maps each remote path to the size, mtime and sha256 of
+    the file as last collected and to the local copy holding it:
+
+    {
+        "/tmp/BMC_dmesg.txt": {
+            "size": 53711,
+            "mtime": 1634562180,
+            "sha256": "9f2c...",
+            "local_path": "/tmp/OPENBMC/bmc1_20211018-132233/20211018-132233_BMC_dmesg.txt"
+        }
+    }
+    """
+
+    def __init__(self, manifest_path):
+
+        r"""
+        Description of argument(s):
+
+        manifest_path          Full path of the manifest file.  It is created on the first save.
+        """
+
+        self.manifest_path = manifest_path
+        self.entries = {}
+        try:
+            with open(manifest_path, 'r') as file:
+                self.entries = json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning("\n\t[WARN] Ignoring unreadable manifest %s: %s" % (manifest_path, e))
+
+    def lookup(self, remote_path):
+
+        r"""
+        Return the manifest entry for remote_path or None if the file was not collected before or its local
+        copy no longer exists.
+
+        Description of argument(s):
+        remote_path            Full path filename on the remote host.
+        """
+
+        entry = self.entries.get(remote_path)
+        if entry is None or not os.path.isfile(entry['local_path']):
+            return None
+        return entry
+
+    def update(self, remote_path, size, mtime, local_path, sha256=None):
+
+        r"""
+        Record that remote_path has been collected into local_path.
+
+        Description of argument(s):
+        remote_path            Full path filename on the remote host.
+        size                   The size of the remote file.
+        mtime                  The modification time of the remote file.
+        local_path             Full path filename of the local copy.
+        sha256                 The sha256 hex digest of the file.  It is computed from the local copy if not
+                               specified.
+        """
+
+        if sha256 is None:
+            sha256 = self.file_sha256(local_path)
+        self.entries[remote_path] = {'size': size,
+                                     'mtime': mtime,
+                                     'sha256': sha256,
+                                     'local_path': local_path}
+
+    def save(self):
+
+        r"""
+        Write the manifest file.
+        """
+
+        temp_path = self.manifest_path + '.tmp'
+        try:
+            with open(temp_path, 'w') as file:
+                json.dump(self.entries, file, indent=1, sort_keys=True)
+            os.replace(temp_path, self.manifest_path)
+        except OSError as e:
+            logging.error("\n\tERROR: Fail to save manifest %s %s" % (self.manifest_path, e))
+
+    @staticmethod
+    def file_sha256(local_path):
+
+        r"""
+        Return the sha256 hex digest of a local file.
+
+        Description of argument(s):
+        local_path             Full path filename on the local host.
+        """
+
+        sha256 = hashlib.sha256()
+        with open(local_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def link_file(source_path, local_path):
+
+        r"""
+        Make local_path a hard link to source_path, falling back to a copy if the two are on different file
+        systems or hard links are not supported.
+
+        Description of argument(s):
+        source_path            Full path filename of the existing local file.
+        local_path             Full path filename of the link to create.
+        """
+
+        if os.path.lexists(local_path):
+            os.remove(local_path)
+        try:
+            os.link(source_path, local_path)
+        except OSError:
+            shutil.copy2(source_path, local_path)
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import yaml
+import json
+import hashlib
+import logging
+import tempfile
+
+# Bump this whenever the format of cached plans (see FFDCPlan.to_data) changes so that stale cached plans
+# are not loaded.
+PLAN_FORMAT_VERSION = 2
+
+# ${MY_VAR} references to environment variables.
+env_var_regex = re.compile(r'\$\{([^\}]+)\}')
+# The plugin_name directive, e.g. 'plugin.foo_func.my_func' or 'result1,result2 = plugin.foo_func.my_func'.
+plugin_name_regex = re.compile(r'^\s*(?:([\w, ]+?)\s+=\s+)?([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+)\s*$')
+
+# Plugin variables which the collector defines itself.
+builtin_plugin_var_names = ('global_log_store_path',)
+
+
+class FFDCTemplate:
+    r"""
+    A string from the configuration file (e.g. a command or a file name) which has been split into literal
+    text and ${MY_VAR} environment variable references, along with the names of the plugin variables which
+    it refers to.
+    """
+
+    __slots__ = ('text', 'parts', 'env_var_names', 'plugin_var_names')
+
+    def __init__(self, text, plugin_var_names=()):
+
+        r"""
+        Description of argument(s):
+
+        text                   The string from the configuration file.
+        plugin_var_names       The names of all plugin return variables defined in the configuration file,
+                               in the order in which they are defined.
+        """
+
+        self.text = text
+        # Literal text and environment variable names alternate, starting with literal text.
+        self.parts = tuple(env_var_regex.split(text))
+        self.env_var_names = tuple(self.parts[1::2])
+        self.plugin_var_names = tuple(var for var in plugin_var_names
+                                      if var in text and var not in self.env_var_names)
+
+    @classmethod
+    def from_parts(cls, text, parts, plugin_var_names):
+
+        r"""
+        Return an FFDCTemplate made from the parts and plugin variable names of a cached plan rather than by
+        parsing the text again.
+
+        Description of argument(s):
+
+        text                   The string from the configuration file.
+        parts                  The list of the string's literal text and environment variable names.
+        plugin_var_names       The list of the names of the plugin variables which the string refers to.
+        """
+
+        template = cls.__new__(cls)
+        template.text = text
+        template.parts = tuple(str(part) for part in parts)
+        template.env_var_names = tuple(template.parts[1::2])
+        template.plugin_var_names = tuple(str(var) for var in plugin_var_names)
+        if ''.join(part if not ix % 2 else '${' + part + '}' for ix, part in enumerate(template.parts)) \
+                != text:
+            raise ValueError("The cached parts of %s do not match it." % text)
+        return template
+
+    def render(self, plugin_vars, plugin_type_list):
+
+        r"""
+        Return a tuple consisting of the string with its environment and plugin variables filled in and a
+        list of the names of any environment variables which are not set.  An unset environment variable is
+        left as is.
+
+        As with the original string substitution, a plugin variable whose value is a list or dictionary is
+        not substituted when it is the whole string.  Its name is added to plugin_type_list instead so that
+        the value itself can be passed to a plugin function.
+
+        Description of argument(s):
+
+        plugin_vars            The dictionary of plugin variable values.
+        plugin_type_list       The list of plugin variables to be passed to plugin functions as objects.
+        """
+
+        missing_env_var_names = []
+        if self.env_var_names:
+            buffer = []
+            for ix, part in enumerate(self.parts):
+                if not ix % 2:
+                    buffer.append(part)
+                elif part in os.environ:
+                    buffer.append(os.environ[part])
+                else:
+                    missing_env_var_names.append(part)
+                    buffer.append('${' + part + '}')
+            text = ''.join(buffer)
+        else:
+            text = self.text
+
+        for var in self.plugin_var_names:
+            if var not in plugin_vars:
+                continue
+            if text in plugin_vars and isinstance(plugin_vars[var], (list, dict)):
+                # List data type or dict can't be replaced, it is passed to the plugin function directly.
+                plugin_type_list.append(var)
+            else:
+                text = text.replace(var, str(plugin_vars[var]))
+
+        return text, missing_env_var_names
+
+
+class FFDCPluginCall:
+    r"""
+    A compiled plugin block.
+
+    Example YAML:
+        - plugin:
+          - plugin_name: version = plugin.ssh_execution.ssh_execute_cmd
+          - plugin_args:
+            - ${hostname}
+            - "cat /etc/os-release"
+          - plugin_expects_return: str
+
+    The func attribute holds the resolved plugin function.  It is not part of the cached plan and is set by
+    the collector (see FFDCPlan.resolve_plugins).
+    """
+
+    __slots__ = ('func_path', 'return_vars', 'args', 'expects_return', 'error_directive', 'uses', 'func')
+
+    def __init__(self, func_path, return_vars, args, expects_return, error_directive, uses):
+
+        r"""
+        Description of argument(s):
+
+        func_path              Dotted path of the plugin function (e.g. 'plugin.redfish.enumerate_request').
+        return_vars            Tuple of the names of the plugin variables which receive the function's
+                               return value(s).
+        args                   Tuple of the arguments.  String arguments are FFDCTemplate objects.  Other
+                               arguments (e.g. numbers) are passed as they are.
+        expects_return         The plugin_expects_return directive (e.g. 'str') or None.
+        error_directive        The plugin_error directive (e.g. 'exit_on_error') or None.
+        uses                   Tuple of the names of the plugin variables which the arguments refer to.
+        """
+
+        self.func_path = func_path
+        self.return_vars = return_vars
+        self.args = args
+        self.expects_return = expects_return
+        self.error_directive = error_directive
+        self.uses = uses
+        self.func = None
+
+    def to_data(self):
+
+        r"""
+        Return the plugin call as a dictionary of JSON data types.  Template arguments are stored as their
+        text, which refers to the plan's templates.
+        """
+
+        return {'func_path': self.func_path,
+                'return_vars': list(self.return_vars),
+                'args': [{'template': arg.text} if isinstance(arg, FFDCTemplate) else {'value': arg}
+                         for arg in self.args],
+                'expects_return': self.expects_return,
+                'error_directive': self.error_directive,
+                'uses': list(self.uses)}
+
+    @classmethod
+    def from_data(cls, data, templates):
+
+        r"""
+        Return the FFDCPluginCall for a dictionary made by to_data.
+
+        Description of argument(s):
+
+        data                   The dictionary made by to_data.
+        templates              The plan's dictionary of FFDCTemplate objects keyed by their text.
+        """
+
+        args = tuple(templates[arg['template']] if 'template' in arg else arg['value']
+                     for arg in data['args'])
+        return cls(str(data['func_path']), tuple(data['return_vars']), args, data['expects_return'],
+                   data['error_directive'], tuple(data['uses']))
+
+
+class FFDCPlan:
+    r"""
+    The compiled form of an FFDC configuration file (e.g. ffdc_config.yaml).
+
+    Compilation validates the configuration file, splits every command and file name into an FFDCTemplate,
+    turns every plugin block into an FFDCPluginCall and warns about commands which use a plugin variable
+    before a plugin block of their command group sets it.  Errors in the configuration file are therefore
+    found before any target is contacted.
+
+    Plans are cached on disk, keyed by the sha256 of the configuration file (see load_ffdc_plan).
+    """
+
+    def __init__(self, config, config_hash):
+
+        r"""
+        Description of argument(s):
+
+        config                 The configuration file's contents as loaded by yaml.
+        config_hash            The sha256 hex digest of the configuration file.
+        """
+
+        self.config = config
+        self.config_hash = config_hash
+        self.errors = []
+        self.warnings = []
+        self.plugin_var_names = list(builtin_plugin_var_names)
+        # Compiled objects, keyed by the text of the string or by the canonical JSON of the plugin block.
+        self.templates = {}
+        self.plugin_calls = {}
+
+        if not isinstance(config, dict):
+            self.errors.append("The configuration file does not contain a dictionary of remote types.")
+            return
+        self.collect_plugin_var_names()
+        for target_type, sub_types in config.items():
+            if not isinstance(sub_types, dict):
+                self.errors.append("%s: expected a dictionary of command groups." % target_type)
+                continue
+            for sub_type, actions in sub_types.items():
+                self.compile_actions(target_type, sub_type, actions)
+        self.plugin_var_names = tuple(self.plugin_var_names)
+
+    def collect_plugin_var_names(self):
+
+        r"""
+        Record the names of all plugin return variables, in order of definition.
+        """
+
+        for sub_types in self.config.values():
+            if not isinstance(sub_types, dict):
+                continue
+            for actions in sub_types.values():
+                if not isinstance(actions, dict) or not isinstance(actions.get('COMMANDS'), list):
+                    continue
+                for command in actions['COMMANDS']:
+                    if not (isinstance(command, dict) and isinstance(command.get('plugin'), list)):
+                        continue
+                    for directive in command['plugin']:
+                        if not isinstance(directive, dict) or 'plugin_name' not in directive:
+                            continue
+                        match = plugin_name_regex.match(str(directive['plugin_name']))
+                        if match and match.group(1):
+                            for var in match.group(1).split(','):
+                                if var.strip() not in self.plugin_var_names:
+                                    self.plugin_var_names.append(var.strip())
+
+    def compile_actions(self, target_type, sub_type, actions):
+
+        r"""
+        Validate and compile one command group (e.g. OPENBMC/DUMP_LOGS).
+
+        Description of argument(s):
+
+        target_type            The remote host type (e.g. 'OPENBMC').
+        sub_type               The command group name (e.g. 'DUMP_LOGS').
+        actions                The command group's dictionary (PROTOCOL, COMMANDS, FILES).
+        """
+
+        where = "%s/%s" % (target_type, sub_type)
+        if not isinstance(actions, dict):
+            self.errors.append("%s: expected a dictionary with PROTOCOL, COMMANDS and FILES." % where)
+            return
+        protocol = actions.get('PROTOCOL')
+        if not isinstance(protocol, list) or not protocol:
+            self.errors.append("%s: PROTOCOL must be a non-empty list." % where)
+        for key in ('COMMANDS', 'FILES'):
+            if key in actions and not isinstance(actions[key], list):
+                self.errors.append("%s: %s must be a list." % (where, key))
+                return
+
+        defined_vars = set()
+        for ix, command in enumerate(actions.get('COMMANDS') or []):
+            uses = ()
+            if isinstance(command, str):
+                uses = self.template(command).plugin_var_names
+            elif isinstance(command, dict) and 'plugin' in command:
+                plugin_call = self.compile_plugin_call(where, ix, command['plugin'])
+                if plugin_call is not None:
+                    uses = plugin_call.uses
+                    defined_vars.update(plugin_call.return_vars)
+            elif isinstance(command, dict) and len(command) == 1:
+                # A command with a timeout, e.g. {'cat /var/log/x': 60}.
+                command_text, timeout = next(iter(command.items()))
+                if not isinstance(timeout, (int, float)):
+                    self.errors.append("%s: COMMANDS[%d]: the timeout of %s must be a number."
+                                       % (where, ix, command_text))
+            else:
+                self.errors.append("%s: COMMANDS[%d]: unrecognized entry %s." % (where, ix, command))
+            for var in uses:
+                if var not in defined_vars and var not in builtin_plugin_var_names:
+                    self.warnings.append("%s: COMMANDS[%d] uses plugin variable %s before it is set in this"
+                                         " group." % (where, ix, var))
+
+        for file_name in actions.get('FILES') or []:
+            if isinstance(file_name, str):
+                self.template(file_name)
+
+    def compile_plugin_call(self, where, ix, plugin_cmd_list):
+
+        r"""
+        Validate and compile a plugin block, record it in plugin_calls and return it.  Return None if the
+        block is invalid.
+
+        Description of argument(s):
+
+        where                  The command group of the block, for error messages.
+        ix                     The COMMANDS index of the block, for error messages.
+        plugin_cmd_list        The plugin block read from YAML
+                               [{'plugin_name': 'plugin.foo_func.my_func'},
+                                {'plugin_args': [10]}]
+        """
+
+        where = "%s: COMMANDS[%d]" % (where, ix)
+        if not isinstance(plugin_cmd_list, list) or \
+                not all(isinstance(directive, dict) for directive in plugin_cmd_list):
+            self.errors.append("%s: a plugin block must be a list of directives." % where)
+            return None
+        directives = {}
+        for directive in plugin_cmd_list:
+            for key, value in directive.items():
+                directives.setdefault(key, value)
+        unknown = set(directives) - {'plugin_name', 'plugin_args', 'plugin_expects_return', 'plugin_error'}
+        if unknown:
+            self.warnings.append("%s: unknown plugin directive(s) %s." % (where, ', '.join(sorted(unknown))))
+        match = plugin_name_regex.match(str(directives.get('plugin_name', '')))
+        if not match:
+            self.errors.append("%s: invalid plugin_name %s." % (where, directives.get('plugin_name')))
+            return None
+        return_vars = tuple(var.strip() for var in match.group(1).split(',')) if match.group(1) else ()
+
+        args = []
+        uses = []
+        for arg in directives.get('plugin_args') or []:
+            if isinstance(arg, str):
+                template = self.template(arg)
+                args.append(template)
+                uses += [var for var in template.plugin_var_names if var not in uses]
+            else:
+                args.append(arg)
+
+        plugin_call = FFDCPluginCall(match.group(2), return_vars, tuple(args),
+                                     directives.get('plugin_expects_return'),
+                                     directives.get('plugin_error'), tuple(uses))
+        self.plugin_calls[self.plugin_key(plugin_cmd_list)] = plugin_call
+        return plugin_call
+
+    @staticmethod
+    def plugin_key(plugin_cmd_list):
+
+        r"""
+        Return the key of a plugin block in plugin_calls.
+        """
+
+        return json.dumps(plugin_cmd_list, sort_keys=True, default=str)
+
+    def template(self, text):
+
+        r"""
+        Return the FFDCTemplate for text, compiling it if it was not part of the configuration file.
+
+        Description of argument(s):
+
+        text                   A command or file name.
+        """
+
+        template = self.templates.get(text)
+        if template is None:
+            template = FFDCTemplate(text, self.plugin_var_names)
+            self.templates[text] = template
+        return template
+
+    def plugin_call(self, plugin_cmd_list):
+
+        r"""
+        Return the FFDCPluginCall for a plugin block of the configuration file or None if the block is
+        invalid.
+
+        Description of argument(s):
+
+        plugin_cmd_list        The plugin block read from YAML.
+        """
+
+        return self.plugin_calls.get(self.plugin_key(plugin_cmd_list))
+
+    def resolve_plugins(self, resolve_func):
+
+        r"""
+        Set the func attribute of every plugin call and return the list of the plugin function paths which
+        could not be resolved.
+
+        Description of argument(s):
+
+        resolve_func           A function which takes a dotted plugin function path and returns the
+                               function or None.
+        """
+
+        unresolved = []
+        for plugin_call in self.plugin_calls.values():
+            plugin_call.func = resolve_func(plugin_call.func_path)
+            if plugin_call.func is None and plugin_call.func_path not in unresolved:
+                unresolved.append(plugin_call.func_path)
+        return unresolved
+
+    def to_data(self):
+
+        r"""
+        Return the plan as a dictionary of JSON data types: the configuration file's contents plus the
+        compiled templates and plugin calls.  Plans are cached in this form rather than pickled so that
+        loading a cached plan cannot run code.
+        """
+
+        return {'format_version': PLAN_FORMAT_VERSION,
+                'config_hash': self.config_hash,
+                'config': self.config,
+                'warnings': self.warnings,
+                'plugin_var_names': list(self.plugin_var_names),
+                'templates': {text: {'parts': list(template.parts),
+                                     'plugin_var_names': list(template.plugin_var_names)}
+                              for text, template in self.templates.items()},
+                'plugin_calls': {key: plugin_call.to_data()
+                                 for key, plugin_call in self.plugin_calls.items()}}
+
+    @classmethod
+    def from_data(cls, data):
+
+        r"""
+        Return the FFDCPlan for a dictionary made by to_data without compiling the configuration again.  A
+        ValueError, KeyError or TypeError is raised if the dictionary is not a valid plan.
+
+        Description of argument(s):
+
+        data                   The dictionary made by to_data.
+        """
+
+        if data['format_version'] != PLAN_FORMAT_VERSION:
+            raise ValueError("The cached plan has format version %s." % data['format_version'])
+        plan = cls.__new__(cls)
+        plan.config = data['config']
+        plan.config_hash = str(data['config_hash'])
+        plan.errors = []
+        plan.warnings = [str(warning) for warning in data['warnings']]
+        plan.plugin_var_names = tuple(str(var) for var in data['plugin_var_names'])
+        plan.templates = {text: FFDCTemplate.from_parts(text, template['parts'], template['plugin_var_names'])
+                          for text, template in data['templates'].items()}
+        plan.plugin_calls = {key: FFDCPluginCall.from_data(plugin_call, plan.templates)
+                             for key, plugin_call in data['plugin_calls'].items()}
+        return plan
+
+
+def load_ffdc_plan(config_path, cache_dir=None):
+
+    r"""
+    Return the FFDCPlan for a configuration file, from the plan cache if possible.
+
+    Plans are cached as JSON (see FFDCPlan.to_data).  A plan which has errors, or whose configuration file
+    has values which JSON cannot hold (e.g. dates or non-string keys), is returned but not cached.  A cache
+    directory which cannot be written is silently not used.
+
+    Description of argument(s):
+
+    config_path            Path of the configuration file (e.g. ffdc_config.yaml).
+    cache_dir              Directory of cached plans.  The default is $FFDC_PLAN_CACHE_DIR or
+                           ~/.cache/ffdc_plans.
+    """
+
+    with open(config_path, 'rb') as file:
+        config_bytes = file.read()
+    config_hash = hashlib.sha256(config_bytes).hexdigest()
+    if cache_dir is None:
+        cache_dir = os.environ.get('FFDC_PLAN_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'ffdc_plans'))
+    cache_path = os.path.join(cache_dir, "plan_v%d_%s.json" % (PLAN_FORMAT_VERSION, config_hash))
+
+    try:
+        with open(cache_path, 'r') as file:
+            plan = FFDCPlan.from_data(json.load(file))
+        if plan.config_hash == config_hash:
+            return plan
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning("\n\t[WARN] Ignoring unreadable FFDC plan cache %s: %s" % (cache_path, e))
+
+    plan = FFDCPlan(yaml.load(config_bytes, Loader=yaml.SafeLoader), config_hash)
+    if plan.errors:
+        return plan
+    try:
+        buffer = json.dumps(plan.to_data())
+    except (TypeError, ValueError):
+        return plan
+    if json.loads(buffer)['config'] != plan.config:
+        # E.g. integer keys would come back as strings.
+        return plan
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix='.plan_')
+        with os.fdopen(fd, 'w') as file:
+            file.write(buffer)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+    return plan
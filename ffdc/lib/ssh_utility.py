@@ -7,9 +7,16 @@ from paramiko.ssh_exception import SSHException
 from paramiko.ssh_exception import BadHostKeyException
 from paramiko.buffered_pipe import PipeTimeout as PipeTimeout
 from scp import SCPClient, SCPException
+import os
 import time
+import shlex
 import socket
+import select
+import shutil
+import tarfile
+import fnmatch
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from socket import timeout as SocketTimeout
 
 
@@ -36,6 +43,7 @@ class SSHRemoteclient:
         self.hostname = hostname
         self.username = username
         self.password = password
+        self.remote_compressor = None
 
     def ssh_remoteclient_login(self):
 
@@ -80,34 +88,25 @@ class SSHRemoteclient:
         """
         Execute command on the remote host.
 
+        The command runs on its own channel of the SSH transport.  Completion is detected from the channel's
+        data and exit-status events rather than by polling, so a short command returns as soon as it is done.
+        Since each call uses a separate channel, this method may be called from several threads at once.
+
         Description of argument(s):
         command                Command string sent to remote host
+        default_timeout        Seconds to allow for the command to complete
 
         """
 
         empty = ''
         cmd_start = time.time()
         try:
-            stdin, stdout, stderr = \
-                self.sshclient.exec_command(command, timeout=default_timeout)
-            start = time.time()
-            while time.time() < start + default_timeout:
-                # Need to do read/write operation to trigger
-                # paramiko exec_command timeout mechanism.
-                xresults = stderr.readlines()
-                results = ''.join(xresults)
-                time.sleep(1)
-                if stdout.channel.exit_status_ready():
-                    break
-            cmd_exit_code = stdout.channel.recv_exit_status()
-
-            # Convert list of string to one string
-            err = ''
-            out = ''
-            for item in results:
-                err += item
-            for item in stdout.readlines():
-                out += item
+            channel = self.sshclient.get_transport().open_session(timeout=default_timeout)
+            try:
+                channel.exec_command(command)
+                cmd_exit_code, err, out = self.wait_for_channel(channel, cmd_start + default_timeout)
+            finally:
+                channel.close()
 
             return cmd_exit_code, err, out
 
@@ -119,6 +118,63 @@ class SSHRemoteclient:
                           (command, time.strftime("%H:%M:%S", time.gmtime(time.time() - cmd_start))))
             return 0, empty, empty
 
+    def wait_for_channel(self, channel, deadline):
+        r"""
+        Collect the output of the command running on channel and return its exit code, stderr and stdout.
+
+        Description of argument(s):
+        channel                A paramiko channel on which a command has been started.
+        deadline               The time (as returned by time.time()) by which the command must have
+                               completed.  SocketTimeout is raised if it has not.
+        """
+
+        out_chunks = []
+        err_chunks = []
+        while True:
+            while channel.recv_ready():
+                out_chunks.append(channel.recv(32768))
+            while channel.recv_stderr_ready():
+                err_chunks.append(channel.recv_stderr(32768))
+            if channel.exit_status_ready() and channel.eof_received \
+                    and not channel.recv_ready() and not channel.recv_stderr_ready():
+                break
+            time_left = deadline - time.time()
+            if time_left <= 0:
+                raise SocketTimeout("Command did not complete in time.")
+            # The channel becomes readable when data arrives or when the remote side closes it.  The wait is
+            # capped since the exit status itself is not signaled this way.
+            select.select([channel], [], [], min(time_left, 0.5))
+
+        out = b''.join(out_chunks).decode('utf-8', errors='replace')
+        err = b''.join(err_chunks).decode('utf-8', errors='replace')
+        return channel.recv_exit_status(), err, out
+
+    def execute_commands_parallel(self, command_groups,
+                                  max_channels=4):
+        r"""
+        Execute groups of commands concurrently, each on its own channel of the single SSH transport.
+
+        The commands within a group run one after another in list order.  Separate groups run concurrently,
+        with at most max_channels commands in flight.
+
+        Yield a (command, timeout, (exit code, stderr, stdout)) tuple for each command.  The results are
+        yielded group by group in command_groups order as each group completes.
+
+        Description of argument(s):
+        command_groups         A list of lists of (command, timeout) tuples.
+        max_channels           The maximum number of channels to have open at once.
+        """
+
+        def run_group(group):
+            return [(command, timeout, self.execute_command(command, timeout))
+                    for command, timeout in group]
+
+        with ThreadPoolExecutor(max_workers=max(int(max_channels), 1)) as executor:
+            futures = [executor.submit(run_group, group) for group in command_groups]
+            for future in futures:
+                for result in future.result():
+                    yield result
+
     def scp_connection(self):
 
         r"""
@@ -159,3 +215,208 @@ class SSHRemoteclient:
             return False
         # Return True for file accounting
         return True
+
+    def get_remote_compressor(self):
+
+        r"""
+        Return the name of the best compressor available on the remote host ('xz', 'gzip' or '' for none).
+        The result is cached for the life of the connection.
+        """
+
+        if self.remote_compressor is None:
+            cmd_exit_code, err, out = self.execute_command(
+                'command -v xz >/dev/null && echo xz || { command -v gzip >/dev/null && echo gzip; }')
+            self.remote_compressor = out.strip() if out.strip() in ('xz', 'gzip') else ''
+        return self.remote_compressor
+
+    def tar_files_from_remote(self, sources, default_timeout=600):
+
+        r"""
+        Copy files from the remote host through a single (compressed, if possible) tar stream which is
+        extracted locally as it arrives.
+
+        Return a list with one boolean per source indicating whether anything was copied for it.
+
+        Description of argument(s):
+        sources                A list of (remote_path, local_path) tuples.  remote_path may contain shell
+                               wildcards.  In that case, or if local_path is an existing directory,
+                               local_path is the directory which receives each match under its own name.
+                               Otherwise, the remote file (or directory) is stored as local_path.
+        default_timeout        Seconds to allow for the transfer to complete.
+
+        """
+
+        copied = [False] * len(sources)
+        # Decide before extracting anything since extraction may create the directories.
+        into_dirs = [any(c in source for c in '*?[') or os.path.isdir(local) for source, local in sources]
+        compressor = self.get_remote_compressor()
+        # Expand the patterns on the remote host and archive whatever exists.  Leading slashes are stripped
+        # so that tar does not complain about absolute member names.
+        remote_cmd = 'cd / && set -- && for f in ' + ' '.join(source for source, local in sources) \
+            + '; do [ -e "$f" ] && set -- "$@" "${f#/}"; done; [ $# -gt 0 ] && tar -chf - "$@"'
+        if compressor:
+            remote_cmd += ' | ' + compressor + ' -c'
+        stream_mode = {'xz': 'r|xz', 'gzip': 'r|gz', '': 'r|'}[compressor]
+
+        try:
+            channel = self.sshclient.get_transport().open_session(timeout=default_timeout)
+            channel.settimeout(default_timeout)
+            channel.exec_command(remote_cmd)
+            stream = channel.makefile('rb')
+            try:
+                with tarfile.open(fileobj=stream, mode=stream_mode) as tar:
+                    for member in tar:
+                        source_ix, local_path = self.map_tar_member(member.name, sources, into_dirs)
+                        if source_ix is None:
+                            continue
+                        try:
+                            if member.isdir():
+                                os.makedirs(local_path, exist_ok=True)
+                            elif member.isfile():
+                                os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+                                with open(local_path, 'wb') as local_file:
+                                    shutil.copyfileobj(tar.extractfile(member), local_file)
+                            else:
+                                continue
+                        except OSError as e:
+                            # Skip this member but keep reading the stream for the others.
+                            logging.error("\n\tERROR: Fail to store %s as %s %s %s\n\n"
+                                          % (member.name, local_path, e.__class__, e))
+                            continue
+                        copied[source_ix] = True
+            except tarfile.ReadError:
+                # Nothing matched so the remote side sent an empty stream.
+                pass
+            finally:
+                channel.close()
+        except (SSHException, SocketTimeout, PipeTimeout, tarfile.TarError, EOFError, OSError) as e:
+            logging.error("\n\tERROR: Fail tar stream from remotehost %s %s\n\n" % (e.__class__, e))
+
+        return copied
+
+    def stat_remote_files(self, patterns):
+
+        r"""
+        Return a list with one entry per pattern.  Each entry is a list of dictionaries describing the
+        remote paths which the pattern matches:
+
+        [{'path': '/tmp/BMC_dmesg.txt', 'size': 53711, 'mtime': 1634562180, 'regular': True}]
+
+        None is returned if the remote host cannot stat files.
+
+        Description of argument(s):
+        patterns               A list of remote paths which may contain shell wildcards.
+
+        """
+
+        # Each line of output is prefixed with the index of the pattern which produced it.
+        remote_cmd = ''.join('for f in %s; do [ -e "$f" ] && stat -c "%d %%s %%Y %%f %%n" "$f"; done; '
+                             % (pattern, pattern_ix) for pattern_ix, pattern in enumerate(patterns))
+        cmd_exit_code, err, out = self.execute_command(remote_cmd + 'true')
+        if cmd_exit_code or err.strip():
+            return None
+
+        results = [[] for pattern in patterns]
+        for line in out.splitlines():
+            try:
+                pattern_ix, size, mtime, mode, path = line.split(' ', 4)
+                results[int(pattern_ix)].append({'path': path,
+                                                 'size': int(size),
+                                                 'mtime': int(mtime),
+                                                 'regular': (int(mode, 16) & 0o170000) == 0o100000})
+            except (ValueError, IndexError):
+                continue
+        return results
+
+    def remote_sha256(self, remote_file, length=None):
+
+        r"""
+        Return the sha256 hex digest of a remote file or None if it cannot be computed.
+
+        Description of argument(s):
+        remote_file            Full path filename on the remote host.
+        length                 If specified, only the first length bytes of the file are hashed.
+
+        """
+
+        if length is None:
+            remote_cmd = 'sha256sum < ' + shlex.quote(remote_file)
+        else:
+            remote_cmd = 'head -c %d %s | sha256sum' % (length, shlex.quote(remote_file))
+        cmd_exit_code, err, out = self.execute_command(remote_cmd, default_timeout=600)
+        digest = out.split(' ')[0].strip()
+        if cmd_exit_code or len(digest) != 64:
+            return None
+        return digest
+
+    def append_remote_file_tail(self, remote_file, offset, local_file, default_timeout=600):
+
+        r"""
+        Append the bytes of a remote file which follow offset to a local file and return the number of bytes
+        appended or None on failure.
+
+        Description of argument(s):
+        remote_file            Full path filename on the remote host.
+        offset                 The number of leading bytes of the remote file to skip.
+        local_file             Full path filename on the local host.
+        default_timeout        Seconds to allow for the transfer to complete.
+
+        """
+
+        num_bytes = 0
+        try:
+            channel = self.sshclient.get_transport().open_session(timeout=default_timeout)
+            channel.settimeout(default_timeout)
+            try:
+                channel.exec_command('tail -c +%d %s' % (offset + 1, shlex.quote(remote_file)))
+                with open(local_file, 'ab') as file:
+                    while True:
+                        data = channel.recv(32768)
+                        if not data:
+                            break
+                        file.write(data)
+                        num_bytes += len(data)
+                if channel.recv_exit_status():
+                    return None
+            finally:
+                channel.close()
+        except (SSHException, SocketTimeout, PipeTimeout, OSError) as e:
+            logging.error(
+                "\n\tERROR: Fail tail of %s from remotehost %s %s\n\n" % (remote_file, e.__class__, e))
+            return None
+
+        return num_bytes
+
+    @staticmethod
+    def map_tar_member(member_name, sources, into_dirs=None):
+
+        r"""
+        Return the index of the source which a tar member belongs to and the local path where it is to be
+        stored.  (None, None) is returned if the member matches no source.
+
+        Description of argument(s):
+        member_name            The name of the member in the tar stream (e.g. 'tmp/BMC_dmesg.txt').
+        sources                See tar_files_from_remote for details.
+        into_dirs              A list with one boolean per source indicating that its local_path is a
+                               directory which receives each match under its own name.  By default, this
+                               is the case for sources with wildcards.
+        """
+
+        if '..' in member_name.split('/'):
+            return None, None
+        member_parts = ('/' + member_name.strip('/')).split('/')
+        for source_ix, (source, local_path) in enumerate(sources):
+            source_parts = source.rstrip('/').split('/')
+            if len(member_parts) < len(source_parts):
+                continue
+            # The leading components of the member which correspond to the source.
+            top = '/'.join(member_parts[:len(source_parts)])
+            if not fnmatch.fnmatchcase(top, source.rstrip('/')):
+                continue
+            if into_dirs[source_ix] if into_dirs else any(c in source for c in '*?['):
+                local_path = os.path.join(local_path, member_parts[len(source_parts) - 1])
+            remainder = member_parts[len(source_parts):]
+            if remainder:
+                local_path = os.path.join(local_path, *remainder)
+            return source_ix, local_path
+        return None, None
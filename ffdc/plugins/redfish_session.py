@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+
+r"""
+This module contains functions which collect redfish data in-process over one authenticated, keep-alive
+HTTPS session per host, rather than by running redfishtool for every URL (see redfish.py).  Its functions
+return the same data as their redfish.py counterparts.
+"""
+
+import os
+import json
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+import urllib3
+
+# BMCs typically have self-signed certificates.
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Resources containing any of these strings are not enumerated.
+# Example: '/redfish/v1/JsonSchemas/' and sub resources.
+#          '/redfish/v1/SessionService'
+#          '/redfish/v1/Managers/bmc#/Oem'
+skip_enumeration_strings = ('JsonSchemas', 'SessionService', 'PostCodes', 'Registries', '#')
+
+# Open sessions keyed by (hostname, username).
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+class redfish_session:
+
+    r"""
+    An authenticated redfish session to one BMC whose HTTPS connections are kept open and shared by the
+    threads which use it.
+    """
+
+    def __init__(self,
+                 hostname,
+                 username,
+                 password,
+                 max_connections=8,
+                 timeout=30):
+        r"""
+        Description of argument(s):
+        hostname            Name/IP of the BMC, optionally followed by ":<port>".
+        username            Redfish user name.
+        password            Redfish password.
+        max_connections     Maximum number of HTTPS connections kept open to the BMC.
+        timeout             Time, in seconds, to wait for each response.
+        """
+
+        self.base_url = "https://" + hostname
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.session_location = None
+        self.lock = threading.Lock()
+        self.http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=int(max_connections))
+        self.http.mount("https://", adapter)
+        self.login()
+
+    def login(self, failed_token=None):
+        r"""
+        Create a redfish session and use its token for all further requests.
+
+        Description of argument(s):
+        failed_token        The token which the BMC no longer accepts.  If another thread has already
+                            replaced it, its new session is used rather than creating yet another one.
+        """
+
+        with self.lock:
+            if failed_token is not None and self.http.headers.get('X-Auth-Token') != failed_token:
+                return
+            # The old token stays in place for other threads until the new one replaces it.  It is left out
+            # of the login request itself.  A Session-level verify would be overridden by
+            # REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE so it is passed with each request.
+            resp = self.http.post(self.base_url + "/redfish/v1/SessionService/Sessions",
+                                  json={'UserName': self.username, 'Password': self.password},
+                                  headers={'X-Auth-Token': None}, verify=False, timeout=self.timeout)
+            resp.raise_for_status()
+            self.http.headers['X-Auth-Token'] = resp.headers['X-Auth-Token']
+            self.session_location = resp.headers.get('Location')
+
+    def logout(self):
+        r"""
+        Delete the redfish session and close the connections.
+        """
+
+        try:
+            if self.session_location:
+                url = self.session_location
+                if not url.startswith("http"):
+                    url = self.base_url + url
+                self.http.delete(url, verify=False, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            pass
+        self.session_location = None
+        self.http.close()
+
+    def get(self, url):
+        r"""
+        GET the resource and return a tuple consisting of its decoded JSON data (or None) and an error
+        message (or "").  The session is re-created once if the BMC no longer accepts its token.
+
+        Description of argument(s):
+        url                 URI resource absolute path (e.g. "/redfish/v1/Systems/system").
+        """
+
+        try:
+            token = self.http.headers.get('X-Auth-Token')
+            resp = self.http.get(self.base_url + url, verify=False, timeout=self.timeout)
+            if resp.status_code == 401:
+                self.login(token)
+                resp = self.http.get(self.base_url + url, verify=False, timeout=self.timeout)
+            if resp.status_code >= 400:
+                return None, "Response Error: status_code: %d -- %s" % (resp.status_code, resp.reason)
+            return resp.json(), ""
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return None, str(e)
+
+
+def get_session(hostname, username, password, max_connections=8):
+    r"""
+    Return the open redfish session for the host and user, creating it if necessary.
+
+    Description of argument(s):
+    See redfish_session.__init__ for details.
+    """
+
+    key = (hostname, username)
+    with sessions_lock:
+        session = sessions.get(key)
+        if session is None or session.password != password:
+            session = redfish_session(hostname, username, password, max_connections)
+            sessions[key] = session
+        return session
+
+
+@atexit.register
+def close_sessions(hostname=None):
+    r"""
+    Log out of the open redfish sessions.  The collector calls this once it is done with a host since
+    atexit handlers do not run in multi-host worker processes.
+
+    Description of argument(s):
+    hostname          Name/IP of the BMC whose sessions are to be closed.  By default, all sessions are
+                      closed.
+    """
+
+    with sessions_lock:
+        for key in [key for key in sessions if hostname is None or key[0] == hostname]:
+            sessions.pop(key).logout()
+
+
+def get_request(hostname, username, password, url, return_json="json"):
+    r"""
+    Perform a GET request and return the resource data.  This is the equivalent of running "redfishtool -S
+    Always raw GET <url>".
+
+    On error, the error message is returned instead.
+
+    Description of argument(s):
+    hostname          Name/IP of the BMC.
+    username          Redfish user name.
+    password          Redfish password.
+    url               URI resource absolute path (e.g.
+                      "/redfish/v1/AccountService/Accounts").
+    return_json       Indicates whether the result should be
+                      returned as a json string or as a
+                      dictionary.
+    """
+
+    try:
+        data, error = get_session(hostname, username, password).get(url)
+    except (requests.exceptions.RequestException, KeyError) as e:
+        data, error = None, str(e)
+    if data is None:
+        print('\n\t\tERROR with GET %s ' % url)
+        print('\t\t' + error)
+        return error
+    if return_json == "json":
+        return json.dumps(data, indent=4)
+    return data
+
+
+def resource_file_path(store_dir, url):
+    r"""
+    Return the path of the file in which the resource's data is to be stored.
+
+    Example: /redfish/v1/Systems/system -> <store_dir>/redfish_v1_Systems_system.json
+
+    Description of argument(s):
+    store_dir         Directory in which the resource files are stored.
+    url               URI resource absolute path.
+    """
+
+    return os.path.join(store_dir, url.strip('/').replace('/', '_') + ".json")
+
+
+def walk_nested_dict(data, url, result, pending_enumeration):
+    r"""
+    Parse through the nested dictionary and get the resource id paths.
+
+    This is redfish.walk_nested_dict with its state passed in rather than held in module variables.
+
+    Description of argument(s):
+    data                  Nested dictionary data from response message.
+    url                   Resource for which the response is obtained in data.
+    result                Dictionary of enumerated data to be updated.
+    pending_enumeration   Set of resources yet to be enumerated to be updated.
+    """
+    url = url.rstrip('/')
+
+    for key, value in data.items():
+
+        # Recursion if nested dictionary found.
+        if isinstance(value, dict):
+            walk_nested_dict(value, '', result, pending_enumeration)
+        else:
+            # Value contains a list of dictionaries having member data.
+            if 'Members' == key:
+                if isinstance(value, list):
+                    for memberDict in value:
+                        if isinstance(memberDict, str):
+                            pending_enumeration.add(memberDict)
+                        else:
+                            pending_enumeration.add(memberDict['@odata.id'])
+
+            if '@odata.id' == key:
+                value = value.rstrip('/')
+                # Data for the given url.
+                if value == url:
+                    result[url] = data
+                # Data still needs to be looked up,
+                else:
+                    pending_enumeration.add(value)
+
+
+def enumerate_request(hostname, username, password, url, return_json="json", store_dir="",
+                      max_workers=8):
+    r"""
+    Perform a GET enumerate request and return available resource paths.  The result is the same as that of
+    redfish.enumerate_request.
+
+    Up to max_workers resources are fetched at the same time over the host's session.  Newly discovered
+    resources are requested as soon as the response which links to them arrives.
+
+    Description of argument(s):
+    hostname          Name/IP of the BMC.
+    username          Redfish user name.
+    password          Redfish password.
+    url               URI resource absolute path (e.g.
+                      "/redfish/v1/SessionService/Sessions").
+    return_json       Indicates whether the result should be
+                      returned as a json string or as a
+                      dictionary.
+    store_dir         If set, the data of each resource is also written,
+                      as soon as it is received, to its own JSON file in
+                      this directory (see resource_file_path).
+    max_workers       Maximum number of concurrent GET requests.
+    """
+
+    result = {}
+    pending_enumeration = {url}
+    # Resources which have been requested or skipped.
+    enumerated_resources = set()
+    max_workers = int(max_workers)
+
+    try:
+        session = get_session(hostname, username, password, max_workers)
+    except (requests.exceptions.RequestException, KeyError) as e:
+        print('\n\t\tERROR with redfish login to %s ' % hostname)
+        print('\t\t' + str(e))
+        session = None
+    if store_dir:
+        os.makedirs(store_dir, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        while session:
+            for resource in sorted(pending_enumeration - enumerated_resources):
+                enumerated_resources.add(resource)
+                if any(string in resource for string in skip_enumeration_strings):
+                    continue
+                futures[executor.submit(session.get, resource)] = resource
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                resource = futures.pop(future)
+                data, error = future.result()
+                # Enumeration is done for available resources ignoring the
+                # ones for which response is not obtained.
+                if not isinstance(data, dict):
+                    continue
+                if store_dir:
+                    with open(resource_file_path(store_dir, resource), 'w') as file:
+                        json.dump(data, file, indent=4)
+                walk_nested_dict(data, resource, result, pending_enumeration)
+
+    if return_json == "json":
+        return json.dumps(result, sort_keys=True,
+                          indent=4, separators=(',', ': '))
+    else:
+        return result
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+r"""
+This module runs FFDC collections in the background so that a boot test loop need not wait for them.
+"""
+
+import os
+import re
+import time
+import shutil
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import slot_lock as sl
+
+
+class async_ffdc_queue(object):
+    r"""
+    A queue of background FFDC collections.
+
+    Each collection is a command (e.g. ffdc/collect_ffdc.py) which is run as a separate, low priority process
+    by one of max_workers threads.  The threads do nothing but start the processes and wait for them so no
+    robot keywords are ever run outside of the caller's thread.  Each collection is identified by the number
+    of the boot whose failure it documents.
+
+    Example code:
+
+    queue = async_ffdc_queue(max_workers=1)
+    queue.submit(boot_count, "REST Power On", cmd_buf, "/tmp/ffdc.log")
+    ...
+    for job in queue.harvest():
+        print(job['boot_count'], job['rc'])
+    ...
+    for job in queue.wait():
+        print(job['boot_count'], job['rc'])
+    """
+
+    def __init__(self,
+                 max_workers=1,
+                 nice_level=19,
+                 slot_dir_path="",
+                 max_concurrent=0):
+        r"""
+        Description of argument(s):
+        max_workers                 The maximum number of collections to run at the same time.
+        nice_level                  The nice value of the collection processes.  The processes are also given
+                                    the idle I/O scheduling class if ionice is available, so that they do not
+                                    perturb the timing of the boots which run alongside them.
+        slot_dir_path               The directory of the slot_lock which caps the number of FFDC collections
+                                    running at the same time across programs (see slot_lock.py).
+        max_concurrent              The number of slots of that lock.  0 means that no slot is needed.
+        """
+
+        self.max_workers = max(int(max_workers), 1)
+        self.nice_level = int(nice_level)
+        self.slot_dir_path = slot_dir_path
+        self.max_concurrent = int(max_concurrent)
+        self.__executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.__lock = threading.Lock()
+        self.__futures = []
+        self.__finished_jobs = []
+
+    def priority_prefix(self):
+        r"""
+        Return the command prefix used to lower the CPU and I/O priority of the collection processes.
+        """
+
+        prefix = ['nice', '-n', str(self.nice_level)]
+        if shutil.which('ionice'):
+            prefix += ['ionice', '-c', '3']
+        return prefix
+
+    def submit(self,
+               boot_count,
+               boot_type,
+               cmd_buf,
+               log_file_path,
+               env=None,
+               time_out=None):
+        r"""
+        Queue a collection and return its job dictionary.
+
+        The job dictionary is filled in as the collection runs.  Its fields are boot_count, boot_type,
+        cmd_buf, log_file_path, rc, wait_time (the time spent waiting for a slot), elapsed and ffdc_dir_path
+        (the directory in which the collector reported storing its files, if any).
+
+        Description of argument(s):
+        boot_count                  The number of the boot whose failure the collection documents.
+        boot_type                   The type of that boot (e.g. "REST Power On").
+        cmd_buf                     The collection command as a list of arguments.
+        log_file_path               The file to which the command's stdout and stderr are to be written.
+        env                         The environment of the command.  The default is os.environ.
+        time_out                    The maximum number of seconds the command may run before it is killed.
+        """
+
+        job = {'boot_count': boot_count,
+               'boot_type': boot_type,
+               'cmd_buf': cmd_buf,
+               'log_file_path': log_file_path,
+               'rc': None,
+               'wait_time': 0.0,
+               'elapsed': 0.0,
+               'ffdc_dir_path': ""}
+        future = self.__executor.submit(self.__run, job, env, time_out)
+        with self.__lock:
+            self.__futures.append(future)
+        return job
+
+    def __run(self, job, env, time_out):
+        slot = None
+        if self.max_concurrent:
+            slot = sl.slot_lock(self.slot_dir_path, self.max_concurrent, "ffdc")
+            slot.acquire()
+            job['wait_time'] = slot.wait_time
+        start_time = time.time()
+        try:
+            with open(job['log_file_path'], 'w') as log_file:
+                sub_proc = subprocess.Popen(self.priority_prefix() + job['cmd_buf'], stdout=log_file,
+                                            stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, env=env)
+                try:
+                    job['rc'] = sub_proc.wait(timeout=time_out)
+                except subprocess.TimeoutExpired:
+                    sub_proc.kill()
+                    sub_proc.wait()
+                    job['rc'] = -9
+        except OSError as e:
+            job['rc'] = -1
+            with open(job['log_file_path'], 'a') as log_file:
+                log_file.write(str(e) + "\n")
+        finally:
+            if slot is not None:
+                slot.release()
+        job['elapsed'] = time.time() - start_time
+        try:
+            with open(job['log_file_path'], 'r') as log_file:
+                match = re.search(r"Files are stored in (\S+)", log_file.read())
+            if match:
+                job['ffdc_dir_path'] = match.group(1)
+        except OSError:
+            pass
+        with self.__lock:
+            self.__finished_jobs.append(job)
+        return job
+
+    def num_pending(self):
+        r"""
+        Return the number of collections which are queued or running.
+        """
+
+        with self.__lock:
+            return len([future for future in self.__futures if not future.done()])
+
+    def harvest(self):
+        r"""
+        Return the job dictionaries of the collections which have finished since the last call, in boot
+        order.  This function does not wait.
+        """
+
+        with self.__lock:
+            finished_jobs = self.__finished_jobs
+            self.__finished_jobs = []
+            self.__futures = [future for future in self.__futures if not future.done()]
+        return sorted(finished_jobs, key=lambda job: job['boot_count'])
+
+    def wait(self):
+        r"""
+        Wait for all queued collections to finish and return the job dictionaries of the collections which
+        have finished since the last call to harvest, in boot order.
+        """
+
+        with self.__lock:
+            futures = list(self.__futures)
+        for future in futures:
+            future.result()
+        return self.harvest()
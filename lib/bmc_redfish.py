@@ -117,6 +117,8 @@ class bmc_redfish(redfish_plus):
 
     def logout(self):
 
+        # Cached responses may depend on the privileges of the session being ended.
+        self.invalidate_response_cache()
         if MTLS_ENABLED == 'True':
             return None
         else:
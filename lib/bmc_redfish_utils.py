@@ -6,10 +6,19 @@ BMC redfish utility functions.
 
 import json
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from redfish.rest.v1 import HttpClient
+from redfish_plus import valid_http_status_code
 from robot.libraries.BuiltIn import BuiltIn
 import gen_print as gp
 
 MTLS_ENABLED = BuiltIn().get_variable_value("${MTLS_ENABLED}")
+# The number of concurrent GET requests issued by enumerate_request.  A value of 1 keeps the traditional
+# serial enumeration.
+ENUMERATE_MAX_WORKERS = BuiltIn().get_variable_value("${REDFISH_ENUMERATE_MAX_WORKERS}", default=1)
+# The status codes which enumerate_request tolerates.  Any other status (e.g. 401) fails the enumeration.
+ENUMERATE_VALID_STATUS_CODES = [200, 404, 405, 500]
 
 
 class bmc_redfish_utils(object):
@@ -247,10 +256,15 @@ class bmc_redfish_utils(object):
         return list(sorted(self.__pending_enumeration))
 
     def enumerate_request(self, resource_path, return_json=1,
-                          include_dead_resources=False):
+                          include_dead_resources=False, max_workers=None):
         r"""
         Perform a GET enumerate request and return available resource paths.
 
+        The resource tree is walked breadth first.  When max_workers is greater than 1, each level of the
+        tree is fetched concurrently by a bounded pool of worker threads which share the current redfish
+        session.  The responses are processed in the same order as the serial walk so the returned data is
+        identical either way.
+
         Description of argument(s):
         resource_path               URI resource absolute path (e.g.
                                     "/redfish/v1/SessionService/Sessions").
@@ -259,11 +273,18 @@ class bmc_redfish_utils(object):
                                     dictionary.
         include_dead_resources      Check and return a list of dead/broken URI
                                     resources.
+        max_workers                 The maximum number of GET requests to have
+                                    in flight at one time.  This defaults to
+                                    ${REDFISH_ENUMERATE_MAX_WORKERS} or 1 if
+                                    that variable is not set.
         """
 
         gp.qprint_executing(style=gp.func_line_style_short)
 
         return_json = int(return_json)
+        if max_workers is None:
+            max_workers = ENUMERATE_MAX_WORKERS
+        max_workers = max(int(max_workers), 1)
 
         # Set quiet variable to keep subordinate get() calls quiet.
         quiet = 1
@@ -285,38 +306,48 @@ class bmc_redfish_utils(object):
 
         resources_to_be_enumerated = (resource_path,)
 
-        while resources_to_be_enumerated:
-            for resource in resources_to_be_enumerated:
+        if max_workers > 1:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            self.__worker_data = threading.local()
+
+        try:
+            while resources_to_be_enumerated:
                 # JsonSchemas, SessionService or URLs containing # are not
                 # required in enumeration.
                 # Example: '/redfish/v1/JsonSchemas/' and sub resources.
                 #          '/redfish/v1/SessionService'
                 #          '/redfish/v1/Managers/bmc#/Oem'
-                if ('JsonSchemas' in resource) or ('SessionService' in resource)\
-                        or ('PostCodes' in resource) or ('Registries' in resource)\
-                        or ('Journal' in resource)\
-                        or ('#' in resource):
-                    continue
-
-                self._rest_response_ = \
-                    self._redfish_.get(resource, valid_status_codes=[200, 404, 405, 500])
-                # Enumeration is done for available resources ignoring the
-                # ones for which response is not obtained.
-                if self._rest_response_.status != 200:
-                    if include_dead_resources:
-                        try:
-                            dead_resources[self._rest_response_.status].append(
-                                resource)
-                        except KeyError:
-                            dead_resources[self._rest_response_.status] = \
-                                [resource]
-                    continue
-
-                self.walk_nested_dict(self._rest_response_.dict, url=resource)
-
-            enumerated_resources.update(set(resources_to_be_enumerated))
-            resources_to_be_enumerated = \
-                tuple(self.__pending_enumeration - enumerated_resources)
+                resource_list = [resource for resource in resources_to_be_enumerated
+                                 if not (('JsonSchemas' in resource) or ('SessionService' in resource)
+                                         or ('PostCodes' in resource) or ('Registries' in resource)
+                                         or ('Journal' in resource)
+                                         or ('#' in resource))]
+
+                if max_workers > 1:
+                    # executor.map yields the responses in resource_list order.
+                    responses = executor.map(self.enumeration_worker_get, resource_list)
+                else:
+                    responses = map(self.enumeration_get, resource_list)
+
+                for resource, (status, data) in zip(resource_list, responses):
+                    # Enumeration is done for available resources ignoring the
+                    # ones for which response is not obtained.
+                    if status != 200:
+                        if include_dead_resources:
+                            try:
+                                dead_resources[status].append(resource)
+                            except KeyError:
+                                dead_resources[status] = [resource]
+                        continue
+
+                    self.walk_nested_dict(data, url=resource)
+
+                enumerated_resources.update(set(resources_to_be_enumerated))
+                resources_to_be_enumerated = \
+                    tuple(self.__pending_enumeration - enumerated_resources)
+        finally:
+            if max_workers > 1:
+                executor.shutdown(wait=True)
 
         if return_json:
             if include_dead_resources:
@@ -331,6 +362,54 @@ class bmc_redfish_utils(object):
             else:
                 return self.__result
 
+    def enumeration_get(self, resource):
+        r"""
+        Perform a GET request for enumerate_request and return the status and the response dictionary.
+
+        Description of argument(s):
+        resource                    URI resource absolute path (e.g. "/redfish/v1/Managers/bmc").
+        """
+
+        # Set quiet variable to keep subordinate get() calls quiet.
+        quiet = 1
+        self._rest_response_ = \
+            self._redfish_.get(resource, valid_status_codes=ENUMERATE_VALID_STATUS_CODES)
+        if self._rest_response_.status != 200:
+            return self._rest_response_.status, None
+        return self._rest_response_.status, self._rest_response_.dict
+
+    def enumeration_worker_get(self, resource):
+        r"""
+        Perform a GET request from an enumerate_request worker thread and return the status and the response
+        dictionary.
+
+        Robot logging is not available to worker threads so the request bypasses the redfish_plus wrappers.
+        Each worker thread lazily creates its own HttpClient which re-uses the session key of the global
+        redfish object.  The worker client is never given the session location so it can not log out the
+        shared session.
+
+        As with enumeration_get, a ValueError is raised for a status code not in ENUMERATE_VALID_STATUS_CODES.
+        executor.map re-raises it in enumerate_request.
+
+        Description of argument(s):
+        resource                    URI resource absolute path (e.g. "/redfish/v1/Managers/bmc").
+        """
+
+        if MTLS_ENABLED == 'True':
+            response = self._redfish_.get_with_mtls(resource)
+        else:
+            client = getattr(self.__worker_data, 'client', None)
+            if client is None:
+                client = HttpClient(self._redfish_.get_base_url(),
+                                    sessionkey=self._redfish_.get_session_key())
+                self.__worker_data.client = client
+            response = client.get(resource)
+
+        valid_http_status_code(response.status, ENUMERATE_VALID_STATUS_CODES)
+        if response.status != 200:
+            return response.status, None
+        return response.status, response.dict
+
     def walk_nested_dict(self, data, url=''):
         r"""
         Parse through the nested dictionary and get the resource id paths.
@@ -10,6 +10,30 @@ import gen_robot_ssh as grs
 from robot.libraries.BuiltIn import BuiltIn
 
 
+def ssh_session_pool_enabled():
+    r"""
+    Return True if SSH commands are to be run by the paramiko session pool (see ssh_session_pool.py) rather
+    than by SSHLibrary.  This is controlled by the SSH_SESSION_POOL environment variable or robot variable.
+    """
+
+    return bool(int(os.environ.get('SSH_SESSION_POOL', 0))
+                or int(BuiltIn().get_variable_value("${SSH_SESSION_POOL}", default=0)))
+
+
+def get_execute_ssh_command(fork=0):
+    r"""
+    Return the function which is to run an SSH command: grs.execute_pooled_ssh_command if the session pool
+    is enabled or grs.execute_ssh_command otherwise.  The latter is always used for forked commands.
+
+    Description of argument(s):
+    fork                            See bmc_execute_command for details.
+    """
+
+    if not fork and ssh_session_pool_enabled():
+        return grs.execute_pooled_ssh_command
+    return grs.execute_ssh_command
+
+
 def bmc_execute_command(cmd_buf,
                         print_out=0,
                         print_err=0,
@@ -67,9 +91,9 @@ def bmc_execute_command(cmd_buf,
         BuiltIn().get_variable_value("${USER_TYPE}", default="")
     if openbmc_user_type == 'sudo':
         cmd_buf = 'sudo -i ' + cmd_buf
-    return grs.execute_ssh_command(cmd_buf, open_connection_args, login_args,
-                                   print_out, print_err, ignore_err, fork,
-                                   quiet, test_mode, time_out)
+    return get_execute_ssh_command(fork)(cmd_buf, open_connection_args, login_args,
+                                         print_out, print_err, ignore_err, fork,
+                                         quiet, test_mode, time_out)
 
 
 def os_execute_command(cmd_buf,
@@ -125,9 +149,9 @@ def os_execute_command(cmd_buf,
     open_connection_args = {'host': os_host, 'alias': 'os_connection'}
     login_args = {'username': os_username, 'password': os_password}
 
-    return grs.execute_ssh_command(cmd_buf, open_connection_args, login_args,
-                                   print_out, print_err, ignore_err, fork,
-                                   quiet, test_mode, time_out)
+    return get_execute_ssh_command(fork)(cmd_buf, open_connection_args, login_args,
+                                         print_out, print_err, ignore_err, fork,
+                                         quiet, test_mode, time_out)
 
 
 def xcat_execute_command(cmd_buf,
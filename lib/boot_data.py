@@ -6,7 +6,10 @@ boot_results_table.
 """
 
 import os
+import re
+import copy
 import tempfile
+import hashlib
 import json
 import glob
 from tally_sheet import *
@@ -22,6 +25,7 @@ import gen_valid as gv
 import gen_misc as gm
 import gen_cmd as gc
 import var_funcs as vf
+import state as st
 
 # The code base directory will be one level up from the directory containing this module.
 code_base_dir_path = os.path.dirname(os.path.dirname(__file__)) + os.sep
@@ -33,25 +37,14 @@ platform_arch_type = os.environ.get('PLATFORM_ARCH_TYPE', '') or \
     BuiltIn().get_variable_value("${PLATFORM_ARCH_TYPE}", default="power")
 
 
-def create_boot_table(file_path=None,
-                      os_host=""):
+def get_boot_table_path(file_path=None):
     r"""
-    Read the boot table JSON file, convert it to an object and return it.
-
-    Note that if the user is running without a global OS_HOST robot variable specified, this function will
-    remove all of the "os_" start and end state requirements from the JSON data.
+    Return the absolute path of the boot table JSON file.
 
     Description of argument(s):
-    file_path                       The path to the boot_table file.  If this value is not specified, it will
-                                    be obtained from the "BOOT_TABLE_PATH" environment variable, if set.
-                                    Otherwise, it will default to "data/boot_table.json".  If this value is a
-                                    relative path, this function will use the code_base_dir_path as the base
-                                    directory (see definition above).
-    os_host                         The host name or IP address of the host associated with the machine being
-                                    tested.  If the user is running without an OS_HOST (i.e. if this argument
-                                    is blank), we remove os starting and ending state requirements from the
-                                    boot entries.
+    file_path                       See create_boot_table for details.
     """
+
     if file_path is None:
         if redfish_support_trans_state and platform_arch_type != "x86":
             file_path = os.environ.get('BOOT_TABLE_PATH', 'data/boot_table_redfish.json')
@@ -63,15 +56,24 @@ def create_boot_table(file_path=None,
     if not file_path.startswith("/"):
         file_path = code_base_dir_path + file_path
 
-    # Pre-process the file by removing blank lines and comment lines.
-    temp = tempfile.NamedTemporaryFile()
-    temp_file_path = temp.name
+    return file_path
+
+
+def read_boot_table_file(file_path,
+                         os_host=""):
+    r"""
+    Read the boot table JSON file, ignoring blank lines and comment lines, and return the enhanced boot table
+    (see create_boot_table for details).
 
-    cmd_buf = "egrep -v '^[ ]*$|^[ ]*#' " + file_path + " > " + temp_file_path
-    gc.cmd_fnc_u(cmd_buf, quiet=1)
+    Description of argument(s):
+    file_path                       The absolute path to the boot_table file.
+    os_host                         See create_boot_table for details.
+    """
 
-    boot_file = open(temp_file_path)
-    boot_table = json.load(boot_file, object_hook=DotDict)
+    # Pre-process the file by removing blank lines and comment lines.
+    with open(file_path) as boot_file:
+        json_text = ''.join(line for line in boot_file if not re.match(r"^[ ]*($|#)", line))
+    boot_table = json.loads(json_text, object_hook=DotDict)
 
     # If the user is running without an OS_HOST, we remove os starting and ending state requirements from
     # the boot entries.
@@ -92,6 +94,276 @@ def create_boot_table(file_path=None,
     return enhanced_boot_table
 
 
+def create_boot_table(file_path=None,
+                      os_host=""):
+    r"""
+    Read the boot table JSON file, convert it to an object and return it.
+
+    Note that if the user is running without a global OS_HOST robot variable specified, this function will
+    remove all of the "os_" start and end state requirements from the JSON data.
+
+    The file is only read once per process (see load_boot_table_index).  Each caller gets its own copy of the
+    boot table.
+
+    Description of argument(s):
+    file_path                       The path to the boot_table file.  If this value is not specified, it will
+                                    be obtained from the "BOOT_TABLE_PATH" environment variable, if set.
+                                    Otherwise, it will default to "data/boot_table.json".  If this value is a
+                                    relative path, this function will use the code_base_dir_path as the base
+                                    directory (see definition above).
+    os_host                         The host name or IP address of the host associated with the machine being
+                                    tested.  If the user is running without an OS_HOST (i.e. if this argument
+                                    is blank), we remove os starting and ending state requirements from the
+                                    boot entries.
+    """
+
+    return copy.deepcopy(load_boot_table_index(file_path, os_host).boot_table)
+
+
+class boot_table_index:
+
+    r"""
+    This class defines an index of a boot table which answers the boot selection questions asked by
+    obmc_boot_test (which boots may start from a given state, which boot leads to which) with lookups rather
+    than by scanning the whole boot table.
+
+    The index consists of:
+    - The distinct start states of the boot table, each with the list of boots which share it.
+    - A transition graph which maps each boot to the boots whose start state is matched by its end state.
+    - A cache of the boots which may start from a given state, keyed by the state's signature (i.e. the
+      values of the state fields used by the start states).
+    """
+
+    def __init__(self,
+                 boot_table,
+                 transitions=None):
+        r"""
+        Create the index.
+
+        Description of argument(s):
+        boot_table                  A boot table such as is returned by create_boot_table.
+        transitions                 A previously computed transition graph (see to_dict).  If this is None,
+                                    the graph is computed from the boot table.
+        """
+
+        self.boot_table = boot_table
+        # A list of [start match state, boot names] pairs.
+        self.__start_groups = []
+        signature_keys = set()
+        signature_all_keys = False
+        for boot, boot_entry in boot_table.items():
+            start = boot_entry['start']
+            for group in self.__start_groups:
+                if group[0] == start:
+                    group[1].append(boot)
+                    break
+            else:
+                self.__start_groups.append([start, [boot]])
+            if st.expressions_key() in start:
+                # Expressions may refer to any state field.
+                signature_all_keys = True
+            signature_keys.update(start.keys())
+        self.__signature_keys = None if signature_all_keys else sorted(signature_keys)
+        self.__start_cache = {}
+
+        if transitions is None:
+            transitions = self.compute_transitions()
+        self.transitions = transitions
+        # The reverse of the transition graph.
+        self.__predecessors = {boot: [] for boot in boot_table}
+        for boot, next_boots in transitions.items():
+            for next_boot in next_boots:
+                self.__predecessors[next_boot].append(boot)
+
+    def compute_transitions(self):
+        r"""
+        Return the transition graph of the boot table as a dictionary which maps each boot to the list of
+        boots whose start state matches its end state.
+
+        The end state of a boot is taken with its regular expression anchors stripped, as is done when
+        simulating a boot in test mode.
+        """
+
+        transitions = DotDict()
+        for boot, boot_entry in self.boot_table.items():
+            end_state = st.strip_anchor_state(boot_entry['end'])
+            transitions[boot] = []
+            for start, boots in self.__start_groups:
+                if st.compare_states(end_state, start):
+                    transitions[boot] += boots
+        return transitions
+
+    def state_signature(self,
+                        state):
+        r"""
+        Return a hashable signature of the state fields which the boot table's start states depend on.
+
+        Description of argument(s):
+        state                       A state dictionary such as the one returned by state.get_state.
+        """
+
+        if self.__signature_keys is None:
+            return tuple(sorted((key, str(value)) for key, value in state.items()))
+        return tuple(str(state.get(key, "\0")) for key in self.__signature_keys)
+
+    def startable_boots(self,
+                        state):
+        r"""
+        Return the set of boots whose start state matches the state.
+
+        Description of argument(s):
+        state                       A state dictionary such as the one returned by state.get_state.
+        """
+
+        signature = self.state_signature(state)
+        boots = self.__start_cache.get(signature)
+        if boots is None:
+            boots = set()
+            for start, group_boots in self.__start_groups:
+                if st.compare_states(state, start):
+                    boots.update(group_boots)
+            self.__start_cache[signature] = boots
+        return boots
+
+    def boots_for_state(self,
+                        state,
+                        boot_list):
+        r"""
+        Return the boots from boot_list (in boot_list order) whose start state matches the state.
+
+        Description of argument(s):
+        state                       A state dictionary such as the one returned by state.get_state.
+        boot_list                   A list of boot names.
+        """
+
+        startable = self.startable_boots(state)
+        return [boot for boot in boot_list if boot in startable]
+
+    def transitional_boots(self,
+                           candidates,
+                           target_boot,
+                           boot_list):
+        r"""
+        Return the candidates which begin a shortest sequence of boots from boot_list leading to a state
+        from which target_boot may start.  An empty list is returned if there is no such sequence.
+
+        Description of argument(s):
+        candidates                  The boots which may start from the current state (see
+                                    boots_for_state).
+        target_boot                 The boot which is to be run eventually (e.g. the boot at the top of the
+                                    boot stack).
+        boot_list                   The boots which may be used for the transition.
+        """
+
+        allowed = set(boot_list)
+        # Breadth-first search backward from target_boot: distance[boot] is the number of boots needed to get
+        # from the start of boot to the start of target_boot.
+        distance = {}
+        frontier = [boot for boot in self.__predecessors.get(target_boot, []) if boot in allowed]
+        for boot in frontier:
+            distance[boot] = 1
+        while frontier:
+            next_frontier = []
+            for boot in frontier:
+                for prior_boot in self.__predecessors[boot]:
+                    if prior_boot in allowed and prior_boot not in distance:
+                        distance[prior_boot] = distance[boot] + 1
+                        next_frontier.append(prior_boot)
+            frontier = next_frontier
+
+        reachable = [boot for boot in candidates if boot in distance]
+        if not reachable:
+            return []
+        shortest = min(distance[boot] for boot in reachable)
+        return [boot for boot in reachable if distance[boot] == shortest]
+
+    def to_dict(self):
+        r"""
+        Return the index as a dictionary which can be serialized (e.g. to JSON) and passed to from_dict.
+        """
+
+        return {'boot_table': self.boot_table, 'transitions': self.transitions}
+
+    @classmethod
+    def from_dict(cls, index_dict):
+        r"""
+        Create an index from a dictionary returned by to_dict.
+
+        Description of argument(s):
+        index_dict                  A dictionary returned by to_dict.
+        """
+
+        return cls(index_dict['boot_table'], index_dict['transitions'])
+
+
+# Boot table indexes keyed by (file path, file mtime, os host blank).
+boot_table_indexes = {}
+# Increment this when the layout of the boot table index cache file changes.
+boot_table_index_version = 1
+
+
+def get_boot_table_index_cache_path(file_path,
+                                    os_host=""):
+    r"""
+    Return the path of the file in which the boot table index for the given boot table is cached.
+
+    Description of argument(s):
+    file_path                       The absolute path to the boot_table file.
+    os_host                         See create_boot_table for details.
+    """
+
+    cache_id = hashlib.md5((file_path + ":" + str(os_host == "")).encode('utf-8')).hexdigest()
+    return os.path.join(tempfile.gettempdir(), "boot_table_index_" + cache_id + ".json")
+
+
+def load_boot_table_index(file_path=None,
+                          os_host=""):
+    r"""
+    Return a boot_table_index object for the boot table file.
+
+    The index is built once per process.  It is also saved to a cache file keyed on the boot table file's
+    modification time so that later processes which use the same boot table can skip parsing it and computing
+    its transition graph.
+
+    Description of argument(s):
+    file_path                       See create_boot_table for details.
+    os_host                         See create_boot_table for details.
+    """
+
+    file_path = get_boot_table_path(file_path)
+    mtime = os.path.getmtime(file_path)
+    key = (file_path, mtime, os_host == "")
+    index = boot_table_indexes.get(key)
+    if index is not None:
+        return index
+
+    cache_path = get_boot_table_index_cache_path(file_path, os_host)
+    try:
+        with open(cache_path) as cache_file:
+            cache = json.load(cache_file, object_hook=DotDict)
+        if cache['version'] == boot_table_index_version and cache['file_path'] == file_path \
+                and cache['mtime'] == mtime:
+            index = boot_table_index.from_dict(cache)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if index is None:
+        index = boot_table_index(read_boot_table_file(file_path, os_host))
+        cache = index.to_dict()
+        cache.update({'version': boot_table_index_version, 'file_path': file_path, 'mtime': mtime})
+        try:
+            temp_path = cache_path + "." + str(os.getpid())
+            with open(temp_path, 'w') as cache_file:
+                json.dump(cache, cache_file)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # The cache is an optimization only.
+            pass
+
+    boot_table_indexes[key] = index
+    return index
+
+
 def create_valid_boot_list(boot_table):
     r"""
     Return a list of all of the valid boot types (e.g. ['REST Power On', 'REST Power Off', ...]).
@@ -250,6 +522,26 @@ class boot_results:
         self.__boot_results.inc_row_field(boot_type, boot_status.lower())
         self.__boot_results.calc()
 
+    def add_results(self,
+                    other):
+        r"""
+        Add the pass/fail counts of another boot_results object to this one.  This may be used to tally the
+        results of several systems.  The initial pass/fail values of the other object are not added.
+
+        Description of argument(s):
+        other                       The boot_results object whose counts are to be added.
+        """
+
+        table = self.__boot_results.return_table()
+        for boot_type, row in other.__boot_results.return_table().items():
+            if boot_type not in table:
+                self.__boot_results.add_row(boot_type)
+                table = self.__boot_results.return_table()
+            for field_key in ['pass', 'fail']:
+                self.__boot_results.update_row_field(boot_type, field_key,
+                                                     table[boot_type][field_key] + row[field_key])
+        self.__boot_results.calc()
+
     def sprint_report(self,
                       header_footer="\n"):
         r"""
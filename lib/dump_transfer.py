@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+
+r"""
+This module copies dump files from a BMC to the local system.  It is the backend of dump_utils.scp_dumps and
+dump_utils.redfish_download_dumps.
+
+Several dumps are copied at the same time.  Each dump is written to disk in fixed size chunks as it arrives
+so memory use does not depend on the size of the dump.  A copy which fails part way through (e.g. because of
+a network blip) is resumed from the end of the partial file, using an SFTP seek, a "tail -c" command or an
+HTTP Range request, rather than started again.  Each completed file is verified against the size (and
+optionally the SHA-256 checksum) of the dump on the BMC before it is given its final name.
+"""
+
+import os
+import re
+import errno
+import time
+import shlex
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import paramiko
+import requests
+import urllib3
+
+# BMCs typically have self-signed certificates.
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Errors after which a copy is resumed.
+transient_errors = (OSError, EOFError, paramiko.SSHException, requests.exceptions.RequestException)
+# The errno values of OSErrors (e.g. FileNotFoundError or paramiko's IOError for a missing file) which a
+# resume cannot fix.
+permanent_errnos = (errno.ENOENT, errno.EACCES, errno.EPERM)
+# The number of seconds to wait for each piece of data read by a command.
+READ_TIMEOUT = 60
+
+
+class ssh_source(object):
+    r"""
+    A dump file on a host which is read over an ssh_session_pool.ssh_session.
+
+    The file is read over SFTP if the host has an SFTP server.  Many BMCs run dropbear without one so, failing
+    that, the file is streamed by a "tail -c +<offset + 1>" command on an exec channel, which can likewise
+    resume from any offset.
+    """
+
+    # The (host, port) pairs of the hosts found to have no SFTP server.
+    no_sftp_hosts = set()
+
+    def __init__(self,
+                 ssh_session,
+                 file_path):
+        r"""
+        Description of argument(s):
+        ssh_session                 An ssh_session object (see ssh_session_pool.py) for the host.
+        file_path                   The path of the dump file on the host.
+        """
+
+        self.ssh_session = ssh_session
+        self.file_path = file_path
+
+    def __str__(self):
+        return self.ssh_session.host + ":" + self.file_path
+
+    def open(self,
+             offset,
+             chunk_size):
+        r"""
+        Return a tuple consisting of an iterator of the file's data starting at offset, the size of the file
+        and the offset at which the data actually starts.
+
+        Description of argument(s):
+        offset                      The number of bytes of the file which have already been copied.
+        chunk_size                  The number of bytes in each piece of data.
+        """
+
+        host_key = (self.ssh_session.host, self.ssh_session.port)
+        if host_key in self.no_sftp_hosts:
+            return self.__open_exec(offset, chunk_size)
+        try:
+            sftp = self.ssh_session.open_sftp()
+        except (paramiko.SSHException, EOFError):
+            if not self.ssh_session.healthy():
+                # The connection failed rather than the SFTP request so resume later.
+                raise
+            self.no_sftp_hosts.add(host_key)
+            return self.__open_exec(offset, chunk_size)
+        try:
+            file = sftp.open(self.file_path, 'rb')
+            size = file.stat().st_size
+            file.seek(offset)
+            # Ask for the rest of the file with several outstanding requests rather than one at a time.
+            file.prefetch(size)
+        except BaseException:
+            sftp.close()
+            raise
+        return self.__read_sftp(sftp, file, chunk_size), size, offset
+
+    @staticmethod
+    def __read_sftp(sftp, file, chunk_size):
+        try:
+            while True:
+                data = file.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            file.close()
+            sftp.close()
+
+    def __open_exec(self, offset, chunk_size):
+        quoted_file_path = shlex.quote(self.file_path)
+        stdout, stderr, rc = self.ssh_session.execute_command("stat -c %s " + quoted_file_path)
+        if rc != 0 or not stdout.strip().isdigit():
+            raise ValueError("Unable to get the size of " + str(self) + ":\n" + stderr)
+        channel = self.ssh_session.open_channel()
+        try:
+            channel.settimeout(READ_TIMEOUT)
+            channel.exec_command("tail -c +" + str(offset + 1) + " " + quoted_file_path)
+            channel.shutdown_write()
+        except BaseException:
+            channel.close()
+            raise
+        return self.__read_exec(channel, chunk_size), int(stdout), offset
+
+    def __read_exec(self, channel, chunk_size):
+        try:
+            while True:
+                data = channel.recv(chunk_size)
+                if not data:
+                    break
+                yield data
+            rc = channel.recv_exit_status()
+            if rc != 0:
+                raise OSError("The tail of " + str(self) + " failed with return code " + str(rc) + ".")
+        finally:
+            channel.close()
+
+    def sha256(self):
+        r"""
+        Return the SHA-256 checksum of the file as computed on the host.
+        """
+
+        stdout, stderr, rc = self.ssh_session.execute_command("sha256sum " + shlex.quote(self.file_path))
+        if rc != 0 or not stdout:
+            raise ValueError("Unable to get the checksum of " + str(self) + ":\n" + stderr)
+        return stdout.split()[0]
+
+
+class http_source(object):
+    r"""
+    A dump file which is downloaded by an HTTP GET request (e.g. a redfish dump entry's AdditionalDataURI).
+    """
+
+    def __init__(self,
+                 http,
+                 url,
+                 size=None,
+                 timeout=60):
+        r"""
+        Description of argument(s):
+        http                        The requests.Session object with which to make requests.  It must
+                                    already hold any needed authentication.
+        url                         The full URL of the file.
+        size                        The size of the file in bytes if known (e.g. a redfish dump entry's
+                                    AdditionalDataSizeBytes).
+        timeout                     The number of seconds to wait for the response and for each piece of
+                                    data.
+        """
+
+        self.http = http
+        self.url = url
+        self.size = None if size is None else int(size)
+        self.timeout = timeout
+
+    def __str__(self):
+        return self.url
+
+    def open(self,
+             offset,
+             chunk_size):
+        r"""
+        Return a tuple consisting of an iterator of the file's data starting at offset, the size of the file
+        (or None if it is not known) and the offset at which the data actually starts.  The data starts at 0
+        if the server does not honor Range requests.
+
+        Description of argument(s):
+        offset                      The number of bytes of the file which have already been copied.
+        chunk_size                  The number of bytes in each piece of data.
+        """
+
+        headers = {'Range': "bytes=" + str(offset) + "-"} if offset else {}
+        # A Session-level verify would be overridden by REQUESTS_CA_BUNDLE.
+        resp = self.http.get(self.url, headers=headers, stream=True, verify=False, timeout=self.timeout)
+        # A Content-Range header looks like "bytes 1024-4095/4096" or, for status 416, "bytes */4096".
+        match = re.search(r"/(\d+)$", resp.headers.get('Content-Range', ""))
+        if resp.status_code == 416 and match and int(match.group(1)) == offset:
+            # The file had already been copied in full.
+            resp.close()
+            return iter(()), offset, offset
+        if resp.status_code >= 500:
+            # The server may be briefly busy (e.g. while the dump manager restarts) so resume later.
+            resp.close()
+            raise requests.exceptions.HTTPError("GET " + self.url + " failed: status_code: "
+                                                + str(resp.status_code) + " -- " + resp.reason)
+        if resp.status_code not in (200, 206):
+            resp.close()
+            raise ValueError("GET " + self.url + " failed: status_code: " + str(resp.status_code) + " -- "
+                             + resp.reason)
+        if resp.status_code == 206:
+            size = int(match.group(1)) if match else self.size
+        else:
+            offset = 0
+            size = resp.headers.get('Content-Length')
+            size = self.size if size is None else int(size)
+        return self.__read(resp, chunk_size), size, offset
+
+    @staticmethod
+    def __read(resp, chunk_size):
+        try:
+            for data in resp.iter_content(chunk_size):
+                yield data
+        finally:
+            resp.close()
+
+    def sha256(self):
+        r"""
+        The server cannot compute checksums so only the size of downloaded files can be verified.
+        """
+
+        return None
+
+
+def file_sha256(file_path,
+                chunk_size=1048576):
+    r"""
+    Return the SHA-256 checksum of the local file.
+
+    Description of argument(s):
+    file_path                       The path of the file.
+    chunk_size                      The number of bytes to read at a time.
+    """
+
+    hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for data in iter(lambda: file.read(chunk_size), b""):
+            hash.update(data)
+    return hash.hexdigest()
+
+
+class dump_transfer(object):
+    r"""
+    A copier of dump files which copies up to max_workers files at the same time.
+
+    Example code:
+
+    session = ssh_session_pool.get_ssh_session_pool().get_session("bmc1", "root", "0penBmc")
+    transfer = dump_transfer(max_workers=3)
+    file_path = "/var/lib/phosphor-debug-collector/dumps/1/obmcdump_1_1508255216.tar.xz"
+    results = transfer.run([(ssh_source(session, file_path), "/tmp/obmcdump_1_1508255216.tar.xz")])
+    print(sprint_transfer_report(results))
+    """
+
+    def __init__(self,
+                 max_workers=3,
+                 chunk_size=1048576,
+                 max_attempts=5,
+                 retry_delay=5,
+                 verify_sha256=False):
+        r"""
+        Description of argument(s):
+        max_workers                 The maximum number of files copied at the same time.
+        chunk_size                  The number of bytes read from the source and written to disk at a time.
+        max_attempts                The number of times a copy is attempted (i.e. the first attempt plus the
+                                    number of resumes) before it is given up.
+        retry_delay                 The number of seconds to wait before resuming a copy.
+        verify_sha256               Indicates that each file is to be verified against the SHA-256 checksum
+                                    of its source in addition to its size.  This is ignored for sources which
+                                    cannot provide a checksum.
+        """
+
+        self.max_workers = max(int(max_workers), 1)
+        self.chunk_size = int(chunk_size)
+        self.max_attempts = max(int(max_attempts), 1)
+        self.retry_delay = float(retry_delay)
+        self.verify_sha256 = int(verify_sha256)
+
+    def copy(self,
+             source,
+             targ_file_path):
+        r"""
+        Copy the source to targ_file_path and return a result dictionary with the following keys:
+
+        source                      The source, as a string.
+        targ_file_path              The path of the copied file.
+        status                      "ok" or the reason the copy failed.
+        size                        The size of the file in bytes.
+        bytes_copied                The number of bytes copied by this call (excluding any bytes of a partial
+                                    file left by an earlier call).
+        attempts                    The number of attempts needed.
+        elapsed                     The number of seconds taken.
+        throughput                  bytes_copied / elapsed, in bytes per second.
+        sha256                      The file's SHA-256 checksum if it was verified, otherwise "".
+
+        The data is written to targ_file_path + ".part", which is renamed to targ_file_path once it has been
+        verified.  A ".part" file left by a failed copy is resumed by the next call for the same target.
+
+        Description of argument(s):
+        source                      An ssh_source or http_source object.
+        targ_file_path              The path of the local file to be created.
+        """
+
+        part_file_path = targ_file_path + ".part"
+        result = {'source': str(source), 'targ_file_path': targ_file_path, 'status': "ok", 'size': 0,
+                  'bytes_copied': 0, 'attempts': 0, 'elapsed': 0.0, 'throughput': 0.0, 'sha256': ""}
+        start_time = time.time()
+        size = None
+        while True:
+            result['attempts'] += 1
+            offset = os.path.getsize(part_file_path) if os.path.exists(part_file_path) else 0
+            try:
+                chunks, size, offset = source.open(offset, self.chunk_size)
+                with open(part_file_path, 'r+b' if os.path.exists(part_file_path) else 'wb') as file:
+                    file.seek(offset)
+                    file.truncate()
+                    for data in chunks:
+                        file.write(data)
+                        result['bytes_copied'] += len(data)
+                copied_size = os.path.getsize(part_file_path)
+                if size is None or copied_size == size:
+                    break
+                if copied_size > size:
+                    # The source changed since the partial file was written so start again.
+                    os.remove(part_file_path)
+                error = "Copied " + str(copied_size) + " of " + str(size) + " bytes."
+            except transient_errors as e:
+                if isinstance(e, OSError) and e.errno in permanent_errnos:
+                    # E.g. the dump was deleted after it was listed or cannot be read.
+                    result['status'] = str(e)
+                    break
+                error = str(e) or type(e).__name__
+            except ValueError as e:
+                result['status'] = str(e)
+                break
+            if result['attempts'] >= self.max_attempts:
+                result['status'] = error
+                break
+            time.sleep(self.retry_delay)
+
+        if result['status'] == "ok":
+            result['size'] = os.path.getsize(part_file_path)
+            if self.verify_sha256:
+                try:
+                    expected_sha256 = source.sha256()
+                except transient_errors + (ValueError,) as e:
+                    expected_sha256 = None
+                    result['status'] = str(e)
+                if expected_sha256 is not None:
+                    result['sha256'] = file_sha256(part_file_path, self.chunk_size)
+                    if result['sha256'] != expected_sha256:
+                        result['status'] = "The SHA-256 checksum " + result['sha256'] \
+                            + " does not match that of the source: " + expected_sha256
+                        # A resume cannot repair a corrupt file.
+                        os.remove(part_file_path)
+            if result['status'] == "ok":
+                os.replace(part_file_path, targ_file_path)
+
+        result['elapsed'] = time.time() - start_time
+        if result['elapsed'] > 0:
+            result['throughput'] = result['bytes_copied'] / result['elapsed']
+        return result
+
+    def run(self,
+            jobs):
+        r"""
+        Copy the files and return a list of result dictionaries (see copy) in the order of the jobs.
+
+        Description of argument(s):
+        jobs                        A list of (source, targ_file_path) tuples.
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.copy, source, targ_file_path) for source, targ_file_path in jobs]
+            return [future.result() for future in futures]
+
+
+def sprint_transfer_report(results):
+    r"""
+    Return a report of the results of dump_transfer.run with one line per file.
+
+    Example result:
+
+    status  size      elapsed  MB/s    attempts  file
+    ok      31644     0.41     0.08    1         /tmp/obmcdump_9_1603434773.tar.xz
+    ok      18432022  3.87     4.54    2         /tmp/obmcdump_10_1603434901.tar.xz
+
+    Description of argument(s):
+    results                         The list returned by dump_transfer.run.
+    """
+
+    buffer = "%-6s  %-10s  %-8s  %-6s  %-8s  %s\n" % ("status", "size", "elapsed", "MB/s", "attempts", "file")
+    for result in results:
+        status = "ok" if result['status'] == "ok" else "failed"
+        buffer += "%-6s  %-10d  %-8.2f  %-6.2f  %-8d  %s\n" \
+            % (status, result['size'], result['elapsed'], result['throughput'] / 1048576, result['attempts'],
+               result['targ_file_path'])
+        if status != "ok":
+            buffer += "        " + result['source'] + ": " + result['status'] + "\n"
+    return buffer
@@ -9,6 +9,9 @@ import gen_misc as gm
 import gen_robot_keyword as grk
 import bmc_ssh_utils as bsu
 import var_funcs as vf
+import dump_transfer as dt
+import ssh_session_pool as ssp
+import requests
 import os
 from robot.libraries.BuiltIn import BuiltIn
 import sys
@@ -94,14 +97,63 @@ def valid_dump(dump_id,
         BuiltIn().fail(gp.sprint_error(message))
 
 
+def get_dump_transfer():
+    r"""
+    Return a dump_transfer object (see dump_transfer.py) configured from the following environment or robot
+    variables:
+
+    DUMP_TRANSFER_MAX_WORKERS       The maximum number of dumps copied at the same time.  The default is 3.
+    DUMP_TRANSFER_VERIFY_SHA256     If set to 1, dumps copied over SSH are verified against the SHA-256
+                                    checksum of the dump on the BMC in addition to its size.
+    """
+
+    max_workers = int(os.environ.get('DUMP_TRANSFER_MAX_WORKERS', 0)) \
+        or int(BuiltIn().get_variable_value("${DUMP_TRANSFER_MAX_WORKERS}", default=0)) or 3
+    verify_sha256 = int(os.environ.get('DUMP_TRANSFER_VERIFY_SHA256', 0)) \
+        or int(BuiltIn().get_variable_value("${DUMP_TRANSFER_VERIFY_SHA256}", default=0))
+    return dt.dump_transfer(max_workers=max_workers, verify_sha256=verify_sha256)
+
+
+def run_dump_transfer(jobs,
+                      quiet=None):
+    r"""
+    Copy the dumps, print a report of the copies and return the list of the files copied.  A robot failure
+    is issued if any dump could not be copied.
+
+    Description of argument(s):
+    jobs                            A list of (source, targ_file_path) tuples (see dump_transfer.run).
+    quiet                           If quiet is set to 1, this function will
+                                    NOT write status messages to stdout.
+    """
+
+    quiet = int(gp.get_var_value(quiet, 0))
+    results = get_dump_transfer().run(jobs)
+    report = dt.sprint_transfer_report(results)
+    if not quiet:
+        gp.print_timen("Dump transfer report:")
+        gp.printn(report)
+
+    failures = [result for result in results if result['status'] != "ok"]
+    if failures:
+        message = "Unable to copy " + str(len(failures)) + " of " + str(len(results)) + " dumps:\n" + report
+        BuiltIn().fail(gp.sprint_error(message))
+
+    return [result['targ_file_path'] for result in results]
+
+
 def scp_dumps(targ_dir_path,
               targ_file_prefix="",
               dump_dict=None,
               quiet=None):
     r"""
-    SCP all dumps from the BMC to the indicated directory on the local system
+    Copy all dumps from the BMC to the indicated directory on the local system
     and return a list of the new files.
 
+    The dumps are copied concurrently over SFTP (or, if the BMC has no SFTP
+    server, a "tail -c" command) on a pooled SSH session (see
+    dump_transfer.py and get_dump_transfer).  An interrupted copy is resumed
+    rather than restarted.
+
     Description of argument(s):
     targ_dir_path                   The path of the directory to receive the
                                     dump files.
@@ -118,16 +170,94 @@ def scp_dumps(targ_dir_path,
     targ_dir_path = gm.add_trailing_slash(targ_dir_path)
 
     if dump_dict is None:
-        dump_list = get_dump_dict(quiet=quiet)
+        dump_dict = get_dump_dict(quiet=quiet)
+    dump_list = dump_dict.values() if isinstance(dump_dict, dict) else dump_dict
 
-    status, ret_values = grk.run_key("Open Connection for SCP", quiet=quiet)
+    openbmc_host = BuiltIn().get_variable_value("${OPENBMC_HOST}")
+    ssh_port = BuiltIn().get_variable_value("${SSH_PORT}", default="") or 22
+    openbmc_username = BuiltIn().get_variable_value("${OPENBMC_USERNAME}")
+    openbmc_password = BuiltIn().get_variable_value("${OPENBMC_PASSWORD}")
+    session = ssp.get_ssh_session_pool().get_session(openbmc_host, openbmc_username, openbmc_password,
+                                                     ssh_port)
 
-    dump_file_list = []
+    jobs = []
     for file_path in dump_list:
+        if not file_path:
+            continue
         targ_file_path = targ_dir_path + targ_file_prefix \
             + os.path.basename(file_path)
-        status, ret_values = grk.run_key("scp.Get File  " + file_path
-                                         + "  " + targ_file_path, quiet=quiet)
-        dump_file_list.append(targ_file_path)
+        jobs.append((dt.ssh_source(session, file_path), targ_file_path))
+
+    return run_dump_transfer(jobs, quiet=quiet)
+
+
+def redfish_download_dumps(targ_dir_path,
+                           targ_file_prefix="",
+                           dump_entries_uri="/redfish/v1/Managers/bmc/LogServices/Dump/Entries",
+                           quiet=None):
+    r"""
+    Download the attachments of all redfish dump entries of the given collection to the indicated
+    directory on the local system and return a list of the new files.
+
+    The attachments are streamed to disk concurrently (see dump_transfer.py and get_dump_transfer).  An
+    interrupted download is resumed with an HTTP Range request and each file is verified against the
+    entry's AdditionalDataSizeBytes.
+
+    Example robot program call:
+
+    ${dump_file_list}=  Redfish Download Dumps  ${FFDC_DIR_PATH}  ${FFDC_PREFIX}
+    ...  dump_entries_uri=/redfish/v1/Systems/system/LogServices/Dump/Entries
+
+    Description of argument(s):
+    targ_dir_path                   The path of the directory to receive the
+                                    dump files.
+    targ_file_prefix                Prefix which will be pre-pended to each
+                                    target file's name.
+    dump_entries_uri                The URI of the dump entry collection
+                                    (e.g. the BMC or the system dump entries).
+    quiet                           If quiet is set to 1, this function will
+                                    NOT write status messages to stdout.
+    """
+
+    targ_dir_path = gm.add_trailing_slash(targ_dir_path)
+
+    openbmc_host = BuiltIn().get_variable_value("${OPENBMC_HOST}")
+    https_port = BuiltIn().get_variable_value("${HTTPS_PORT}", default="") or 443
+    openbmc_username = BuiltIn().get_variable_value("${OPENBMC_USERNAME}")
+    openbmc_password = BuiltIn().get_variable_value("${OPENBMC_PASSWORD}")
+    base_url = "https://" + openbmc_host + ":" + str(https_port)
+
+    transfer = get_dump_transfer()
+    http = requests.Session()
+    http.auth = (openbmc_username, openbmc_password)
+    http.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=transfer.max_workers))
+
+    try:
+        # verify is passed with each request because REQUESTS_CA_BUNDLE overrides a Session-level verify.
+        resp = http.get(base_url + dump_entries_uri + "?$expand=.($levels=1)", verify=False, timeout=60)
+        if resp.status_code >= 400:
+            # Builds without query parameter support reject $expand.  Their plain collection embeds the
+            # full members.
+            resp = http.get(base_url + dump_entries_uri, verify=False, timeout=60)
+        resp.raise_for_status()
+        entries = resp.json().get('Members', [])
+        # Servers which ignore $expand may return only the entry links.
+        for ix, entry in enumerate(entries):
+            if 'AdditionalDataURI' not in entry:
+                resp = http.get(base_url + entry['@odata.id'], verify=False, timeout=60)
+                resp.raise_for_status()
+                entries[ix] = resp.json()
+
+        # E.g. "/redfish/v1/Systems/system/LogServices/Dump/Entries" yields file names like "dump_system_4".
+        owner = dump_entries_uri.strip("/").split("/")[3]
+        jobs = []
+        for entry in entries:
+            if 'AdditionalDataURI' not in entry:
+                continue
+            targ_file_path = targ_dir_path + targ_file_prefix + "dump_" + owner + "_" + entry['Id']
+            jobs.append((dt.http_source(http, base_url + entry['AdditionalDataURI'],
+                                        entry.get('AdditionalDataSizeBytes')), targ_file_path))
 
-    return dump_file_list
+        return run_dump_transfer(jobs, quiet=quiet)
+    finally:
+        http.close()
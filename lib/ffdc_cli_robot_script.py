@@ -21,6 +21,7 @@ PROTOCOL = "PROTOCOL"
 ENV_VARS = "ENV_VARS"
 ECONFIG = "ECONFIG"
 LOGLEVEL = "LOG"
+INCREMENTAL = "INCREMENTAL"
 
 
 def ffdc_robot_script_cli(**kwargs):
@@ -52,6 +53,8 @@ def ffdc_robot_script_cli(**kwargs):
         ENV_VAR:env_vars                User define CLI env vars '{"key : "value"}'. Default: ""
         ECONFIG:econfig                 User define env vars YAML file. Default: ""
         LOG_LEVEL:log_level             CRITICAL, ERROR, WARNING, INFO, DEBUG. Default: INFO
+        INCREMENTAL:incremental         Incremental collection mode: none, mtime, sha256.
+                                        Default: robot variable FFDC_INCREMENTAL or none
 
     Code examples:
     (1) openbmc_ffdc.robot activate this method with no parm
@@ -111,6 +114,8 @@ def run_ffdc_collector(dict_of_parm):
         ENV_VAR:env_vars                User define CLI env vars '{"key : "value"}'. Default: ""
         ECONFIG:econfig                 User define env vars YAML file. Default: ""
         LOG_LEVEL:log_level             CRITICAL, ERROR, WARNING, INFO, DEBUG. Default: INFO
+        INCREMENTAL:incremental         Incremental collection mode: none, mtime, sha256.
+                                        Default: robot variable FFDC_INCREMENTAL or none
 
     """
 
@@ -125,6 +130,7 @@ def run_ffdc_collector(dict_of_parm):
     env_vars = None
     econfig = None
     log_level = None
+    incremental = None
 
     # Process input key/value pairs
     for key in dict_of_parm.keys():
@@ -148,6 +154,8 @@ def run_ffdc_collector(dict_of_parm):
             econfig = dict_of_parm[key]
         elif LOGLEVEL in key:
             log_level = dict_of_parm[key]
+        elif INCREMENTAL in key:
+            incremental = dict_of_parm[key]
 
     # Set defaults values for parms
     # that are not specified with input and have acceptable defaults.
@@ -173,6 +181,10 @@ def run_ffdc_collector(dict_of_parm):
     if not log_level:
         log_level = "INFO"
 
+    if not incremental:
+        # Repeated collections (e.g. in boot test loops) can re-use the files of the prior collection.
+        incremental = robotBuildIn().get_variable_value("${FFDC_INCREMENTAL}", default="none")
+
     # If minimum required inputs are met, go collect.
     if (remote and username and password and remote_type):
         # Execute data collection
@@ -185,7 +197,8 @@ def run_ffdc_collector(dict_of_parm):
                                    protocol,
                                    env_vars,
                                    econfig,
-                                   log_level)
+                                   log_level,
+                                   incremental=incremental)
         this_ffdc.collect_ffdc()
 
         # If original ffdc request is for BMC,
@@ -210,7 +223,8 @@ def run_ffdc_collector(dict_of_parm):
                                              protocol,
                                              env_vars,
                                              econfig,
-                                             log_level)
+                                             log_level,
+                                             incremental=incremental)
                     os_ffdc.collect_ffdc()
 
 
@@ -12,17 +12,34 @@ import signal
 import time
 import re
 import inspect
+import asyncio
+import functools
+import threading
 
 import gen_print as gp
 import gen_valid as gv
 import gen_misc as gm
 import func_args as fa
+import shell_worker_pool as swp
 
 robot_env = gp.robot_env
 
 if robot_env:
     from robot.libraries.BuiltIn import BuiltIn
 
+# The number of persistent bash workers shell_cmd may use to run command strings.  0 means that shell_cmd
+# starts a new shell for each command string.
+shell_cmd_pool_size = int(os.environ.get('SHELL_CMD_POOL_SIZE', 0))
+if robot_env and not shell_cmd_pool_size:
+    try:
+        shell_cmd_pool_size = int(BuiltIn().get_variable_value("${SHELL_CMD_POOL_SIZE}", default=0))
+    except Exception:
+        # Robot is not running (e.g. this module is being imported by a python program).
+        pass
+
+shell_cmd_pool = None
+shell_cmd_pool_lock = threading.Lock()
+
 
 # cmd_fnc and cmd_fnc_u should now be considered deprecated.  shell_cmd and t_shell_cmd should be used
 # instead.
@@ -235,29 +252,68 @@ def parse_command_string(command_string):
     return command_string_dict
 
 
-# Save the original SIGALRM handler for later restoration by shell_cmd.
-original_sigalrm_handler = signal.getsignal(signal.SIGALRM)
+def get_shell_cmd_pool():
+    r"""
+    Return the shell_worker_pool used by shell_cmd or None if shell_cmd_pool_size is 0.
+    """
+
+    global shell_cmd_pool
+    if not shell_cmd_pool_size:
+        return None
+    with shell_cmd_pool_lock:
+        if shell_cmd_pool is None:
+            shell_cmd_pool = swp.shell_worker_pool(shell_cmd_pool_size)
+    return shell_cmd_pool
 
 
-def shell_cmd_timed_out(signal_number,
-                        frame):
+def shell_cmd_popen(command_string,
+                    time_out=None,
+                    return_stderr=0):
     r"""
-    Handle an alarm signal generated during the shell_cmd function.
+    Run the command string in a new shell and return a tuple consisting of the shell return code, stdout,
+    stderr, a timed out indicator and the child pid.
+
+    The time-out is enforced with Popen.communicate rather than with a SIGALRM handler so that this function
+    may be called from any thread.
+
+    See shell_cmd prolog for details on all arguments.
     """
 
-    gp.dprint_executing()
-    global command_timed_out
-    command_timed_out = True
-    # Get subprocess pid from shell_cmd's call stack.
-    sub_proc = gp.get_stack_var('sub_proc', 0)
-    pid = sub_proc.pid
-    gp.dprint_var(pid)
-    # Terminate the child process group.
-    os.killpg(pid, signal.SIGKILL)
-    # Restore the original SIGALRM handler.
-    signal.signal(signal.SIGALRM, original_sigalrm_handler)
+    stderr = subprocess.PIPE if return_stderr else subprocess.STDOUT
+    sub_proc = subprocess.Popen(command_string,
+                                bufsize=1,
+                                shell=True,
+                                universal_newlines=True,
+                                executable='/bin/bash',
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=stderr,
+                                start_new_session=bool(time_out))
+    timed_out = False
+    try:
+        stdout_buf, stderr_buf = sub_proc.communicate(timeout=time_out or None)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        gp.dprint_var(sub_proc.pid)
+        # Terminate the child process group.
+        os.killpg(sub_proc.pid, signal.SIGKILL)
+        stdout_buf, stderr_buf = sub_proc.communicate()
+
+    return sub_proc.returncode, stdout_buf, stderr_buf or "", timed_out, sub_proc.pid
+
+
+def shell_cmd_uses_pool(command_string):
+    r"""
+    Return True if the command string may be run by the shell_cmd_pool.
+
+    A command string which starts a background job (e.g. "some_pgm &") is run in a new shell instead since
+    the background job could go on writing to the worker's output after the command string has completed.
 
-    return
+    Description of argument(s):
+    command_string                  The command string to be run.
+    """
+
+    return re.search(r"(?<![&>|])&(?![&>])", command_string) is None
 
 
 def shell_cmd(command_string,
@@ -316,6 +372,7 @@ def shell_cmd(command_string,
                                     child process and don't try to get stdout/stderr) and return the Popen
                                     object created by the subprocess.popen() function.  See the kill_cmd
                                     function for details on how to process the popen object.
+                                    Forked command strings are never run by the shell_cmd_pool.
     error_regexes                   A list of regular expressions to be used to identify errors in the
                                     command output.  If there is a match for any of these regular
                                     expressions, the command will be considered a failure and the shell_rc
@@ -323,6 +380,10 @@ def shell_cmd(command_string,
                                     command output contains 'ERROR:  Unrecognized option', it will be counted
                                     as an error even if the command returned 0.  This is useful when running
                                     commands that do not always return non-zero on error.
+
+    If shell_cmd_pool_size (environment or robot variable SHELL_CMD_POOL_SIZE) is set, command strings are
+    run by a pool of that many persistent bash processes rather than by a new shell each.  Either way, this
+    function is thread-safe.
     """
 
     err_msg = gv.valid_value(command_string)
@@ -344,7 +405,7 @@ def shell_cmd(command_string,
     # Convert each list entry to a signed value.
     valid_rcs = [gm.to_signed(x) for x in valid_rcs]
 
-    stderr = subprocess.PIPE if return_stderr else subprocess.STDOUT
+    pool = None if fork or not shell_cmd_uses_pool(command_string) else get_shell_cmd_pool()
 
     # Write all output to func_out_history_buf rather than directly to stdout.  This allows us to decide
     # what to print after all attempts to run the command string have been made.  func_out_history_buf will
@@ -353,29 +414,24 @@ def shell_cmd(command_string,
     command_timed_out = False
     func_out_history_buf = ""
     for attempt_num in range(1, max_attempts + 1):
-        sub_proc = subprocess.Popen(command_string,
-                                    bufsize=1,
-                                    shell=True,
-                                    universal_newlines=True,
-                                    executable='/bin/bash',
-                                    stdin=subprocess.PIPE,
-                                    stdout=subprocess.PIPE,
-                                    stderr=stderr)
         if fork:
+            stderr = subprocess.PIPE if return_stderr else subprocess.STDOUT
+            sub_proc = subprocess.Popen(command_string,
+                                        bufsize=1,
+                                        shell=True,
+                                        universal_newlines=True,
+                                        executable='/bin/bash',
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=stderr)
             return sub_proc
 
-        if time_out:
-            command_timed_out = False
-            # Designate a SIGALRM handling function and set alarm.
-            signal.signal(signal.SIGALRM, shell_cmd_timed_out)
-            signal.alarm(time_out)
-        try:
-            stdout_buf, stderr_buf = sub_proc.communicate()
-        except IOError:
-            command_timed_out = True
-        # Restore the original SIGALRM handler and clear the alarm.
-        signal.signal(signal.SIGALRM, original_sigalrm_handler)
-        signal.alarm(0)
+        if pool:
+            shell_rc, stdout_buf, stderr_buf, command_timed_out, child_pid = \
+                pool.run(command_string, time_out or None, return_stderr)
+        else:
+            shell_rc, stdout_buf, stderr_buf, command_timed_out, child_pid = \
+                shell_cmd_popen(command_string, time_out, return_stderr)
 
         # Output from this loop iteration is written to func_out_buf for later processing.  This can include
         # stdout, stderr and our own error messages.
@@ -384,7 +440,6 @@ def shell_cmd(command_string,
             if return_stderr:
                 func_out_buf += stderr_buf
             func_out_buf += stdout_buf
-        shell_rc = sub_proc.returncode
         if shell_rc in valid_rcs:
             # Check output for text indicating there is an error.
             if error_regexes and re.match('|'.join(error_regexes), stdout_buf):
@@ -394,7 +449,7 @@ def shell_cmd(command_string,
         err_msg = "The prior shell command failed.\n"
         err_msg += gp.sprint_var(attempt_num)
         err_msg += gp.sprint_vars(command_string, command_timed_out, time_out)
-        err_msg += gp.sprint_varx("child_pid", sub_proc.pid)
+        err_msg += gp.sprint_varx("child_pid", child_pid)
         err_msg += gp.sprint_vars(shell_rc, valid_rcs, fmt=gp.hexa())
         if error_regexes:
             err_msg += gp.sprint_vars(error_regexes)
@@ -432,6 +487,25 @@ def shell_cmd(command_string,
         else (shell_rc, stdout_buf)
 
 
+async def async_shell_cmd(command_string, **kwargs):
+    r"""
+    Asyncio version of shell_cmd.  The command string is run by a thread of the event loop's default executor
+    so that the event loop is not blocked while it runs.
+
+    Since shell_cmd's stack searches for default values (e.g. for quiet and ignore_err) cannot see the
+    caller's stack from the executor thread, callers should pass such arguments explicitly.
+
+    Example:
+    results = await asyncio.gather(*[async_shell_cmd("ping -c 1 " + host, quiet=1, ignore_err=1)
+                                     for host in hosts])
+
+    See shell_cmd prolog for details on all arguments.
+    """
+
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, functools.partial(shell_cmd, command_string, **kwargs))
+
+
 def t_shell_cmd(command_string, **kwargs):
     r"""
     Search upward in the the call stack to obtain the test_mode argument, add it to kwargs and then call
@@ -18,6 +18,7 @@ try:
 except ImportError:
     import builtins as __builtin__
 import logging
+import linecache
 import collections
 from wrap_utils import *
 
@@ -151,6 +152,99 @@ def work_around_inspect_stack_cwd_failure():
         os.chdir("/tmp")
 
 
+def get_stack_frame(stack_frame_ix=0):
+    r"""
+    Return the frame object at the given index of the caller's call stack.  This is the frame object found at
+    inspect.stack()[stack_frame_ix] but it is obtained without building the whole stack or reading any source
+    code.  ValueError is raised if the stack is not that deep.
+
+    Description of argument(s):
+    stack_frame_ix                  The index of the stack frame to be returned.  0 is the caller's frame, 1
+                                    is the frame of the caller's caller, etc.
+    """
+
+    return sys._getframe(stack_frame_ix + 1)
+
+
+def get_stack_frame_info(frame):
+    r"""
+    Return an inspect.FrameInfo object for the frame object with no code context (i.e. like one of the
+    entries returned by inspect.stack(context=0)).
+
+    Description of argument(s):
+    frame                           A frame object.
+    """
+
+    return inspect.FrameInfo(frame, frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name, None,
+                             None)
+
+
+def get_stack_depth():
+    r"""
+    Return the number of frames in the caller's call stack (i.e. len(inspect.stack())).
+    """
+
+    depth = 0
+    frame = sys._getframe(1)
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+# Source lines used by get_arg_name, keyed by (filename, line number, function name).  Each value is a tuple
+# consisting of the source lines of the function (or module) and the index of the line number within them.
+arg_name_source_cache = {}
+
+
+def get_arg_name_source(frame):
+    r"""
+    Return a tuple consisting of the source lines of the function (or module) running in the frame and the
+    index of the frame's current line within them.
+
+    The result is cached so that the source is only read and parsed once per line of code.
+
+    Description of argument(s):
+    frame                           A frame object.
+    """
+
+    function_name = frame.f_code.co_name
+    key = (frame.f_code.co_filename, frame.f_lineno, function_name)
+    try:
+        return arg_name_source_cache[key]
+    except KeyError:
+        pass
+
+    cur_line_no = frame.f_lineno
+    # Though one would expect inspect.getsourcelines(frame) to get all module source lines if the frame is
+    # "<module>", it doesn't do that.  Therefore, for this special case, do inspect.getsourcelines(module).
+    if function_name == "<module>":
+        source_lines, source_line_num =\
+            inspect.getsourcelines(get_frame_module(frame))
+        line_ix = cur_line_no - source_line_num - 1
+    else:
+        source_lines, source_line_num =\
+            inspect.getsourcelines(frame)
+        line_ix = cur_line_no - source_line_num
+
+    arg_name_source_cache[key] = (tuple(source_lines), line_ix)
+    return arg_name_source_cache[key]
+
+
+def get_frame_module(frame):
+    r"""
+    Return the module whose code is running in the frame.
+
+    Description of argument(s):
+    frame                           A frame object.
+    """
+
+    module = sys.modules.get(frame.f_globals.get('__name__'))
+    if module is not None and getattr(module, '__dict__', None) is frame.f_globals:
+        return module
+    return inspect.getmodule(frame)
+
+
 def get_line_indent(line):
     r"""
     Return the number of spaces at the beginning of the line.
@@ -248,16 +342,18 @@ def get_arg_name(var,
     work_around_inspect_stack_cwd_failure()
     for count in range(0, 2):
         try:
-            frame, filename, cur_line_no, function_name, lines, index = \
-                inspect.stack()[stack_frame_ix]
-        except IndexError:
+            frame = get_stack_frame(stack_frame_ix)
+        except ValueError:
             print_error("Programmer error - The caller has asked for"
                         + " information about the stack frame at index \""
                         + str(stack_frame_ix) + "\".  However, the stack"
-                        + " only contains " + str(len(inspect.stack()))
+                        + " only contains " + str(get_stack_depth())
                         + " entries.  Therefore the stack frame index is out"
                         + " of range.\n")
             return
+        filename = frame.f_code.co_filename
+        cur_line_no = frame.f_lineno
+        function_name = frame.f_code.co_name
         if filename != "<string>":
             break
         # filename of "<string>" may mean that the function in question was defined dynamically and
@@ -270,28 +366,19 @@ def get_arg_name(var,
 
     real_called_func_name = sprint_func_name(stack_frame_ix)
 
-    module = inspect.getmodule(frame)
+    module = get_frame_module(frame)
 
-    # Though one would expect inspect.getsourcelines(frame) to get all module source lines if the frame is
-    # "<module>", it doesn't do that.  Therefore, for this special case, do inspect.getsourcelines(module).
-    if function_name == "<module>":
-        source_lines, source_line_num =\
-            inspect.getsourcelines(module)
-        line_ix = cur_line_no - source_line_num - 1
-    else:
-        source_lines, source_line_num =\
-            inspect.getsourcelines(frame)
-        line_ix = cur_line_no - source_line_num
+    # The cached source lines are copied since the continuation line processing below may modify them.
+    source_lines, line_ix = get_arg_name_source(frame)
+    source_lines = list(source_lines)
 
     if local_debug:
-        print("\n  Variables retrieved from inspect.stack() function:")
+        print("\n  Variables retrieved from the stack frame:")
         print_varx("frame", frame, indent=debug_indent + 2)
         print_varx("filename", filename, indent=debug_indent + 2)
         print_varx("cur_line_no", cur_line_no, indent=debug_indent + 2)
         print_varx("function_name", function_name, indent=debug_indent + 2)
-        print_varx("lines", lines, indent=debug_indent + 2)
-        print_varx("index", index, indent=debug_indent + 2)
-        print_varx("source_line_num", source_line_num, indent=debug_indent)
+        print_varx("lines", [linecache.getline(filename, cur_line_no)], indent=debug_indent + 2)
         print_varx("line_ix", line_ix, indent=debug_indent)
         if local_debug_show_source:
             print_varx("source_lines", source_lines, indent=debug_indent)
@@ -301,7 +388,8 @@ def get_arg_name(var,
     # Get a list of all functions defined for the module.  Note that this doesn't work consistently when
     # _run_exitfuncs is at the top of the stack (i.e. if we're running an exit function).  I've coded a
     # work-around below for this deficiency.
-    all_functions = inspect.getmembers(module, inspect.isfunction)
+    all_functions = [(func_name, function) for func_name, function in list(vars(module).items())
+                     if inspect.isfunction(function)]
 
     # Get called_func_id by searching for our function in the list of all functions.
     called_func_id = None
@@ -1382,8 +1470,11 @@ def sprint_call_stack(indent=0,
     buffer += sprint_dashes(indent, 6, 0) + " " + sprint_dashes(0, 73)
 
     # Grab the current program stack.
-    work_around_inspect_stack_cwd_failure()
-    current_stack = inspect.stack()
+    current_stack = []
+    frame = get_stack_frame()
+    while frame is not None:
+        current_stack.append(get_stack_frame_info(frame))
+        frame = frame.f_back
 
     # Process each frame in turn.
     format_string = "%6s %s\n"
@@ -1434,8 +1525,10 @@ def sprint_executing(stack_frame_ix=None, style=None, max_width=None):
         else:
             stack_frame_ix = 1
 
-    work_around_inspect_stack_cwd_failure()
-    stack_frame = inspect.stack()[stack_frame_ix]
+    try:
+        stack_frame = get_stack_frame_info(get_stack_frame(stack_frame_ix))
+    except ValueError:
+        raise IndexError("list index out of range")
 
     if max_width is None:
         max_width = 160 - (dft_col1_width + 11)
@@ -1823,11 +1916,19 @@ def get_stack_var(var_name,
                                     function calling this function, etc.
     """
 
-    work_around_inspect_stack_cwd_failure()
     default = get_var_value(var_name=var_name, default=default)
-    return next((frame[0].f_locals[var_name]
-                 for frame in inspect.stack()[init_stack_ix:]
-                 if var_name in frame[0].f_locals), default)
+    # Walk the frames directly rather than via inspect.stack() which would read source context for every
+    # frame on the stack.
+    try:
+        frame = get_stack_frame(init_stack_ix)
+    except ValueError:
+        return default
+    while frame is not None:
+        f_locals = frame.f_locals
+        if var_name in f_locals:
+            return f_locals[var_name]
+        frame = frame.f_back
+    return default
 
 
 # hidden_text is a list of passwords which are to be replaced with asterisks by print functions defined in
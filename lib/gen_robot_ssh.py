@@ -16,6 +16,7 @@ except ImportError:
 
 import gen_print as gp
 import func_timer as ft
+import ssh_session_pool as ssp
 func_timer = ft.func_timer_class()
 
 from robot.libraries.BuiltIn import BuiltIn
@@ -314,6 +315,83 @@ def execute_ssh_command(cmd_buf,
     if fork:
         return
 
+    return process_ssh_command_output(stdout, stderr, rc, open_connection_args, print_out, print_err,
+                                      ignore_err)
+
+
+def execute_pooled_ssh_command(cmd_buf,
+                               open_connection_args={},
+                               login_args={},
+                               print_out=0,
+                               print_err=0,
+                               ignore_err=1,
+                               fork=0,
+                               quiet=None,
+                               test_mode=None,
+                               time_out=None):
+    r"""
+    Run the given command using the process-wide paramiko session pool (see ssh_session_pool.py) rather than
+    SSHLibrary and return the stdout, stderr and the return code.
+
+    The session for the host is kept open between calls and is re-opened automatically if it has died (e.g.
+    because the host rebooted).  Unlike execute_ssh_command, this function may be called from any thread.
+
+    Description of arguments:
+    See execute_ssh_command for details.  Only the host and port entries of open_connection_args and the
+    username and password entries of login_args are used.  fork is not supported.
+    """
+
+    if fork:
+        raise ValueError("execute_pooled_ssh_command does not support fork.")
+
+    gp.lprint_executing()
+
+    # Obtain default values.
+    quiet = int(gp.get_var_value(quiet, 0))
+    test_mode = int(gp.get_var_value(test_mode, 0))
+
+    if not quiet:
+        gp.pissuing(cmd_buf, test_mode)
+    gp.lpissuing(cmd_buf, test_mode)
+
+    if test_mode:
+        return "", "", 0
+
+    try:
+        stdout, stderr, rc = \
+            ssp.pooled_ssh_execute_command(open_connection_args['host'], login_args['username'],
+                                           login_args['password'], cmd_buf,
+                                           port=open_connection_args.get('port', 22), time_out=time_out)
+    except (paramiko.ssh_exception.SSHException, socket.error, EOFError):
+        except_type, except_value, except_traceback = sys.exc_info()
+        gp.lprint_var(except_type)
+        gp.lprint_varx("except_value", str(except_value))
+        rc = 1
+        stderr = str(except_value)
+        stdout = ""
+
+    return process_ssh_command_output(stdout, stderr, rc, open_connection_args, print_out, print_err,
+                                      ignore_err)
+
+
+def process_ssh_command_output(stdout,
+                               stderr,
+                               rc,
+                               open_connection_args,
+                               print_out,
+                               print_err,
+                               ignore_err):
+    r"""
+    Print the output of an SSH command as requested, fail if it returned non-zero and errors are not to be
+    ignored, and return the output.
+
+    Description of arguments:
+    stdout                          The stdout of the command.
+    stderr                          The stderr of the command.
+    rc                              The return code of the command.
+    See execute_ssh_command for a description of the remaining arguments.
+    """
+
     if rc != 0 and print_err:
         gp.print_var(rc, gp.hexa())
         if not print_out:
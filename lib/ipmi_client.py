@@ -4,9 +4,13 @@ r"""
 A python companion file for ipmi_client.robot.
 """
 
+import os
+import re
+import shlex
 import collections
 import gen_print as gp
 import gen_cmd as gc
+import ipmi_shell_session as iss
 from robot.libraries.BuiltIn import BuiltIn
 
 
@@ -18,6 +22,11 @@ ipmi_port = BuiltIn().get_variable_value("${IPMI_PORT}", '623')
 ipmi_username = BuiltIn().get_variable_value("${IPMI_USERNAME}", "root")
 ipmi_password = BuiltIn().get_variable_value("${IPMI_PASSWORD}", "0penBmc")
 ipmi_host = BuiltIn().get_variable_value("${OPENBMC_HOST}")
+# If IPMI_SHELL_SESSION is set, read-only external IPMI commands are run on a persistent "ipmitool ...
+# shell" process per host rather than on a new ipmitool process each (see run_ipmi_ext_command).
+ipmi_shell_session = int(os.environ.get('IPMI_SHELL_SESSION', 0)) \
+    or int(BuiltIn().get_variable_value("${IPMI_SHELL_SESSION}", default=0))
+ipmi_shell_session_pool = None
 
 # Create a list of the required IPMI options.
 ipmi_required_options = ['I', 'C', 'N', 'p', 'U', 'P', 'H']
@@ -89,6 +98,71 @@ def create_ipmi_ext_command_string(command, **options):
     return gc.create_command_string('ipmitool', command, new_options)
 
 
+# The IPMI commands which may be run on an ipmitool shell session.  They are limited to commands which do not
+# change the state of the BMC so that a command which must be re-run (see run_ipmi_shell_session_command) is
+# harmless.
+ipmi_shell_session_cmd_regex = \
+    re.compile(r"^(sdr|fru|sensor|lan print|mc (info|guid|selftest)|chassis status|power status"
+               r"|sel (info|list|elist)|user (list|summary)|channel (info|getaccess|authcap|getciphers)"
+               r"|sol info|dcmi power reading|session info)( |$)")
+
+
+def run_ipmi_shell_session_command(command, **options):
+    r"""
+    Run the IPMI command on the ipmitool shell session for the given options and return its stdout.  Return
+    None if the command could not be run that way, in which case the caller should run it as a separate
+    ipmitool process.
+
+    The ipmitool shell does not report the return code of a command.  Therefore, the session's output is
+    only accepted if the command wrote nothing to stderr.  Otherwise, None is returned so that the caller's
+    re-run of the command supplies the true return code, stdout and stderr.
+
+    Description of argument(s):
+    command                         The ipmitool command (e.g. 'sdr elist full').
+    options                         See create_ipmi_ext_command_string for details.
+    """
+
+    global ipmi_shell_session_pool
+
+    if not ipmi_shell_session:
+        return None
+    command = command.strip()
+    # Commands with options or shell syntax in them must be run by a shell.
+    if not ipmi_shell_session_cmd_regex.match(command) or re.search(r"(^| )-|[\"'|;&<>$`\\]", command):
+        return None
+    if ipmi_shell_session_pool is None:
+        ipmi_shell_session_pool = iss.ipmi_shell_session_pool()
+    cmd_buf = shlex.split(create_ipmi_ext_command_string('shell', **options))
+    try:
+        stdout, stderr = ipmi_shell_session_pool.run(cmd_buf, command)
+    except (ValueError, OSError):
+        return None
+    if stderr:
+        return None
+    return stdout
+
+
+def run_ipmi_ext_command(command, **options):
+    r"""
+    Run the IPMI external command and return a tuple consisting of its return code and its combined stdout
+    and stderr, minus one trailing newline (as robot's "Run And Return RC And Output" does).
+
+    Description of argument(s):
+    command                         The ipmitool command (e.g. 'power status').
+    options                         See create_ipmi_ext_command_string for details.
+    """
+
+    stdout = run_ipmi_shell_session_command(command, **options.copy())
+    if stdout is not None:
+        rc = 0
+    else:
+        rc, stdout = gc.shell_cmd(create_ipmi_ext_command_string(command, **options), quiet=1,
+                                  print_output=0, show_err=0, ignore_err=1)
+    if stdout.endswith("\n"):
+        stdout = stdout[:-1]
+    return rc, stdout
+
+
 def verify_ipmi_user_parm_accepted():
     r"""
     Deterimine whether the OBMC accepts the '-U' ipmitool option and adjust
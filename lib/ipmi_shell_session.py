@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+r"""
+This module keeps "ipmitool ... shell" processes alive so that many IPMI commands can be run over one RMCP+
+session rather than each paying for its own session establishment.  It is the backend of the IPMI session
+mode of ipmi_client.py and ipmi_utils.py (see IPMI_SHELL_SESSION).  It also provides run_on_pty, which is
+used to run "ipmitool ... exec" batches.
+"""
+
+import os
+import pty
+import time
+import fcntl
+import select
+import signal
+import termios
+import threading
+import subprocess
+
+
+class pty_command_timeout(ValueError):
+    r"""
+    Raised by run_on_pty when the command does not finish in time.  The output received before the command
+    was killed is available as the exception's output attribute.
+    """
+
+    def __init__(self, message, output=""):
+        super(pty_command_timeout, self).__init__(message)
+        self.output = output
+
+
+class ipmi_shell_session(object):
+    r"""
+    An "ipmitool ... shell" process which runs one IPMI command at a time.
+
+    The process runs on a pseudo-terminal so that its output is not held in a stdio buffer.  The end of
+    each command's output is marked by the next "ipmitool> " prompt.  Since the ipmitool shell does not
+    report the return code of a command, the caller must decide whether a command succeeded from its
+    output (see run).
+
+    A session which times out or whose process dies is closed and must be discarded.
+    """
+
+    prompt = b"ipmitool> "
+
+    def __init__(self,
+                 cmd_buf,
+                 time_out=30):
+        r"""
+        Start the ipmitool shell process and wait for its first prompt.
+
+        Description of argument(s):
+        cmd_buf                     The ipmitool command as a list of arguments ending with "shell" (e.g.
+                                    ['ipmitool', '-I', 'lanplus', ..., '-H', 'bmc1', 'shell']).
+        time_out                    The number of seconds to wait for the first prompt.
+        """
+
+        self.cmd_buf = cmd_buf
+        self.closed = False
+        self.last_used = time.time()
+        master_fd, slave_fd = pty.openpty()
+        # Turn off echo and output post-processing (e.g. "\n" to "\r\n") on the pseudo-terminal.
+        attrs = termios.tcgetattr(slave_fd)
+        attrs[1] &= ~termios.OPOST
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+        env = dict(os.environ)
+        # Keep readline (if ipmitool uses it) from emitting terminal control sequences.
+        env['TERM'] = 'dumb'
+        env['INPUTRC'] = '/dev/null'
+        try:
+            self.sub_proc = subprocess.Popen(cmd_buf, stdin=slave_fd, stdout=slave_fd, stderr=subprocess.PIPE,
+                                             env=env, start_new_session=True)
+        finally:
+            os.close(slave_fd)
+        self.master_fd = master_fd
+        self.stderr_fd = self.sub_proc.stderr.fileno()
+        fcntl.fcntl(self.stderr_fd, fcntl.F_SETFL, fcntl.fcntl(self.stderr_fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        try:
+            self.read_until_prompt(time_out)
+        except BaseException:
+            self.close()
+            raise
+        self.read_stderr()
+
+    def alive(self):
+        r"""
+        Return True if the session can accept another command.
+        """
+
+        return not self.closed and self.sub_proc.poll() is None
+
+    def close(self):
+        r"""
+        Stop the ipmitool shell process.
+        """
+
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            os.killpg(self.sub_proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.sub_proc.wait()
+        os.close(self.master_fd)
+        self.sub_proc.stderr.close()
+
+    def read_until_prompt(self,
+                          time_out):
+        r"""
+        Read the process's output up to and including the next prompt and return it without the prompt.
+        Raise a ValueError if the prompt does not arrive within time_out seconds or if the process ends.
+
+        Description of argument(s):
+        time_out                    The number of seconds to wait for the prompt.
+        """
+
+        deadline = time.time() + float(time_out)
+        buffer = b""
+        while not buffer.endswith(self.prompt):
+            time_left = deadline - time.time()
+            if time_left <= 0:
+                raise ValueError("Timed out waiting for the ipmitool shell prompt.")
+            readable, _, _ = select.select([self.master_fd], [], [], time_left)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master_fd, 65536)
+            except OSError:
+                data = b""
+            if not data:
+                raise ValueError("The ipmitool shell process ended.")
+            buffer += data
+        return buffer[:-len(self.prompt)]
+
+    def read_stderr(self):
+        r"""
+        Return whatever the process has written to stderr since the last call.
+        """
+
+        buffer = b""
+        while True:
+            try:
+                data = os.read(self.stderr_fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            buffer += data
+        return buffer
+
+    def run(self,
+            command,
+            time_out=60):
+        r"""
+        Run the IPMI command and return a tuple consisting of its stdout and stderr.
+
+        Errors encountered by the command itself are reported by ipmitool on stderr so a command which
+        produced any stderr output should be presumed to have failed.  A ValueError is raised (and the
+        session closed) if the command does not finish within time_out seconds.
+
+        Description of argument(s):
+        command                     The IPMI command (e.g. "sdr elist full").
+        time_out                    The number of seconds to allow for the command.
+        """
+
+        self.read_stderr()
+        os.write(self.master_fd, command.encode('utf-8') + b"\n")
+        try:
+            stdout = self.read_until_prompt(time_out)
+        except BaseException:
+            self.close()
+            raise
+        stderr = self.read_stderr()
+        self.last_used = time.time()
+
+        stdout = stdout.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '')
+        # Some ipmitool builds echo the command line themselves.
+        first_line, newline, rest = stdout.partition('\n')
+        if newline and first_line.strip() == command.strip():
+            stdout = rest
+        return stdout, stderr.decode('utf-8', errors='replace')
+
+
+class ipmi_shell_session_pool(object):
+    r"""
+    A thread-safe collection of ipmi_shell_session objects, one per distinct ipmitool connection command.
+
+    A session is replaced when it has been idle for longer than max_idle seconds since BMCs close idle
+    RMCP+ sessions.
+    """
+
+    def __init__(self,
+                 max_idle=30):
+        r"""
+        Description of argument(s):
+        max_idle                    The number of seconds a session may be idle before it is replaced.
+        """
+
+        self.max_idle = float(max_idle)
+        self.__sessions = {}
+        self.__locks = {}
+        self.__lock = threading.Lock()
+
+    def run(self,
+            cmd_buf,
+            command,
+            time_out=60):
+        r"""
+        Run the IPMI command on the session for cmd_buf and return a tuple consisting of its stdout and
+        stderr.  A ValueError or OSError is raised if the session cannot be started or fails.  A session
+        whose command produced stderr output is replaced so that the next command starts afresh.
+
+        Description of argument(s):
+        cmd_buf                     See ipmi_shell_session.__init__ for details.
+        command                     See ipmi_shell_session.run for details.
+        time_out                    See ipmi_shell_session.run for details.
+        """
+
+        key = tuple(cmd_buf)
+        with self.__lock:
+            session_lock = self.__locks.setdefault(key, threading.Lock())
+        with session_lock:
+            session = self.__sessions.get(key)
+            if session is not None and (not session.alive()
+                                        or time.time() - session.last_used > self.max_idle):
+                session.close()
+                session = None
+            if session is None:
+                session = ipmi_shell_session(cmd_buf)
+                self.__sessions[key] = session
+            stdout, stderr = session.run(command, time_out)
+            if stderr or not session.alive():
+                session.close()
+                del self.__sessions[key]
+            return stdout, stderr
+
+    def close(self):
+        r"""
+        Stop all sessions.
+        """
+
+        with self.__lock:
+            sessions = list(self.__sessions.values())
+            self.__sessions = {}
+        for session in sessions:
+            session.close()
+
+
+def run_on_pty(cmd_buf,
+               time_out=600):
+    r"""
+    Run the command with its stdout and stderr on a pseudo-terminal and return a tuple consisting of its
+    return code and combined output.
+
+    Unlike a pipe, the pseudo-terminal keeps the command's stdout line buffered, so its stdout and stderr
+    lines arrive in the order in which they were written.  A pty_command_timeout (a ValueError) is raised,
+    and the command killed, if the command does not finish within time_out seconds.
+
+    Description of argument(s):
+    cmd_buf                         The command as a list of arguments.
+    time_out                        The number of seconds to allow for the command.
+    """
+
+    master_fd, slave_fd = pty.openpty()
+    attrs = termios.tcgetattr(slave_fd)
+    attrs[1] &= ~termios.OPOST
+    termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+    try:
+        sub_proc = subprocess.Popen(cmd_buf, stdin=subprocess.DEVNULL, stdout=slave_fd, stderr=slave_fd,
+                                    start_new_session=True)
+    finally:
+        os.close(slave_fd)
+    deadline = time.time() + float(time_out)
+    buffer = b""
+    try:
+        while True:
+            time_left = deadline - time.time()
+            if time_left <= 0:
+                os.killpg(sub_proc.pid, signal.SIGKILL)
+                raise pty_command_timeout("The command timed out after " + str(time_out) + " seconds:\n"
+                                          + " ".join(cmd_buf),
+                                          buffer.decode('utf-8', errors='replace').replace('\r\n', '\n'))
+            readable, _, _ = select.select([master_fd], [], [], time_left)
+            if not readable:
+                continue
+            try:
+                data = os.read(master_fd, 65536)
+            except OSError:
+                # Linux reports the closing of the last slave descriptor as EIO.
+                data = b""
+            if not data:
+                break
+            buffer += data
+    finally:
+        os.close(master_fd)
+        rc = sub_proc.wait()
+    return rc, buffer.decode('utf-8', errors='replace').replace('\r\n', '\n')
@@ -5,6 +5,7 @@ Provide useful ipmi functions.
 """
 
 import re
+import shlex
 import gen_print as gp
 import gen_misc as gm
 import gen_cmd as gc
@@ -13,6 +14,7 @@ import gen_robot_utils as gru
 import bmc_ssh_utils as bsu
 import var_funcs as vf
 import ipmi_client as ic
+import ipmi_shell_session as iss
 import tempfile
 gru.my_import_resource("ipmi_client.robot")
 from robot.libraries.BuiltIn import BuiltIn
@@ -114,7 +116,13 @@ def execute_ipmi_cmd(cmd_string,
                                       ignore_err=ignore_err)
 
     if ipmi_cmd_type == 'external':
+        stdout = ic.run_ipmi_shell_session_command(cmd_string, **options.copy())
         cmd_buf = ic.create_ipmi_ext_command_string(cmd_string, **options)
+        if stdout is not None:
+            gp.qprint_issuing(cmd_buf)
+            if print_output:
+                gp.gp_print(stdout)
+            return stdout, "", 0
         rc, stdout, stderr = gc.shell_cmd(cmd_buf,
                                           print_output=print_output,
                                           ignore_err=ignore_err,
@@ -122,6 +130,114 @@ def execute_ipmi_cmd(cmd_string,
         return stdout, stderr, rc
 
 
+def execute_ipmi_raw_batch(raw_cmd_entries,
+                           print_output=1,
+                           time_out=None,
+                           **options):
+    r"""
+    Run the given raw IPMI commands in one external "ipmitool exec" batch and return a list of result
+    dictionaries, one per command.
+
+    The batch file has an "echo" marker before each raw command so that the batch output can be split back
+    into the output of each command.  Each result dictionary has the following fields:
+
+    command                         The raw command (e.g. "0x06 0x01").
+    rc                              0 if ipmitool reported no error for the command, 1 if it did and -1 if
+                                    the command was not reached or did not finish (e.g. because the batch
+                                    timed out).  The output of a command which did not finish is kept.
+    stdout                          The response bytes as printed by ipmitool (e.g. "00 81 03 ...").
+    stderr                          Any error text printed by ipmitool for the command (e.g. "Unable to
+                                    send RAW command (channel=0x0 netfn=0x6 lun=0x0 cmd=0x1 rsp=0xc1):
+                                    Invalid command").
+    completion_code                 The completion code from that error text (e.g. "0xc1") or "" if there
+                                    was none.
+
+    Example robot code:
+
+    ${raw_cmd_entries}=  Create List  ${IPMI_RAW_CMD['Device ID']['Get']}
+    ...  ${IPMI_RAW_CMD['lan_parameters']['get_ip']}
+    ${results}=  Execute IPMI Raw Batch  ${raw_cmd_entries}
+
+    Example result:
+
+    results:
+      results[0]:
+        [command]:                                    0x06 0x01
+        [rc]:                                         0
+        [stdout]:                                     00 81 03 ...
+        [stderr]:
+        [completion_code]:
+
+    Description of argument(s):
+    raw_cmd_entries                 A list of raw commands.  Each element may be a raw command string (e.g.
+                                    "0x06 0x01") or an entry of data/ipmi_raw_cmd_table.py's IPMI_RAW_CMD
+                                    table (i.e. a list whose first element is the raw command).
+    print_output                    If this is set, this function will print the batch output.
+    time_out                        The number of seconds to allow for the whole batch.  The default is 60
+                                    plus 10 per command.
+    options                         These are passed directly to the create_ipmi_ext_command_string
+                                    function.  See that function's prolog for details.
+    """
+
+    commands = []
+    for entry in raw_cmd_entries:
+        if isinstance(entry, (list, tuple)):
+            entry = entry[0]
+        commands.append(" ".join(entry.split()))
+    results = [{'command': command, 'rc': -1, 'stdout': "", 'stderr': "", 'completion_code': ""}
+               for command in commands]
+    if not commands:
+        return results
+
+    marker = "ipmi_raw_batch_cmd_num"
+    with tempfile.NamedTemporaryFile(mode='w', prefix="ipmi_raw_batch_", suffix=".txt") as batch_file:
+        for ix, command in enumerate(commands):
+            batch_file.write("echo " + marker + " " + str(ix) + "\n")
+            batch_file.write("raw " + command + "\n")
+        batch_file.flush()
+        cmd_buf = ic.create_ipmi_ext_command_string("exec " + batch_file.name, **options)
+        gp.qprint_issuing(cmd_buf)
+        if time_out is None:
+            time_out = 60 + 10 * len(commands)
+        try:
+            rc, output = iss.run_on_pty(shlex.split(cmd_buf), time_out)
+            timed_out = False
+        except iss.pty_command_timeout as e:
+            gp.print_error(str(e) + "\n")
+            # The commands which finished before the timeout are reported as usual.
+            rc, output = -1, e.output
+            timed_out = True
+    if print_output:
+        gp.gp_print(output)
+
+    # Split the output into one list of lines per command.
+    cmd_lines = {}
+    ix = None
+    for line in output.splitlines():
+        match = re.match(marker + r" ([0-9]+)$", line.strip())
+        if match:
+            ix = int(match.group(1))
+            cmd_lines[ix] = []
+        elif ix is not None:
+            cmd_lines[ix].append(line)
+    for ix, lines in cmd_lines.items():
+        if ix >= len(results):
+            continue
+        response_lines = [line for line in lines if re.match(r"^( *[0-9a-fA-F]{2})+ *$", line)]
+        error_lines = [line for line in lines if line.strip() and line not in response_lines]
+        results[ix]['stdout'] = "\n".join(response_lines)
+        results[ix]['stderr'] = "\n".join(error_lines)
+        results[ix]['rc'] = 1 if error_lines else 0
+        match = re.search(r"rsp=(0x[0-9a-fA-F]+)", results[ix]['stderr'])
+        if match:
+            results[ix]['completion_code'] = match.group(1)
+    if timed_out and cmd_lines:
+        # The last command started was cut off.
+        results[max(cmd_lines)]['rc'] = -1
+
+    return results
+
+
 def get_lan_print_dict(channel_number='', ipmi_cmd_type='external'):
     r"""
     Get IPMI 'lan print' output and return it as a dictionary.
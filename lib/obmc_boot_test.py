@@ -10,6 +10,7 @@ import time
 import glob
 import random
 import re
+import json
 import signal
 try:
     import cPickle as pickle
@@ -33,6 +34,9 @@ import var_stack as vs
 import gen_plug_in_utils as gpu
 import pel_utils as pel
 import logging_utils as log
+import bmc_ssh_utils as bsu
+import slot_lock as sl
+import async_ffdc as af
 
 base_path = os.path.dirname(os.path.dirname(
                             imp.find_module("gen_robot_print")[1])) +\
@@ -97,6 +101,23 @@ else:
     default_set_power_policy = "Set BMC Power Policy  ALWAYS_POWER_OFF"
 boot_count = 0
 
+# The maximum number of FFDC collections which may run at the same time across all boot test programs on this
+# host (e.g. those started by obmc_boot_test_fleet).  0 means no limit.
+ffdc_max_concurrent = int(os.environ.get('FFDC_MAX_CONCURRENT', 0)) or \
+    int(BuiltIn().get_variable_value("${FFDC_MAX_CONCURRENT}", default=0))
+ffdc_slot_dir_path = os.environ.get('FFDC_SLOT_DIR_PATH', '') or \
+    BuiltIn().get_variable_value("${FFDC_SLOT_DIR_PATH}", default="") or \
+    "/tmp/" + os.environ.get('USER', '') + "/ffdc_slots/"
+
+# Indicates that the bulk of the FFDC for a failed boot is to be collected in the background while the boot
+# test goes on (see my_async_ffdc).
+async_ffdc = int(os.environ.get('ASYNC_FFDC', 0)) or \
+    int(BuiltIn().get_variable_value("${ASYNC_FFDC}", default=0))
+# The maximum number of background FFDC collections which may run at the same time.
+async_ffdc_max_workers = int(os.environ.get('ASYNC_FFDC_MAX_WORKERS', 0)) or \
+    int(BuiltIn().get_variable_value("${ASYNC_FFDC_MAX_WORKERS}", default=1))
+async_ffdc_queue = None
+
 LOG_LEVEL = BuiltIn().get_variable_value("${LOG_LEVEL}")
 AUTOBOOT_FFDC_PREFIX = os.environ.get('AUTOBOOT_FFDC_PREFIX', '')
 ffdc_prefix = AUTOBOOT_FFDC_PREFIX
@@ -214,6 +235,7 @@ def process_pgm_parms():
     global ffdc_report_list_path
     global ffdc_summary_list_path
     global boot_table
+    global boot_index
     global valid_boot_types
 
     if ffdc_dir_path_style == "":
@@ -224,6 +246,7 @@ def process_pgm_parms():
     boot_stack = list(filter(None, boot_stack.split(":")))
 
     boot_table = create_boot_table(boot_table_path, os_host=os_host)
+    boot_index = load_boot_table_index(boot_table_path, os_host=os_host)
     valid_boot_types = create_valid_boot_list(boot_table)
 
     cleanup_boot_results_file()
@@ -643,16 +666,14 @@ def select_boot():
             transitional_boot_selected = True
             popped_boot = boot_candidate
 
-    # Loop through your list selecting a boot_candidates
-    boot_candidates = []
-    for boot_candidate in boot_list:
-        if st.compare_states(state, boot_table[boot_candidate]['start']):
-            if stack_popped:
-                if st.compare_states(boot_table[boot_candidate]['end'],
-                                     boot_table[popped_boot]['start']):
-                    boot_candidates.append(boot_candidate)
-            else:
-                boot_candidates.append(boot_candidate)
+    # Select the boot_candidates from the user's boot list.  If the boot at the
+    # top of the stack cannot be run yet, only boots which begin the shortest
+    # transition to its start state qualify.
+    boot_candidates = boot_index.boots_for_state(state, boot_list)
+    if stack_popped:
+        boot_candidates = boot_index.transitional_boots(boot_candidates,
+                                                        popped_boot,
+                                                        boot_list)
 
     if len(boot_candidates) == 0:
         gp.qprint_timen("The user's boot list contained no boot tests"
@@ -767,15 +788,32 @@ def my_ffdc():
 
     global state
 
-    plug_in_setup()
-    rc, shell_rc, failed_plug_in_name = grpi.rprocess_plug_in_packages(
-        call_point='ffdc', stop_on_plug_in_failure=0)
+    # Wait for a free FFDC slot so that a failure common to many systems does not start more concurrent FFDC
+    # collections than this host can handle.
+    ffdc_slot = None
+    if ffdc_max_concurrent:
+        ffdc_slot = sl.slot_lock(ffdc_slot_dir_path, ffdc_max_concurrent, "ffdc")
+        if not ffdc_slot.try_acquire():
+            gp.qprint_timen("Waiting for one of the " + str(ffdc_max_concurrent)
+                            + " FFDC slots to become free.")
+            ffdc_slot.acquire()
+            gp.qprint_timen("Got an FFDC slot after waiting "
+                            + "%.1f" % ffdc_slot.wait_time + " seconds.")
+
+    try:
+        plug_in_setup()
+        rc, shell_rc, failed_plug_in_name = grpi.rprocess_plug_in_packages(
+            call_point='ffdc', stop_on_plug_in_failure=0)
+
+        AUTOBOOT_FFDC_PREFIX = os.environ['AUTOBOOT_FFDC_PREFIX']
+        status, ffdc_file_list = grk.run_key_u("FFDC  ffdc_prefix="
+                                               + AUTOBOOT_FFDC_PREFIX
+                                               + "  ffdc_function_list="
+                                               + ffdc_function_list, ignore=1)
+    finally:
+        if ffdc_slot is not None:
+            ffdc_slot.release()
 
-    AUTOBOOT_FFDC_PREFIX = os.environ['AUTOBOOT_FFDC_PREFIX']
-    status, ffdc_file_list = grk.run_key_u("FFDC  ffdc_prefix="
-                                           + AUTOBOOT_FFDC_PREFIX
-                                           + "  ffdc_function_list="
-                                           + ffdc_function_list, ignore=1)
     if status != 'PASS':
         gp.qprint_error("Call to ffdc failed.\n")
         if type(ffdc_file_list) is not list:
@@ -789,6 +827,116 @@ def my_ffdc():
     print_defect_report(ffdc_file_list)
 
 
+def take_ffdc_snapshot():
+    r"""
+    Return a dictionary of the volatile BMC data which identifies the state of the BMC at the time of a boot
+    failure: the journal cursor, the PEL list and the dump IDs.  Unlike the rest of the FFDC, this data
+    cannot be collected later since the next boot will change it.
+    """
+
+    snapshot = DotDict()
+    snapshot['boot_count'] = boot_count
+    snapshot['boot'] = next_boot
+    out_buf, stderr, rc = bsu.bmc_execute_command("journalctl -n 0 --show-cursor", ignore_err=1,
+                                                  quiet=1)
+    match = re.search(r"-- cursor: (\S+)", out_buf + stderr)
+    snapshot['journal_cursor'] = match.group(1) if match else ""
+    snapshot['pels'] = pel.peltool("-l", ignore_err=1)
+    out_buf, stderr, rc = bsu.bmc_execute_command("ls /var/lib/phosphor-debug-collector/dumps"
+                                                  + " 2>/dev/null", ignore_err=1, quiet=1)
+    snapshot['dump_ids'] = out_buf.split()
+
+    return snapshot
+
+
+def get_async_ffdc_queue():
+    r"""
+    Return the queue of background FFDC collections, creating it if necessary.
+    """
+
+    global async_ffdc_queue
+
+    if async_ffdc_queue is None:
+        async_ffdc_queue = af.async_ffdc_queue(max_workers=async_ffdc_max_workers,
+                                               slot_dir_path=ffdc_slot_dir_path,
+                                               max_concurrent=ffdc_max_concurrent)
+    return async_ffdc_queue
+
+
+def my_async_ffdc():
+    r"""
+    Collect FFDC data without making the boot test wait for the bulk of it.
+
+    The ffdc plug-ins are run and the volatile data (see take_ffdc_snapshot) is saved right away.  The logs,
+    dumps, etc. are then collected by ffdc/collect_ffdc.py running as a low priority background process.
+    The results of the background collections are reported by process_async_ffdc_results.
+    """
+
+    global state
+
+    plug_in_setup()
+    rc, shell_rc, failed_plug_in_name = grpi.rprocess_plug_in_packages(
+        call_point='ffdc', stop_on_plug_in_failure=0)
+
+    AUTOBOOT_FFDC_PREFIX = os.environ['AUTOBOOT_FFDC_PREFIX']
+    snapshot_file_path = ffdc_dir_path + AUTOBOOT_FFDC_PREFIX + "ffdc_snapshot.json"
+    with open(snapshot_file_path, 'w') as snapshot_file:
+        json.dump(take_ffdc_snapshot(), snapshot_file, indent=2)
+
+    ffdc_log_file_path = ffdc_dir_path + AUTOBOOT_FFDC_PREFIX + "async_ffdc.log"
+    cmd_buf = [sys.executable, base_path + "ffdc/collect_ffdc.py",
+               "--remote", openbmc_host,
+               "--username", openbmc_username,
+               "--config", base_path + "ffdc/ffdc_config.yaml",
+               "--location", ffdc_dir_path + "async_ffdc",
+               "--type", "OPENBMC",
+               "--incremental", BuiltIn().get_variable_value("${FFDC_INCREMENTAL}", default="none")]
+    # The password is passed via the environment so that it does not show in the process list.
+    env = dict(os.environ)
+    env['FFDC_PASSWORD'] = openbmc_password
+    get_async_ffdc_queue().submit(boot_count, next_boot, cmd_buf, ffdc_log_file_path, env=env)
+    gp.qprint_timen("Started the background FFDC collection for boot " + str(boot_count) + ".")
+    gp.qprint_var(ffdc_log_file_path)
+
+    my_get_state()
+
+    print_defect_report([snapshot_file_path, ffdc_log_file_path])
+
+
+def process_async_ffdc_results(wait=False):
+    r"""
+    Report the results of the background FFDC collections which have finished.
+
+    Description of argument(s):
+    wait                            Indicates that this function is to wait for all background FFDC
+                                    collections to finish.
+    """
+
+    if async_ffdc_queue is None:
+        return
+
+    if wait:
+        num_pending = async_ffdc_queue.num_pending()
+        if num_pending:
+            gp.qprint_timen("Waiting for " + str(num_pending)
+                            + " background FFDC collection(s) to finish.")
+        jobs = async_ffdc_queue.wait()
+    else:
+        jobs = async_ffdc_queue.harvest()
+
+    for job in jobs:
+        gp.qprint_timen("The background FFDC collection for boot " + str(job['boot_count']) + " (\""
+                        + job['boot_type'] + "\") finished with rc " + str(job['rc']) + " in "
+                        + "%.1f" % job['elapsed'] + " seconds.")
+        gp.qprint_var(job['ffdc_dir_path'])
+        if job['rc'] != 0:
+            gp.qprint_error("The background FFDC collection failed.  See "
+                            + job['log_file_path'] + ".\n")
+            # Leave a record for caller that "soft" errors occurred.
+            soft_errors = 1
+            gpu.save_plug_in_value(soft_errors, pgm_name)
+
+
 def print_test_start_message(boot_keyword):
     r"""
     Print a message indicating what boot test is about to run.
@@ -932,6 +1080,8 @@ def test_loop_body():
 
     gp.qprintn()
 
+    process_async_ffdc_results()
+
     next_boot = select_boot()
     if next_boot == "":
         return True
@@ -963,6 +1113,7 @@ def test_loop_body():
     gp.qprint(completion_msg)
 
     boot_results.update(next_boot, boot_status)
+    save_boot_results()
 
     plug_in_setup()
     # NOTE: A post_test_case call point failure is NOT counted as a boot
@@ -976,9 +1127,10 @@ def test_loop_body():
         stop_on_plug_in_failure=1, stop_on_non_zero_rc=1)
     if ffdc_check == "All" or\
        shell_rc == dump_ffdc_rc():
-        status, ret_values = grk.run_key_u("my_ffdc", ignore=1)
+        ffdc_keyword = "my_async_ffdc" if async_ffdc else "my_ffdc"
+        status, ret_values = grk.run_key_u(ffdc_keyword, ignore=1)
         if status != 'PASS':
-            gp.qprint_error("Call to my_ffdc failed.\n")
+            gp.qprint_error("Call to " + ffdc_keyword + " failed.\n")
             # Leave a record for caller that "soft" errors occurred.
             soft_errors = 1
             gpu.save_plug_in_value(soft_errors, pgm_name)
@@ -1021,12 +1173,29 @@ def test_loop_body():
     return True
 
 
+def save_boot_results():
+    r"""
+    Save the boot_results and boot_history objects to boot_results_file_path.
+
+    The file is replaced atomically so that other programs (e.g. obmc_boot_test_fleet) may read it while
+    the boot test is running.
+    """
+
+    temp_file_path = boot_results_file_path + ".tmp"
+    with open(temp_file_path, 'wb') as file:
+        pickle.dump((boot_results, boot_history), file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file_path, boot_results_file_path)
+
+
 def obmc_boot_test_teardown():
     r"""
     Clean up after the main keyword.
     """
     gp.qprint_executing()
 
+    # The background FFDC collections must finish before any descendant processes are terminated.
+    process_async_ffdc_results(wait=True)
+
     if ga.psutil_imported:
         ga.terminate_descendants()
 
@@ -1040,9 +1209,7 @@ def obmc_boot_test_teardown():
         # needed again.
         gp.qprint_timen("Saving boot_results to the following path.")
         gp.qprint_var(boot_results_file_path)
-        pickle.dump((boot_results, boot_history),
-                    open(boot_results_file_path, 'wb'),
-                    pickle.HIGHEST_PROTOCOL)
+        save_boot_results()
 
     global save_stack
     # Restore any global values saved on the save_stack.
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+r"""
+This module is the python counterpart to obmc_boot_test_fleet.robot.  It runs the OBMC boot test against
+several systems at once.
+
+Each system is tested by its own robot process running obmc_boot_test.robot, so the module globals of
+obmc_boot_test.py (boot_count, state, boot_stack, boot_results, etc.) are never shared between systems.
+This program loads the boot lists and the boot table once, validates the boot parms against them and primes
+the boot table index cache which the robot processes then load.  While the boot tests run, the boot_results
+file saved by each robot process after every boot is read and added to a fleet-wide boot_results tally.
+"""
+
+import os
+import sys
+import time
+import subprocess
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import yaml
+from robot.utils import DotDict
+from robot.libraries.BuiltIn import BuiltIn
+
+from boot_data import *
+from tally_sheet import *
+import gen_print as gp
+import gen_misc as gm
+
+base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+# Program parms which are set per system and are therefore not passed from this program's robot variables to
+# the robot process of each system.
+host_parm_names = ['openbmc_host', 'openbmc_nickname', 'status_file_path']
+
+
+def get_fleet_hosts(fleet_hosts="",
+                    fleet_host_file_path="",
+                    parm_list=None):
+    r"""
+    Return a list of dictionaries, one per system to be tested, each containing the obmc_boot_test parms
+    which are specific to that system.  Each dictionary has at least an openbmc_host and an openbmc_nickname
+    entry.
+
+    The host file is a YAML list whose entries are either an openbmc_host value or a dictionary of
+    obmc_boot_test parms:
+
+    - bmc1
+    - openbmc_host: bmc2
+      os_host: os2
+      pdu_host: pdu1
+      pdu_slot_no: 3
+
+    Description of argument(s):
+    fleet_hosts                     A comma-separated list of openbmc_host values.
+    fleet_host_file_path            The path to a YAML host file.
+    parm_list                       The list of valid obmc_boot_test parm names.  If specified, an error is
+                                    raised for any host file entry which is not in this list.
+    """
+
+    entries = [host.strip() for host in fleet_hosts.split(",") if host.strip()]
+    if fleet_host_file_path:
+        with open(fleet_host_file_path, 'r') as file:
+            entries += yaml.load(file, Loader=yaml.SafeLoader) or []
+
+    hosts = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            entry = {'openbmc_host': entry}
+        host = {str(key).lower(): str(value) for key, value in entry.items() if value is not None}
+        if not host.get('openbmc_host'):
+            BuiltIn().fail(gp.sprint_error("A fleet host file entry has no openbmc_host:\n"
+                                           + gp.sprint_var(entry)))
+        if parm_list is not None:
+            invalid_parm_names = [key for key in host if key not in parm_list]
+            if invalid_parm_names:
+                BuiltIn().fail(gp.sprint_error("A fleet host file entry has invalid parm names:\n"
+                                               + gp.sprint_var(invalid_parm_names)))
+        host.setdefault('openbmc_nickname', host['openbmc_host'])
+        hosts.append(host)
+
+    nicknames = [host['openbmc_nickname'] for host in hosts]
+    duplicate_nicknames = sorted(set(nickname for nickname in nicknames if nicknames.count(nickname) > 1))
+    if duplicate_nicknames:
+        BuiltIn().fail(gp.sprint_error("Each system must have a unique openbmc_nickname:\n"
+                                       + gp.sprint_var(duplicate_nicknames)))
+
+    return hosts
+
+
+def expand_boot_list(boot_list,
+                     boot_lists):
+    r"""
+    Return the boot_list with each boot list name (e.g. "Power_on") replaced by the boots of that boot list.
+
+    Description of argument(s):
+    boot_list                       A list of boot types and/or boot list names.
+    boot_lists                      A dictionary of boot lists such as is returned by read_boot_lists.
+    """
+
+    expanded_boot_list = []
+    for boot in boot_list:
+        expanded_boot_list += boot_lists.get(boot, [boot])
+    return expanded_boot_list
+
+
+class boot_test_process(object):
+    r"""
+    The robot process running obmc_boot_test.robot against one system.
+    """
+
+    def __init__(self,
+                 host,
+                 robot_file_path,
+                 robot_parms,
+                 output_dir_path,
+                 master_pid,
+                 env):
+        r"""
+        Description of argument(s):
+        host                        A dictionary of the parms of the system (see get_fleet_hosts).
+        robot_file_path             The path to obmc_boot_test.robot.
+        robot_parms                 A dictionary of the obmc_boot_test parms shared by all systems.
+        output_dir_path             The directory in which the system's robot output files and console log
+                                    are to be written.
+        master_pid                  The master pid passed to the robot process (via AUTOBOOT_MASTER_PID).
+        env                         The environment of the robot process.
+        """
+
+        self.host = host
+        self.nickname = host['openbmc_nickname']
+        self.output_dir_path = gm.add_trailing_slash(output_dir_path)
+        self.env = dict(env)
+        self.env['AUTOBOOT_MASTER_PID'] = str(master_pid)
+        self.env['STATUS_DIR_PATH'] = self.output_dir_path
+        self.boot_results_file_path = create_boot_results_file_path("obmc_boot_test", self.nickname,
+                                                                    master_pid)
+
+        parms = dict(robot_parms)
+        parms.update(host)
+        self.cmd_buf = [sys.executable, '-m', 'robot', '--outputdir', self.output_dir_path,
+                        '--consolecolors', 'off', '--name', self.nickname]
+        for parm_name, parm_value in parms.items():
+            self.cmd_buf += ['-v', parm_name + ":" + str(parm_value)]
+        self.cmd_buf.append(robot_file_path)
+
+        self.sub_proc = None
+        self.rc = None
+        self.start_time = None
+        self.end_time = None
+        self.boot_results = None
+        self.boot_history = []
+        self.boot_results_mtime = None
+        self.end_reported = False
+
+    def start(self):
+        r"""
+        Start the robot process.
+        """
+
+        os.makedirs(self.output_dir_path, exist_ok=True)
+        gp.qprint_timen("Starting the boot test of " + self.nickname + ".")
+        gp.qprint_issuing(" ".join(self.cmd_buf))
+        with open(self.output_dir_path + "console.log", 'w') as console_file:
+            self.sub_proc = subprocess.Popen(self.cmd_buf, stdout=console_file, stderr=subprocess.STDOUT,
+                                             env=self.env)
+        self.start_time = time.time()
+
+    def running(self):
+        r"""
+        Return True if the robot process has been started and has not yet ended.
+        """
+
+        if self.sub_proc is None or self.rc is not None:
+            return False
+        rc = self.sub_proc.poll()
+        if rc is None:
+            return True
+        self.rc = rc
+        self.end_time = time.time()
+        return False
+
+    def stop(self):
+        r"""
+        Terminate the robot process if it is running.
+        """
+
+        if self.running():
+            self.sub_proc.terminate()
+            try:
+                self.sub_proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self.sub_proc.kill()
+                self.sub_proc.wait()
+            self.running()
+
+    def load_boot_results(self):
+        r"""
+        Load the boot_results file saved by the robot process and return True if it has changed since it was
+        last loaded.
+        """
+
+        try:
+            mtime = os.path.getmtime(self.boot_results_file_path)
+        except OSError:
+            return False
+        if mtime == self.boot_results_mtime:
+            return False
+        try:
+            with open(self.boot_results_file_path, 'rb') as file:
+                self.boot_results, self.boot_history = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+        self.boot_results_mtime = mtime
+        return True
+
+    def return_total_pass_fail(self):
+        r"""
+        Return the pass and fail counts of the boots done so far by the robot process.
+        """
+
+        if self.boot_results is None:
+            return 0, 0
+        return self.boot_results.return_total_pass_fail()
+
+    def status(self):
+        r"""
+        Return the status of the robot process (e.g. "waiting", "running", "PASS" or "FAIL").
+        """
+
+        if self.sub_proc is None:
+            return "waiting"
+        if self.running():
+            return "running"
+        return "PASS" if self.rc == 0 else "FAIL"
+
+
+def sprint_fleet_report(boot_test_processes):
+    r"""
+    Return a report showing the status and the boot counts of each system.
+
+    Description of argument(s):
+    boot_test_processes             A list of boot_test_process objects.
+    """
+
+    fields = DotDict([('total', 0), ('pass', 0), ('fail', 0), ('status', '')])
+    fleet_report = tally_sheet('system', fields, 'fleet_report')
+    fleet_report.set_sum_fields(['total', 'pass', 'fail'])
+    fleet_report.set_calc_fields(['total=pass+fail'])
+    for process in boot_test_processes:
+        fleet_report.add_row(process.nickname)
+        boot_pass, boot_fail = process.return_total_pass_fail()
+        fleet_report.update_row_field(process.nickname, 'pass', boot_pass)
+        fleet_report.update_row_field(process.nickname, 'fail', boot_fail)
+        fleet_report.update_row_field(process.nickname, 'status', process.status())
+    fleet_report.calc()
+    return fleet_report.sprint_report()
+
+
+def obmc_boot_test_fleet():
+    r"""
+    Run the OBMC boot test against each of the systems specified by the fleet_hosts and fleet_host_file_path
+    robot variables, running at most fleet_max_workers boot tests at a time.
+    """
+
+    parm_list = BuiltIn().get_variable_value("${parm_list}")
+    fleet_hosts = BuiltIn().get_variable_value("${fleet_hosts}", default="")
+    fleet_host_file_path = BuiltIn().get_variable_value("${fleet_host_file_path}", default="")
+    fleet_max_workers = int(BuiltIn().get_variable_value("${fleet_max_workers}", default=0))
+    fleet_poll_interval = float(BuiltIn().get_variable_value("${fleet_poll_interval}", default=10))
+    robot_file_path = BuiltIn().get_variable_value("${fleet_robot_file_path}", default="") \
+        or base_path + "extended/obmc_boot_test.robot"
+    ffdc_max_concurrent = int(os.environ.get('FFDC_MAX_CONCURRENT', 0)) or \
+        int(BuiltIn().get_variable_value("${FFDC_MAX_CONCURRENT}", default=0))
+    ffdc_slot_dir_path = os.environ.get('FFDC_SLOT_DIR_PATH', '') or \
+        BuiltIn().get_variable_value("${FFDC_SLOT_DIR_PATH}", default="")
+    output_dir_path = gm.add_trailing_slash(BuiltIn().get_variable_value("${OUTPUT_DIR}"))
+
+    hosts = get_fleet_hosts(fleet_hosts, fleet_host_file_path, parm_list)
+    if not hosts:
+        BuiltIn().fail(gp.sprint_error("You must specify at least one system with the fleet_hosts or"
+                                       + " fleet_host_file_path parm.\n"))
+    if fleet_max_workers <= 0:
+        fleet_max_workers = len(hosts)
+
+    # Gather the parms shared by all systems.
+    robot_parms = {}
+    for parm_name in parm_list:
+        if parm_name in host_parm_names:
+            continue
+        parm_value = BuiltIn().get_variable_value("${" + parm_name + "}")
+        if parm_value is None or parm_value == "":
+            continue
+        if parm_name.endswith("_password"):
+            # Hide the password in the printed robot command lines.
+            gp.register_passwords(parm_value)
+        robot_parms[parm_name] = parm_value
+    for host in hosts:
+        gp.register_passwords(*[value for key, value in host.items() if key.endswith("_password")])
+
+    # Load the boot lists and the boot table once for all systems.
+    boot_lists = read_boot_lists()
+    boot_table_path = robot_parms.get('boot_table_path')
+    boot_table = create_boot_table(boot_table_path)
+    valid_boot_types = create_valid_boot_list(boot_table)
+    for parm_name in ['boot_list', 'boot_stack']:
+        boot_list = list(filter(None, str(robot_parms.get(parm_name, "")).split(":")))
+        if parm_name == 'boot_list':
+            boot_list = expand_boot_list(boot_list, boot_lists)
+            if boot_list:
+                robot_parms[parm_name] = ":".join(boot_list)
+        valid_boot_list(boot_list, valid_boot_types)
+    # Each robot process loads the boot table index for its os_host from the cache file written here.
+    for os_host in set(host.get('os_host', robot_parms.get('os_host', "")) for host in hosts):
+        load_boot_table_index(boot_table_path, os_host=os_host)
+
+    env = dict(os.environ)
+    lib_dir_path = base_path + "lib"
+    env['PYTHONPATH'] = lib_dir_path + (":" + env['PYTHONPATH'] if env.get('PYTHONPATH') else "")
+    env['PATH'] = base_path + "bin:" + env.get('PATH', "")
+    env['FFDC_MAX_CONCURRENT'] = str(ffdc_max_concurrent)
+    if ffdc_slot_dir_path:
+        env['FFDC_SLOT_DIR_PATH'] = ffdc_slot_dir_path
+    master_pid = os.environ.get('AUTOBOOT_MASTER_PID', os.getpid())
+
+    boot_test_processes = [boot_test_process(host, robot_file_path, robot_parms,
+                                             output_dir_path + host['openbmc_nickname'], master_pid, env)
+                           for host in hosts]
+    gp.qprint_vars(fleet_max_workers, ffdc_max_concurrent)
+
+    fleet_boot_results = boot_results(boot_table, obj_name='fleet_boot_results')
+    try:
+        waiting_processes = list(boot_test_processes)
+        while True:
+            running_processes = [process for process in boot_test_processes if process.running()]
+            while waiting_processes and len(running_processes) < fleet_max_workers:
+                process = waiting_processes.pop(0)
+                process.start()
+                running_processes.append(process)
+
+            # Stream the progress of each system and re-tally the fleet's boot results.
+            changed = False
+            for process in boot_test_processes:
+                if process.sub_proc is None or not process.load_boot_results():
+                    continue
+                changed = True
+                boot_pass, boot_fail = process.return_total_pass_fail()
+                last_boot = process.boot_history[-1].strip() if process.boot_history else ""
+                gp.qprint_timen(process.nickname + ": " + str(boot_pass) + " boot(s) passed, "
+                                + str(boot_fail) + " boot(s) failed.  " + last_boot)
+            if changed:
+                fleet_boot_results = boot_results(boot_table, obj_name='fleet_boot_results')
+                for process in boot_test_processes:
+                    if process.boot_results is not None:
+                        fleet_boot_results.add_results(process.boot_results)
+                fleet_pass, fleet_fail = fleet_boot_results.return_total_pass_fail()
+                gp.qprint_timen("Fleet: " + str(fleet_pass) + " boot(s) passed, " + str(fleet_fail)
+                                + " boot(s) failed.")
+
+            for process in boot_test_processes:
+                if process.rc is not None and not process.end_reported:
+                    process.end_reported = True
+                    gp.qprint_timen("The boot test of " + process.nickname + " ended with rc "
+                                    + str(process.rc) + ".  See "
+                                    + process.output_dir_path + "console.log.")
+
+            if not waiting_processes and not running_processes:
+                break
+            time.sleep(fleet_poll_interval)
+    finally:
+        for process in boot_test_processes:
+            process.stop()
+
+    fleet_boot_results.print_report()
+    gp.qprint(sprint_fleet_report(boot_test_processes))
+
+    failed_systems = [process.nickname for process in boot_test_processes if process.rc != 0]
+    if failed_systems:
+        BuiltIn().fail(gp.sprint_error("The boot test failed on the following systems:\n"
+                                       + gp.sprint_var(failed_systems)))
@@ -8,7 +8,9 @@ import func_args as fa
 import bmc_ssh_utils as bsu
 import json
 import os
+import re
 import sys
+import collections
 from robot.libraries.BuiltIn import BuiltIn
 
 base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -16,6 +18,9 @@ sys.path.append(base_path + "/data/")
 
 import pel_variables
 
+# The directory in which the BMC stores PELs.  Each file is named <commit timestamp>_<PEL ID in hex>.
+pel_logs_dir_path = "/var/lib/phosphor-logging/extensions/pels/logs"
+
 
 class peltool_exception(Exception):
     r"""
@@ -57,6 +62,8 @@ def peltool(option_string, parse_json=True, **bsu_options):
 
     bsu_options = fa.args_to_objects(bsu_options)
     out_buf, stderr, rc = bsu.bmc_execute_command('peltool ' + option_string, **bsu_options)
+    if re.search(r"(^|\s)(-D|-d|--delete-all|--delete)(\s|$)", option_string):
+        invalidate_pel_cache()
     if parse_json:
         try:
             return json.loads(out_buf)
@@ -65,6 +72,171 @@ def peltool(option_string, parse_json=True, **bsu_options):
     return out_buf
 
 
+class pel_cache:
+    r"""
+    A local copy of the BMC's "peltool -l" PEL list, indexed by SRC, severity, subsystem and PLID.
+
+    peltool cannot list only the PELs created since a given one.  Therefore, refresh first lists the BMC's
+    PEL directory together with its boot ID, which is far cheaper than running peltool.  If the directory
+    holds no PEL that has not been seen before, the cache is brought up to date without running peltool
+    (PELs which are gone are simply dropped).  Otherwise, "peltool -l" is run once and only the new entries
+    are added.  A changed boot ID (i.e. a BMC reset) or an unreadable PEL directory empties the cache.
+
+    Example:
+
+    cache = pel_cache()
+    pel_ids = cache.lookup('SRC', 'BD8D1002')
+    """
+
+    # The fields which are indexed.
+    index_fields = ('SRC', 'Sev', 'Subsystem', 'PLID')
+
+    def __init__(self, list_options="-l"):
+        r"""
+        Description of argument(s):
+        list_options                The peltool options used to list PELs (e.g. "-l" or "-lfh").
+        """
+
+        self.list_options = list_options
+        self.invalidate()
+
+    def invalidate(self):
+        r"""
+        Empty the cache so that the next refresh reloads it.
+        """
+
+        self.boot_id = None
+        # The PEL entries keyed by PEL ID (e.g. "0x50000031"), in peltool order.
+        self.pels = collections.OrderedDict()
+        # The IDs (as integers) of all PELs found in the BMC's PEL directory, including those which
+        # list_options does not list (e.g. informational PELs for "-l").
+        self.seen_ids = set()
+        self.max_pel_id = 0
+        self.max_commit_time = ""
+        self.indexes = {field: {} for field in self.index_fields}
+
+    def add_pel(self, pel_id, pel):
+        r"""
+        Add the PEL entry to the cache and its indexes.
+
+        Description of argument(s):
+        pel_id                      The PEL ID (e.g. "0x50000031").
+        pel                         The PEL's entry from the peltool list.
+        """
+
+        self.pels[pel_id] = pel
+        for field in self.index_fields:
+            self.indexes[field].setdefault(pel.get(field), []).append(pel_id)
+
+    def remove_pels(self, pel_ids):
+        r"""
+        Remove the PEL entries from the cache and its indexes.
+
+        Description of argument(s):
+        pel_ids                     A set of PEL IDs (e.g. {"0x50000031"}).
+        """
+
+        for pel_id in pel_ids:
+            pel = self.pels.pop(pel_id)
+            for field in self.index_fields:
+                index = self.indexes[field]
+                index[pel.get(field)].remove(pel_id)
+                if not index[pel.get(field)]:
+                    del index[pel.get(field)]
+
+    def probe(self):
+        r"""
+        Return a tuple consisting of the BMC's boot ID and a dictionary mapping the ID (as an integer) of each
+        PEL in the BMC's PEL directory to its commit timestamp.  The dictionary is None if the directory
+        cannot be listed.
+        """
+
+        out_buf, stderr, rc = bsu.bmc_execute_command("cat /proc/sys/kernel/random/boot_id ; ls "
+                                                      + pel_logs_dir_path, ignore_err=1)
+        lines = out_buf.split("\n")
+        boot_id = lines[0].strip()
+        if rc:
+            return boot_id, None
+        pel_files = {}
+        for file_name in lines[1:]:
+            match = re.match(r"^([0-9]+)_([0-9A-Fa-f]+)$", file_name.strip())
+            if match:
+                pel_files[int(match.group(2), 16)] = match.group(1)
+        return boot_id, pel_files
+
+    def refresh(self):
+        r"""
+        Bring the cache up to date with the BMC.
+        """
+
+        boot_id, pel_files = self.probe()
+        if boot_id != self.boot_id or pel_files is None:
+            self.invalidate()
+            self.boot_id = boot_id
+
+        if pel_files is not None:
+            gone_ids = set(pel_id for pel_id in self.pels if int(pel_id, 16) not in pel_files)
+            self.remove_pels(gone_ids)
+            self.seen_ids &= set(pel_files)
+            if set(pel_files) <= self.seen_ids:
+                return
+
+        pel_data = peltool(self.list_options)
+        if pel_files is None:
+            # Without a PEL directory listing, PELs can't be tracked between refreshes.
+            self.invalidate()
+        for pel_id, pel in pel_data.items():
+            if pel_id not in self.pels:
+                self.add_pel(pel_id, pel)
+        if pel_files is not None:
+            self.seen_ids |= set(pel_files)
+            if pel_files:
+                self.max_pel_id = max(pel_files)
+                self.max_commit_time = max(pel_files.values())
+
+    def lookup(self, field, value):
+        r"""
+        Return the list of the IDs of the cached PELs whose field has the given value.  The cache is not
+        refreshed.
+
+        Description of argument(s):
+        field                       One of index_fields (e.g. "SRC").
+        value                       The value (e.g. "BD8D1002").
+        """
+
+        return list(self.indexes[field].get(value, []))
+
+
+# The pel_cache objects keyed by BMC host name.
+pel_caches = {}
+
+
+def get_pel_cache(refresh=True):
+    r"""
+    Return the pel_cache of the current BMC (i.e. ${OPENBMC_HOST}), refreshed unless refresh is False.
+
+    Description of argument(s):
+    refresh                         Indicates that the cache should be brought up to date with the BMC.
+    """
+
+    host = BuiltIn().get_variable_value("${OPENBMC_HOST}")
+    cache = pel_caches.setdefault(host, pel_cache())
+    if refresh:
+        cache.refresh()
+    return cache
+
+
+def invalidate_pel_cache():
+    r"""
+    Empty the PEL cache of the current BMC (e.g. after deleting PELs by means other than the Peltool
+    keyword).
+    """
+
+    host = BuiltIn().get_variable_value("${OPENBMC_HOST}")
+    if host in pel_caches:
+        pel_caches[host].invalidate()
+
+
 def fetch_all_pel_ids_for_src(src_id, severity):
     r"""
     Fetch all PEL IDs for the input SRC ID based on the severity type
@@ -77,13 +249,10 @@ def fetch_all_pel_ids_for_src(src_id, severity):
     """
 
     try:
-        src_pel_ids = []
-        pel_data = peltool(" -l")
-        pel_id_list = pel_data.keys()
-        for pel_id in pel_id_list:
-            # Check if required SRC ID with severity is present
-            if ((pel_data[pel_id]["SRC"] == src_id) and (pel_data[pel_id]["Sev"] == severity)):
-                src_pel_ids.append(pel_id)
+        cache = get_pel_cache()
+        # Check if required SRC ID with severity is present
+        src_pel_ids = [pel_id for pel_id in cache.lookup("SRC", src_id)
+                       if cache.pels[pel_id]["Sev"] == severity]
 
         if not src_pel_ids:
             raise peltool_exception(src_id + " with severity " + severity + " not present")
@@ -160,10 +329,9 @@ def fetch_all_src():
     """
     try:
         src_id = []
-        pel_data = peltool(" -l")
+        pel_data = get_pel_cache().pels
         if pel_data:
-            pel_id_list = pel_data.keys()
-            for pel_id in pel_id_list:
+            for pel_id in pel_data:
                 src_id.append(pel_data[pel_id]["SRC"])
         else:
             raise peltool_exception("No PEL entry found ..")
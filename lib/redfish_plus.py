@@ -8,7 +8,11 @@ from redfish.rest.v1 import HttpClient
 import gen_print as gp
 import func_args as fa
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import threading
+from functools import partial
+from redfish_response_cache import redfish_response_cache
 from robot.libraries.BuiltIn import BuiltIn
 
 
@@ -16,6 +20,86 @@ host = BuiltIn().get_variable_value("${OPENBMC_HOST}")
 MTLS_ENABLED = BuiltIn().get_variable_value("${MTLS_ENABLED}")
 CERT_DIR_PATH = BuiltIn().get_variable_value("${CERT_DIR_PATH}")
 VALID_CERT = BuiltIn().get_variable_value("${VALID_CERT}")
+# The maximum number of keep-alive connections kept per host.
+POOL_MAXSIZE = int(BuiltIn().get_variable_value("${REDFISH_POOL_MAXSIZE}", default=10))
+
+# Pooled sessions keyed by (host, certificate path).  The certificate path is None for the session mounted
+# on the redfish HttpClient.
+pooled_sessions = {}
+pooled_sessions_lock = threading.Lock()
+
+
+def create_pool_adapter():
+    r"""
+    Create and return an HTTPAdapter tuned for talking to a single BMC.
+
+    The adapter keeps up to POOL_MAXSIZE idle connections open so that successive requests re-use an
+    established TCP/TLS connection rather than paying for a new handshake each time.
+    """
+
+    return HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, pool_block=False)
+
+
+def get_mtls_session(certificate_name):
+    r"""
+    Return the pooled requests session for the given client certificate, creating it if necessary.
+
+    Description of argument(s):
+    certificate_name                The name of the client certificate file in CERT_DIR_PATH (e.g.
+                                    "Valid_Cert.pem").
+    """
+
+    cert_file_path = CERT_DIR_PATH + '/' + certificate_name
+    with pooled_sessions_lock:
+        session = pooled_sessions.get((host, cert_file_path))
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', create_pool_adapter())
+            session.cert = cert_file_path
+            pooled_sessions[(host, cert_file_path)] = session
+    return session
+
+
+def connection_pool_stats():
+    r"""
+    Return a dictionary of connection counters for all pooled sessions.
+
+    Example result:
+
+    connection_pool_stats:
+      [connections_opened]:          2
+      [requests]:                    517
+      [connections_reused]:          515
+    """
+
+    connections_opened = 0
+    num_requests = 0
+    with pooled_sessions_lock:
+        sessions = list(pooled_sessions.values())
+    for session in sessions:
+        for adapter in session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                connections_opened += pool.num_connections
+                num_requests += pool.num_requests
+
+    return {'connections_opened': connections_opened,
+            'requests': num_requests,
+            'connections_reused': num_requests - connections_opened}
+
+
+def close_connection_pool():
+    r"""
+    Close all pooled sessions and the connections they hold.
+    """
+
+    with pooled_sessions_lock:
+        for session in pooled_sessions.values():
+            session.close()
+        pooled_sessions.clear()
 
 
 def valid_http_status_code(status, valid_status_codes):
@@ -57,6 +141,38 @@ class redfish_plus(HttpClient):
 
     ROBOT_LIBRARY_SCOPE = 'TEST SUITE'
 
+    def __init__(self, *args, **kwargs):
+        r"""
+        Initialize the redfish_plus object.
+
+        In addition to the parent class initialization, the tuned pool adapter is mounted on the
+        requests session used by the parent class (if it has one) so that its connections are kept alive
+        and counted by connection_pool_stats.
+
+        Description of argument(s):
+        args                        See parent class __init__ prolog for details.
+        kwargs                      See parent class __init__ prolog for details.
+        """
+
+        super(redfish_plus, self).__init__(*args, **kwargs)
+        session = getattr(self, '_session', None)
+        if isinstance(session, requests.Session):
+            session.mount('https://', create_pool_adapter())
+            with pooled_sessions_lock:
+                pooled_sessions[(self.get_base_url(), None)] = session
+
+    def get_connection_pool_stats(self):
+        r"""
+        Return a dictionary of connection counters (see connection_pool_stats for details).
+
+        Example robot code:
+
+        ${stats}=  Redfish.Get Connection Pool Stats
+        Rprint Vars  stats
+        """
+
+        return connection_pool_stats()
+
     def rest_request(self, func, *args, **kwargs):
         r"""
         Perform redfish rest request and return response.
@@ -124,14 +240,127 @@ class redfish_plus(HttpClient):
         valid_http_status_code(response.status, valid_status_codes)
         return response
 
+    def enable_response_cache(self, max_entries=128, ttl=30):
+        r"""
+        Enable caching of GET responses for this session.
+
+        Once enabled, GET requests are served from a redfish_response_cache object (see
+        redfish_response_cache.py for details).  Any POST/PUT/PATCH/DELETE request invalidates the affected
+        entries.
+
+        Example robot code:
+
+        Redfish.Enable Response Cache  ttl=10
+        ${power_state}=  Redfish.Get Attribute  /redfish/v1/Systems/system  PowerState
+
+        Description of argument(s):
+        max_entries                 The maximum number of URIs to cache.
+        ttl                         The number of seconds an entry may be served before it is revalidated
+                                    with the BMC.
+        """
+
+        self._response_cache = redfish_response_cache(max_entries=max_entries, ttl=ttl)
+
+    def disable_response_cache(self):
+        r"""
+        Disable and discard the GET response cache.
+        """
+
+        self._response_cache = None
+
+    def get_response_cache_stats(self):
+        r"""
+        Return a dictionary of response cache statistics (hits, misses, etc.) or None if the cache is not
+        enabled.
+        """
+
+        cache = getattr(self, '_response_cache', None)
+        if cache is None:
+            return None
+        return cache.stats()
+
+    def invalidate_response_cache(self, path=None):
+        r"""
+        Invalidate response cache entries.
+
+        Description of argument(s):
+        path                        The URI whose entries (including ancestors and descendants) are to be
+                                    invalidated.  If None, the entire cache is cleared.
+        """
+
+        cache = getattr(self, '_response_cache', None)
+        if cache is not None:
+            cache.invalidate(path)
+
+    def cached_get(self, func, path, *args, **kwargs):
+        r"""
+        Perform a GET request through the response cache and return the response.
+
+        Description of argument(s):
+        func                        The function which does the actual GET request (e.g. get_with_mtls).
+        path                        The URI to be retrieved (e.g. "/redfish/v1/Managers/bmc").
+        args                        Any additional positional arguments for func (e.g. HttpClient.get's query
+                                    parameters).
+        kwargs                      Any additional keyword arguments for func (e.g. custom headers).  Requests
+                                    with additional arguments of either kind bypass the cache.
+        """
+
+        cache = self._response_cache
+        if args or kwargs:
+            return func(path, *args, **kwargs)
+
+        entry = cache.lookup(path)
+        response = None
+        if entry is not None:
+            fresh, etag = entry
+            if fresh:
+                cached_response = cache.response(path)
+                if cached_response is not None:
+                    return cached_response
+            elif etag is not None:
+                response = func(path, headers={'If-None-Match': etag})
+                if response.status == 304:
+                    cached_response = cache.response(path, revalidated=True)
+                    if cached_response is not None:
+                        return cached_response
+                    # The entry was evicted or invalidated while the request was outstanding.
+                    response = None
+        if response is None:
+            response = func(path)
+
+        if response.status == 200:
+            cache.store(path, response, response.dict)
+        elif entry is not None:
+            cache.invalidate(path)
+        return response
+
+    def invalidating_request(self, func, path, *args, **kwargs):
+        r"""
+        Perform a write request (POST/PUT/PATCH/DELETE), invalidate the affected response cache entries and
+        return the response.
+
+        Description of argument(s):
+        func                        The function which does the actual request (e.g. patch_with_mtls).
+        path                        The URI of the request.
+        args                        Passed directly to func.
+        kwargs                      Passed directly to func.
+        """
+
+        try:
+            return func(path, *args, **kwargs)
+        finally:
+            self.invalidate_response_cache(path)
+
     # Define rest function wrappers.
     def get(self, *args, **kwargs):
 
         if MTLS_ENABLED == 'True':
-            return self.rest_request(self.get_with_mtls, *args, **kwargs)
+            func = self.get_with_mtls
         else:
-            return self.rest_request(super(redfish_plus, self).get, *args,
-                                     **kwargs)
+            func = super(redfish_plus, self).get
+        if getattr(self, '_response_cache', None) is not None:
+            func = partial(self.cached_get, func)
+        return self.rest_request(func, *args, **kwargs)
 
     def head(self, *args, **kwargs):
 
@@ -144,34 +373,42 @@ class redfish_plus(HttpClient):
     def post(self, *args, **kwargs):
 
         if MTLS_ENABLED == 'True':
-            return self.rest_request(self.post_with_mtls, *args, **kwargs)
+            func = self.post_with_mtls
         else:
-            return self.rest_request(super(redfish_plus, self).post, *args,
-                                     **kwargs)
+            func = super(redfish_plus, self).post
+        if getattr(self, '_response_cache', None) is not None:
+            func = partial(self.invalidating_request, func)
+        return self.rest_request(func, *args, **kwargs)
 
     def put(self, *args, **kwargs):
 
         if MTLS_ENABLED == 'True':
-            return self.rest_request(self.put_with_mtls, *args, **kwargs)
+            func = self.put_with_mtls
         else:
-            return self.rest_request(super(redfish_plus, self).put, *args,
-                                     **kwargs)
+            func = super(redfish_plus, self).put
+        if getattr(self, '_response_cache', None) is not None:
+            func = partial(self.invalidating_request, func)
+        return self.rest_request(func, *args, **kwargs)
 
     def patch(self, *args, **kwargs):
 
         if MTLS_ENABLED == 'True':
-            return self.rest_request(self.patch_with_mtls, *args, **kwargs)
+            func = self.patch_with_mtls
         else:
-            return self.rest_request(super(redfish_plus, self).patch, *args,
-                                     **kwargs)
+            func = super(redfish_plus, self).patch
+        if getattr(self, '_response_cache', None) is not None:
+            func = partial(self.invalidating_request, func)
+        return self.rest_request(func, *args, **kwargs)
 
     def delete(self, *args, **kwargs):
 
         if MTLS_ENABLED == 'True':
-            return self.rest_request(self.delete_with_mtls, *args, **kwargs)
+            func = self.delete_with_mtls
         else:
-            return self.rest_request(super(redfish_plus, self).delete, *args,
-                                     **kwargs)
+            func = super(redfish_plus, self).delete
+        if getattr(self, '_response_cache', None) is not None:
+            func = partial(self.invalidating_request, func)
+        return self.rest_request(func, *args, **kwargs)
 
     def __del__(self):
         del self
@@ -179,10 +416,12 @@ class redfish_plus(HttpClient):
     def get_with_mtls(self, *args, **kwargs):
 
         cert_dict = kwargs.pop('certificate', {"certificate_name": VALID_CERT})
-        response = requests.get(url='https://' + host + args[0],
-                                cert=CERT_DIR_PATH + '/' + cert_dict['certificate_name'],
-                                verify=False,
-                                headers={"Cache-Control": "no-cache"})
+        headers = {"Cache-Control": "no-cache"}
+        headers.update(kwargs.pop('headers', {}))
+        session = get_mtls_session(cert_dict['certificate_name'])
+        response = session.get(url='https://' + host + args[0],
+                               verify=False,
+                               headers=headers)
 
         response.status = response.status_code
         if response.status == 200:
@@ -194,11 +433,11 @@ class redfish_plus(HttpClient):
 
         cert_dict = kwargs.pop('certificate', {"certificate_name": VALID_CERT})
         body = kwargs.pop('body', {})
-        response = requests.post(url='https://' + host + args[0],
-                                 json=body,
-                                 cert=CERT_DIR_PATH + '/' + cert_dict['certificate_name'],
-                                 verify=False,
-                                 headers={"Content-Type": "application/json"})
+        session = get_mtls_session(cert_dict['certificate_name'])
+        response = session.post(url='https://' + host + args[0],
+                                verify=False,
+                                json=body,
+                                headers={"Content-Type": "application/json"})
 
         response.status = response.status_code
 
@@ -208,11 +447,11 @@ class redfish_plus(HttpClient):
 
         cert_dict = kwargs.pop('certificate', {"certificate_name": VALID_CERT})
         body = kwargs.pop('body', {})
-        response = requests.patch(url='https://' + host + args[0],
-                                  json=body,
-                                  cert=CERT_DIR_PATH + '/' + cert_dict['certificate_name'],
-                                  verify=False,
-                                  headers={"Content-Type": "application/json"})
+        session = get_mtls_session(cert_dict['certificate_name'])
+        response = session.patch(url='https://' + host + args[0],
+                                 verify=False,
+                                 json=body,
+                                 headers={"Content-Type": "application/json"})
 
         response.status = response.status_code
 
@@ -221,10 +460,10 @@ class redfish_plus(HttpClient):
     def delete_with_mtls(self, *args, **kwargs):
 
         cert_dict = kwargs.pop('certificate', {"certificate_name": VALID_CERT})
-        response = requests.delete(url='https://' + host + args[0],
-                                   cert=CERT_DIR_PATH + '/' + cert_dict['certificate_name'],
-                                   verify=False,
-                                   headers={"Content-Type": "application/json"})
+        session = get_mtls_session(cert_dict['certificate_name'])
+        response = session.delete(url='https://' + host + args[0],
+                                  verify=False,
+                                  headers={"Content-Type": "application/json"})
 
         response.status = response.status_code
 
@@ -234,11 +473,11 @@ class redfish_plus(HttpClient):
 
         cert_dict = kwargs.pop('certificate', {"certificate_name": VALID_CERT})
         body = kwargs.pop('body', {})
-        response = requests.put(url='https://' + host + args[0],
-                                json=body,
-                                cert=CERT_DIR_PATH + '/' + cert_dict['certificate_name'],
-                                verify=False,
-                                headers={"Content-Type": "application/json"})
+        session = get_mtls_session(cert_dict['certificate_name'])
+        response = session.put(url='https://' + host + args[0],
+                               verify=False,
+                               json=body,
+                               headers={"Content-Type": "application/json"})
 
         response.status = response.status_code
 
@@ -248,11 +487,11 @@ class redfish_plus(HttpClient):
 
         cert_dict = kwargs.pop('certificate', {"certificate_name": VALID_CERT})
         body = kwargs.pop('body', {})
-        response = requests.head(url='https://' + host + args[0],
-                                 json=body,
-                                 cert=CERT_DIR_PATH + '/' + cert_dict['certificate_name'],
-                                 verify=False,
-                                 headers={"Content-Type": "application/json"})
+        session = get_mtls_session(cert_dict['certificate_name'])
+        response = session.head(url='https://' + host + args[0],
+                                verify=False,
+                                json=body,
+                                headers={"Content-Type": "application/json"})
 
         response.status = response.status_code
 
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+r"""
+Define the redfish_response_cache class.
+"""
+
+import collections
+import copy
+import threading
+import time
+
+
+def get_etag(response):
+    r"""
+    Return the ETag header value from a response object or None if the response has no ETag.
+
+    Both redfish RestResponse objects and requests Response objects are supported.
+
+    Description of argument(s):
+    response                        A response object returned by a GET request.
+    """
+
+    if hasattr(response, 'getheader'):
+        return response.getheader('ETag')
+    headers = getattr(response, 'headers', None)
+    if headers is None:
+        return None
+    return headers.get('ETag')
+
+
+class cached_response(object):
+    r"""
+    A response object served from the redfish_response_cache.
+
+    The status and dict attributes are those of the cached 200 response.  All other attribute lookups are
+    passed through to the original response object.
+    """
+
+    def __init__(self, response, response_dict):
+        self._response = response
+        self.status = 200
+        self.dict = response_dict
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class redfish_response_cache(object):
+    r"""
+    A per-session, least-recently-used cache of redfish GET responses keyed by URI.
+
+    An entry younger than ttl seconds is served without contacting the BMC.  An older entry which has an
+    ETag is revalidated with an If-None-Match request so that a 304 response can re-use the already parsed
+    dictionary.  Any write request (POST/PUT/PATCH/DELETE) invalidates the written URI, its ancestors and
+    its descendants.
+
+    Example code:
+
+    cache = redfish_response_cache(max_entries=64, ttl=10)
+    entry = cache.lookup("/redfish/v1/Managers/bmc")
+    ...
+    cache.store("/redfish/v1/Managers/bmc", response, response.dict)
+    cache.invalidate("/redfish/v1/Managers/bmc/EthernetInterfaces/eth0")
+    """
+
+    def __init__(self, max_entries=128, ttl=30):
+        r"""
+        Initialize the cache.
+
+        Description of argument(s):
+        max_entries                 The maximum number of URIs to keep.  When exceeded, the least recently
+                                    used entry is evicted.
+        ttl                         The number of seconds an entry may be served without revalidation.
+        """
+
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        self.__stats = collections.OrderedDict([('hits', 0), ('misses', 0), ('revalidations', 0),
+                                                ('invalidations', 0), ('evictions', 0)])
+
+    @staticmethod
+    def normalize_uri(uri):
+        r"""
+        Return the uri with any trailing slash removed so that "/redfish/v1/" and "/redfish/v1" share one
+        entry.
+
+        Description of argument(s):
+        uri                         A redfish URI (e.g. "/redfish/v1/Systems/system/").
+        """
+
+        return uri.rstrip('/') or '/'
+
+    def lookup(self, uri):
+        r"""
+        Return a tuple (fresh, etag) describing the cache entry for uri or None if there is no entry.
+
+        fresh is True if the entry may be served without contacting the BMC.  Otherwise, the caller should
+        revalidate using etag (which may be None) and then call either response (on a 304) or store.
+
+        Description of argument(s):
+        uri                         A redfish URI (e.g. "/redfish/v1/Systems/system").
+        """
+
+        uri = self.normalize_uri(uri)
+        with self.__lock:
+            entry = self.__entries.get(uri)
+            if entry is None:
+                self.__stats['misses'] += 1
+                return None
+            self.__entries.move_to_end(uri)
+            fresh = (time.time() - entry['time']) < self.ttl
+            if fresh:
+                self.__stats['hits'] += 1
+            return fresh, entry['etag']
+
+    def response(self, uri, revalidated=False):
+        r"""
+        Return a cached_response for uri or None if the entry has been evicted or invalidated since lookup
+        reported it.
+
+        Description of argument(s):
+        uri                         A redfish URI which lookup has reported as being in the cache.
+        revalidated                 Indicates that the BMC has just confirmed the entry (i.e. returned 304).
+                                    The entry's age is reset and the revalidation is counted.
+        """
+
+        uri = self.normalize_uri(uri)
+        with self.__lock:
+            entry = self.__entries.get(uri)
+            if entry is None:
+                return None
+            if revalidated:
+                entry['time'] = time.time()
+                self.__stats['revalidations'] += 1
+            # Callers are free to modify what they get back so hand out a copy.
+            return cached_response(entry['response'], copy.deepcopy(entry['dict']))
+
+    def store(self, uri, response, response_dict):
+        r"""
+        Add or replace the cache entry for uri.
+
+        Description of argument(s):
+        uri                         A redfish URI (e.g. "/redfish/v1/Systems/system").
+        response                    The 200 response object obtained for the uri.
+        response_dict               The parsed body of the response.
+        """
+
+        uri = self.normalize_uri(uri)
+        with self.__lock:
+            if uri in self.__entries:
+                # A stale entry is being replaced with a full response.
+                self.__stats['misses'] += 1
+            self.__entries[uri] = {'time': time.time(), 'etag': get_etag(response),
+                                   'response': response, 'dict': copy.deepcopy(response_dict)}
+            self.__entries.move_to_end(uri)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+                self.__stats['evictions'] += 1
+
+    def invalidate(self, uri=None):
+        r"""
+        Remove the entries affected by a write to uri.
+
+        Description of argument(s):
+        uri                         The URI of a POST/PUT/PATCH/DELETE request.  Entries for this uri, its
+                                    ancestors and its descendants are removed.  If uri is None, the whole
+                                    cache is cleared.
+        """
+
+        with self.__lock:
+            if uri is None:
+                self.__stats['invalidations'] += len(self.__entries)
+                self.__entries.clear()
+                return
+            uri = self.normalize_uri(uri)
+            for key in list(self.__entries.keys()):
+                if key == uri or uri.startswith(key + '/') or key.startswith(uri + '/'):
+                    del self.__entries[key]
+                    self.__stats['invalidations'] += 1
+
+    def stats(self):
+        r"""
+        Return a dictionary of cache statistics.
+
+        Example result:
+
+        stats:
+          [hits]:                        40
+          [misses]:                      6
+          [revalidations]:               3
+          [invalidations]:               1
+          [evictions]:                   0
+          [entries]:                     5
+        """
+
+        with self.__lock:
+            stats = collections.OrderedDict(self.__stats)
+            stats['entries'] = len(self.__entries)
+        return stats
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+r"""
+This module provides a pool of long-lived bash processes which run shell command strings without the cost of
+starting a new shell for each one.  It is the backend of gen_cmd.shell_cmd when a pool size is configured.
+"""
+
+import os
+import re
+import time
+import uuid
+import shlex
+import signal
+import asyncio
+import functools
+import threading
+import selectors
+import subprocess
+
+
+class shell_worker(object):
+    r"""
+    A long-lived bash process which runs one command string at a time.
+
+    Each command string is run with eval in a subshell so that it cannot alter the state of the worker shell
+    (e.g. by calling exit or cd).  The caller's current working directory and any changes made to os.environ
+    since the worker was started are applied to the subshell, so a command behaves as if it had been run by
+    a freshly started shell.  The end of the command's output is marked by a token which is unique to the
+    worker, followed by the command's exit status.
+
+    A timed out command is handled by killing the worker's entire process group.  The worker is then dead
+    and must be discarded.
+    """
+
+    def __init__(self):
+        r"""
+        Start the worker bash process.
+        """
+
+        self.token = "__shell_worker_" + uuid.uuid4().hex + "__"
+        self.env = dict(os.environ)
+        self.sub_proc = subprocess.Popen(['/bin/bash'],
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE,
+                                         env=self.env,
+                                         start_new_session=True)
+        self.pid = self.sub_proc.pid
+        self.dead = False
+
+    def alive(self):
+        r"""
+        Return True if the worker can accept another command.
+        """
+
+        return not self.dead and self.sub_proc.poll() is None
+
+    def kill(self):
+        r"""
+        Kill the worker and any processes it has started.
+        """
+
+        self.dead = True
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.sub_proc.wait()
+        for stream in (self.sub_proc.stdin, self.sub_proc.stdout, self.sub_proc.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def env_commands(self):
+        r"""
+        Return bash commands which bring the worker's environment in line with the current os.environ.
+        """
+
+        buffer = ""
+        current_env = dict(os.environ)
+        for key, value in current_env.items():
+            if self.env.get(key) != value and re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", key):
+                buffer += "export " + key + "=" + shlex.quote(value) + "; "
+        for key in self.env:
+            if key not in current_env and re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", key):
+                buffer += "unset -v " + key + "; "
+        return buffer
+
+    def run(self,
+            command_string,
+            time_out=None,
+            return_stderr=0):
+        r"""
+        Run the command string and return a tuple consisting of the shell return code, stdout, stderr and a
+        timed out indicator.
+
+        Description of argument(s):
+        command_string              The command string to be run (e.g. "ls /tmp").
+        time_out                    A time-out value expressed in seconds.  If the command string has not
+                                    finished executing within <time_out> seconds, the worker is killed, the
+                                    return code is set to -9 and the timed out indicator is set.
+        return_stderr               If set, stdout and stderr are returned separately.  Otherwise, stderr is
+                                    merged into stdout and the returned stderr is empty.
+        """
+
+        script = "( cd " + shlex.quote(os.getcwd()) + " 2>/dev/null; " + self.env_commands() \
+            + "eval " + shlex.quote(command_string) + "\n) </dev/null" \
+            + ("" if return_stderr else " 2>&1") \
+            + "; printf '%s%d\\n' " + self.token + " $?; printf '%s\\n' " + self.token + " >&2\n"
+        self.sub_proc.stdin.write(script.encode('utf-8'))
+        self.sub_proc.stdin.flush()
+
+        deadline = None if time_out is None else time.time() + float(time_out)
+        token = self.token.encode('utf-8')
+        buffers = {self.sub_proc.stdout: b"", self.sub_proc.stderr: b""}
+        selector = selectors.DefaultSelector()
+        for stream in buffers:
+            selector.register(stream, selectors.EVENT_READ)
+        shell_rc = None
+        timed_out = False
+        try:
+            while selector.get_map():
+                time_left = None if deadline is None else deadline - time.time()
+                if time_left is not None and time_left <= 0:
+                    timed_out = True
+                    break
+                for key, events in selector.select(time_left):
+                    data = os.read(key.fileobj.fileno(), 65536)
+                    if not data:
+                        # The worker died.
+                        selector.unregister(key.fileobj)
+                        continue
+                    buffers[key.fileobj] += data
+                    if re.search(re.escape(token) + (b"-?[0-9]+\n" if key.fileobj is self.sub_proc.stdout
+                                                     else b"\n"), buffers[key.fileobj]):
+                        selector.unregister(key.fileobj)
+        finally:
+            selector.close()
+
+        stdout_buf, _, rc_buf = buffers[self.sub_proc.stdout].partition(token)
+        stderr_buf = buffers[self.sub_proc.stderr].partition(token)[0]
+        if timed_out:
+            self.kill()
+            shell_rc = -signal.SIGKILL
+        elif rc_buf.strip():
+            shell_rc = int(rc_buf.strip())
+        else:
+            # The worker died before reporting (e.g. it was killed externally).
+            self.kill()
+            shell_rc = -signal.SIGKILL
+
+        return shell_rc, self.decode(stdout_buf), self.decode(stderr_buf), timed_out
+
+    @staticmethod
+    def decode(buffer):
+        r"""
+        Decode command output the way subprocess does with universal_newlines=True.
+
+        Description of argument(s):
+        buffer                      The bytes to be decoded.
+        """
+
+        return buffer.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+
+
+class shell_worker_pool(object):
+    r"""
+    A thread-safe pool of shell_worker objects.
+
+    Workers are started on demand, up to max_workers.  A caller which finds every worker busy waits for one
+    to become free.
+
+    Example code:
+
+    pool = shell_worker_pool(max_workers=4)
+    shell_rc, stdout_buf, stderr_buf, timed_out = pool.run("ping -c 1 bmc1", time_out=10)
+    """
+
+    def __init__(self, max_workers=4):
+        r"""
+        Description of argument(s):
+        max_workers                 The maximum number of bash processes to keep.
+        """
+
+        self.max_workers = max(int(max_workers), 1)
+        self.__idle_workers = []
+        self.__num_workers = 0
+        self.__condition = threading.Condition()
+
+    def __get_worker(self):
+        with self.__condition:
+            while True:
+                while self.__idle_workers:
+                    worker = self.__idle_workers.pop()
+                    if worker.alive():
+                        return worker
+                    self.__num_workers -= 1
+                if self.__num_workers < self.max_workers:
+                    self.__num_workers += 1
+                    break
+                self.__condition.wait()
+        try:
+            return shell_worker()
+        except Exception:
+            self.__put_worker(None)
+            raise
+
+    def __put_worker(self, worker):
+        with self.__condition:
+            if worker is not None and worker.alive():
+                self.__idle_workers.append(worker)
+            else:
+                self.__num_workers -= 1
+            self.__condition.notify()
+
+    def run(self,
+            command_string,
+            time_out=None,
+            return_stderr=0):
+        r"""
+        Run the command string on a free worker and return a tuple consisting of the shell return code,
+        stdout, stderr, a timed out indicator and the worker's pid.
+
+        See shell_worker.run for a description of the arguments.
+        """
+
+        worker = self.__get_worker()
+        try:
+            try:
+                result = worker.run(command_string, time_out, return_stderr)
+            except (BrokenPipeError, ValueError):
+                # The idle worker died (e.g. it was killed externally).  Retry once with a new one.
+                worker.kill()
+                worker = shell_worker()
+                result = worker.run(command_string, time_out, return_stderr)
+        except BaseException:
+            if worker.alive():
+                # The command may still be running so the worker's state is unknown.
+                worker.kill()
+            raise
+        finally:
+            self.__put_worker(worker)
+        return result + (worker.pid,)
+
+    async def run_async(self,
+                        command_string,
+                        time_out=None,
+                        return_stderr=0):
+        r"""
+        Asyncio version of run.  The command is run by a thread of the event loop's default executor so that
+        the event loop is not blocked.
+        """
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(self.run, command_string, time_out,
+                                                                  return_stderr))
+
+    def close(self):
+        r"""
+        Stop all idle workers.
+        """
+
+        with self.__condition:
+            idle_workers = self.__idle_workers
+            self.__idle_workers = []
+            self.__num_workers -= len(idle_workers)
+        for worker in idle_workers:
+            worker.kill()
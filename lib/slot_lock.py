@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+r"""
+This module provides a lock which may be held by a limited number of processes at the same time.  It is used
+to cap the number of concurrent instances of an expensive operation (e.g. FFDC collection) across separate
+programs running on the same host.
+"""
+
+import os
+import time
+import fcntl
+
+
+class slot_lock(object):
+    r"""
+    A counting lock shared by all processes on a host which use the same directory and name.
+
+    The lock consists of num_slots files in dir_path.  A process holds a slot by holding an exclusive flock
+    on one of the files.  Since the operating system releases flocks when a process dies, a slot held by a
+    process which is killed is freed automatically.
+
+    Example code:
+
+    with slot_lock("/tmp/ffdc_slots/", 2, "ffdc"):
+        collect_ffdc()
+    """
+
+    def __init__(self,
+                 dir_path,
+                 num_slots,
+                 name='slot',
+                 poll_interval=1.0):
+        r"""
+        Description of argument(s):
+        dir_path                    The directory which holds the slot files.  It is created if it does not
+                                    exist.
+        num_slots                   The number of processes which may hold the lock at the same time.
+        name                        The name of the lock.  This forms part of the slot file names so that one
+                                    directory may hold several locks.
+        poll_interval               The number of seconds to wait between attempts to get a free slot.
+        """
+
+        self.dir_path = dir_path
+        self.num_slots = max(int(num_slots), 1)
+        self.name = name
+        self.poll_interval = float(poll_interval)
+        self.slot_file = None
+        self.slot_num = None
+        # The number of seconds spent waiting for a slot by the last call to acquire.
+        self.wait_time = 0.0
+
+    def slot_file_path(self, slot_num):
+        r"""
+        Return the path of the file for the given slot.
+
+        Description of argument(s):
+        slot_num                    The slot number (0 to num_slots - 1).
+        """
+
+        return os.path.join(self.dir_path, self.name + "_" + str(slot_num) + ".lock")
+
+    def try_acquire(self):
+        r"""
+        Try once to get a free slot and return True if one was obtained.
+        """
+
+        os.makedirs(self.dir_path, exist_ok=True)
+        for slot_num in range(self.num_slots):
+            slot_file = open(self.slot_file_path(slot_num), 'a')
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot_file.close()
+                continue
+            self.slot_file = slot_file
+            self.slot_num = slot_num
+            return True
+        return False
+
+    def acquire(self,
+                time_out=None):
+        r"""
+        Wait for a free slot and return True once one is held.  Return False if no slot could be obtained
+        within time_out seconds.
+
+        Description of argument(s):
+        time_out                    The maximum number of seconds to wait.  None means wait forever.
+        """
+
+        if self.slot_file is not None:
+            return True
+        start_time = time.time()
+        while not self.try_acquire():
+            if time_out is not None and time.time() - start_time >= time_out:
+                self.wait_time = time.time() - start_time
+                return False
+            time.sleep(self.poll_interval)
+        self.wait_time = time.time() - start_time
+        return True
+
+    def release(self):
+        r"""
+        Free the slot held by this object, if any.
+        """
+
+        if self.slot_file is None:
+            return
+        fcntl.flock(self.slot_file, fcntl.LOCK_UN)
+        self.slot_file.close()
+        self.slot_file = None
+        self.slot_num = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+r"""
+This module provides a thread-safe pool of persistent paramiko SSH sessions.  It is the backend of
+bmc_ssh_utils.bmc_execute_command and os_execute_command when SSH_SESSION_POOL is set.
+
+Each session is one SSH transport per (host, port, username) which is kept open between commands.  Every
+command runs on its own channel of the transport, so several threads may run commands on the same host at
+the same time without the cost of a new connection and login for each command.
+"""
+
+import time
+import select
+import socket
+import threading
+
+import paramiko
+
+
+class ssh_session(object):
+    r"""
+    A persistent, authenticated SSH transport to one host.
+
+    The transport is opened on first use.  If it is found to be dead when a command is to be run (e.g.
+    because the host has rebooted), it is re-opened and the command is run on the new transport.
+    """
+
+    def __init__(self,
+                 host,
+                 username,
+                 password,
+                 port=22,
+                 connect_timeout=25.0,
+                 max_channels=4,
+                 keepalive_interval=15):
+        r"""
+        Description of argument(s):
+        host                        The host name or IP address of the host.
+        username                    The user name to log in with.
+        password                    The password to log in with.
+        port                        The SSH port of the host.
+        connect_timeout             The number of seconds allowed for connecting, logging in and opening a
+                                    channel.
+        max_channels                The maximum number of commands which may run on the transport at the
+                                    same time.  Many BMC SSH servers limit the number of channels per
+                                    connection.
+        keepalive_interval          The number of seconds between keepalive messages on an idle transport.
+                                    Keepalives let a dead connection be detected before it is used.
+        """
+
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = int(port)
+        self.connect_timeout = float(connect_timeout)
+        self.keepalive_interval = int(keepalive_interval)
+        self.transport = None
+        # The number of times the transport has been opened.
+        self.connect_count = 0
+        self.__lock = threading.Lock()
+        self.__channel_semaphore = threading.BoundedSemaphore(max(int(max_channels), 1))
+
+    def healthy(self, transport=None):
+        r"""
+        Return True if the transport is open and authenticated.
+
+        Description of argument(s):
+        transport                   The transport to check.  The default is the session's current transport.
+        """
+
+        transport = transport or self.transport
+        return transport is not None and transport.is_active() and transport.is_authenticated()
+
+    def __authenticate(self, transport):
+        try:
+            transport.auth_password(self.username, self.password)
+        except paramiko.BadAuthenticationType as e:
+            if 'keyboard-interactive' not in e.allowed_types:
+                raise
+            # Answer every prompt with the password.
+            transport.auth_interactive(self.username,
+                                       lambda title, instructions, prompts: [self.password] * len(prompts))
+
+    def connect(self, broken_transport=None):
+        r"""
+        Open the transport and return it.  If the session already has a healthy transport other than
+        broken_transport, it is returned instead.
+
+        Description of argument(s):
+        broken_transport            A transport which the caller found to be dead.  It is closed if it is
+                                    still the session's transport.
+        """
+
+        with self.__lock:
+            if self.transport is not None and self.transport is not broken_transport \
+                    and self.healthy():
+                return self.transport
+            self.__close()
+            sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            transport = paramiko.Transport(sock)
+            try:
+                transport.start_client(timeout=self.connect_timeout)
+                self.__authenticate(transport)
+            except BaseException:
+                transport.close()
+                raise
+            transport.set_keepalive(self.keepalive_interval)
+            self.transport = transport
+            self.connect_count += 1
+            return transport
+
+    def __close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def close(self):
+        r"""
+        Close the transport.  Commands still running on it fail.
+        """
+
+        with self.__lock:
+            self.__close()
+
+    def open_channel(self):
+        r"""
+        Open a channel on the transport and return it.  A dead transport is re-opened once.
+        """
+
+        transport = self.transport
+        if not self.healthy(transport):
+            transport = self.connect(transport)
+        try:
+            return transport.open_session(timeout=self.connect_timeout)
+        except (paramiko.SSHException, EOFError, OSError):
+            # The transport died since it was last used (e.g. the host rebooted).  The command has not been
+            # started so it is safe to retry it on a new transport.
+            transport = self.connect(transport)
+            return transport.open_session(timeout=self.connect_timeout)
+
+    def open_sftp(self):
+        r"""
+        Open an SFTP client on a new channel of the transport and return it.  The caller must close it.
+
+        SFTP clients are not counted against max_channels so callers which open several of them at once must
+        bound their number themselves.
+        """
+
+        channel = self.open_channel()
+        try:
+            channel.invoke_subsystem('sftp')
+            return paramiko.SFTPClient(channel)
+        except BaseException:
+            channel.close()
+            raise
+
+    def execute_command(self,
+                        cmd_buf,
+                        time_out=None):
+        r"""
+        Run the command on the host and return its stdout, stderr and return code.
+
+        As with SSHLibrary's execute_command, one trailing newline is removed from stdout and stderr.  A
+        ValueError is raised if the command does not finish within time_out seconds.
+
+        Description of argument(s):
+        cmd_buf                     The command string to be run.
+        time_out                    The number of seconds to allow for the command.  None means no limit.
+        """
+
+        with self.__channel_semaphore:
+            channel = self.open_channel()
+            try:
+                return self.__run_channel(channel, cmd_buf, time_out)
+            finally:
+                channel.close()
+
+    @staticmethod
+    def __run_channel(channel, cmd_buf, time_out):
+        channel.exec_command(cmd_buf)
+        channel.shutdown_write()
+        deadline = None if time_out is None else time.time() + float(time_out)
+        stdout_chunks = []
+        stderr_chunks = []
+        while True:
+            while channel.recv_ready():
+                stdout_chunks.append(channel.recv(65536))
+            while channel.recv_stderr_ready():
+                stderr_chunks.append(channel.recv_stderr(65536))
+            if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                break
+            wait_time = 1.0
+            if deadline is not None:
+                wait_time = min(wait_time, deadline - time.time())
+                if wait_time <= 0:
+                    raise ValueError("The SSH command timed out after " + str(time_out) + " seconds:\n"
+                                     + cmd_buf)
+            # The channel's file descriptor becomes readable when data, an exit status or EOF arrives.
+            select.select([channel], [], [], wait_time)
+        rc = channel.recv_exit_status()
+
+        stdout = b"".join(stdout_chunks).decode('utf-8', errors='replace')
+        stderr = b"".join(stderr_chunks).decode('utf-8', errors='replace')
+        if stdout.endswith("\n"):
+            stdout = stdout[:-1]
+        if stderr.endswith("\n"):
+            stderr = stderr[:-1]
+        return stdout, stderr, rc
+
+
+class ssh_session_pool(object):
+    r"""
+    A thread-safe collection of ssh_session objects keyed by (host, port, username).
+
+    Example code:
+
+    pool = ssh_session_pool()
+    stdout, stderr, rc = pool.execute_command("bmc1", "root", "0penBmc", "uptime")
+    """
+
+    def __init__(self, **session_args):
+        r"""
+        Description of argument(s):
+        session_args                Arguments to be passed to each new ssh_session (e.g. connect_timeout,
+                                    max_channels).
+        """
+
+        self.session_args = session_args
+        self.__sessions = {}
+        self.__lock = threading.Lock()
+
+    def get_session(self,
+                    host,
+                    username,
+                    password,
+                    port=22):
+        r"""
+        Return the session for the host, port and username, creating it if necessary.
+
+        Description of argument(s):
+        See ssh_session.__init__ for details.
+        """
+
+        key = (host, int(port), username)
+        with self.__lock:
+            session = self.__sessions.get(key)
+            if session is not None and session.password != password:
+                session.close()
+                session = None
+            if session is None:
+                session = ssh_session(host, username, password, port, **self.session_args)
+                self.__sessions[key] = session
+            return session
+
+    def execute_command(self,
+                        host,
+                        username,
+                        password,
+                        cmd_buf,
+                        port=22,
+                        time_out=None):
+        r"""
+        Run the command on the host and return its stdout, stderr and return code.
+
+        Description of argument(s):
+        See ssh_session.__init__ and ssh_session.execute_command for details.
+        """
+
+        return self.get_session(host, username, password, port).execute_command(cmd_buf, time_out)
+
+    def close(self):
+        r"""
+        Close all sessions.
+        """
+
+        with self.__lock:
+            sessions = list(self.__sessions.values())
+            self.__sessions = {}
+        for session in sessions:
+            session.close()
+
+
+default_pool = None
+default_pool_lock = threading.Lock()
+
+
+def get_ssh_session_pool():
+    r"""
+    Return the process-wide ssh_session_pool object, creating it if necessary.
+    """
+
+    global default_pool
+
+    with default_pool_lock:
+        if default_pool is None:
+            default_pool = ssh_session_pool()
+        return default_pool
+
+
+def pooled_ssh_execute_command(host,
+                               username,
+                               password,
+                               cmd_buf,
+                               port=22,
+                               time_out=None):
+    r"""
+    Run the command on the host using the process-wide session pool and return its stdout, stderr and
+    return code.
+
+    Example robot code:
+
+    ${stdout}  ${stderr}  ${rc}=  Pooled SSH Execute Command  ${OPENBMC_HOST}  ${OPENBMC_USERNAME}
+    ...  ${OPENBMC_PASSWORD}  uptime
+
+    Description of argument(s):
+    See ssh_session.__init__ and ssh_session.execute_command for details.
+    """
+
+    return get_ssh_session_pool().execute_command(host, username, password, cmd_buf, port, time_out)
+
+
+def close_ssh_session_pool():
+    r"""
+    Close all sessions of the process-wide session pool.
+    """
+
+    if default_pool is not None:
+        default_pool.close()
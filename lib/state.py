@@ -32,14 +32,19 @@ import gen_valid as gv
 import gen_robot_utils as gru
 import gen_cmd as gc
 import bmc_ssh_utils as bsu
+import state_event_monitor as sem
 
 from robot.libraries.BuiltIn import BuiltIn
 from robot.utils import DotDict
+from robot.utils import timestr_to_secs, secs_to_timestr
 
 import re
 import os
 import sys
 import imp
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 
 # NOTE: Avoid importing utils.robot because utils.robot imports state.py
@@ -103,6 +108,33 @@ default_os_req_states = ['os_ping',
 # or the local epoch time.
 USE_BMC_EPOCH_TIME = int(os.environ.get('USE_BMC_EPOCH_TIME', 0))
 
+# When BATCH_STATE_PROBES is set, get_state collects all shell-derived BMC sub
+# states with one combined SSH command and runs the ping probes (BMC and OS) in
+# background threads while the SSH and REST/Redfish requests are in progress.
+batch_state_probes = int(os.environ.get('BATCH_STATE_PROBES', 0)) or \
+    int(BuiltIn().get_variable_value("${BATCH_STATE_PROBES}", default=0))
+
+# When EVENT_DRIVEN_WAIT_STATE is set, wait_state re-checks the state as soon
+# as the BMC reports a state change (via websocket D-Bus signals or Redfish
+# SSE).  While the event monitor is connected, polling continues only as a
+# safety net, every EVENT_WAIT_SAFETY_INTERVAL or every wait_state interval,
+# whichever is longer.  Otherwise, the state is polled every wait_state
+# interval.
+event_driven_wait_state = int(os.environ.get('EVENT_DRIVEN_WAIT_STATE', 0)) or \
+    int(BuiltIn().get_variable_value("${EVENT_DRIVEN_WAIT_STATE}", default=0))
+event_wait_safety_interval = os.environ.get('EVENT_WAIT_SAFETY_INTERVAL', '') or \
+    BuiltIn().get_variable_value("${EVENT_WAIT_SAFETY_INTERVAL}",
+                                 default="15 seconds")
+# Sub states whose transitions are not reported by BMC state events.  A
+# wait_state for any of these polls every interval even when event driven.
+non_event_sub_states = ['ping', 'packet_loss', 'uptime', 'epoch_seconds',
+                        'elapsed_boot_time', 'os_ping', 'os_login',
+                        'os_run_cmd']
+
+# The latency in seconds of each probe run by the most recent get_state call
+# (e.g. state_probe_latency['redfish']).
+state_probe_latency = DotDict()
+
 # Useful state constant definition(s).
 if not redfish_support_trans_state:
     # When a user calls get_state w/o specifying req_states, default_req_states
@@ -331,6 +363,168 @@ def expressions_key():
     return '<expressions>'
 
 
+class state_matcher(object):
+    r"""
+    A compiled form of a match_state dictionary (see compare_states for
+    details).  The regular expressions are compiled and the expressions are
+    byte-compiled once when the object is created so that repeated comparisons
+    (e.g. on every wait_state poll) only have to do the matching.
+
+    Objects of this class are normally obtained from get_state_matcher which
+    caches them by content.
+
+    Example code:
+
+    matcher = get_state_matcher(standby_match_state)
+    if not matcher.match(state):
+        gp.print_var(matcher.failed_key)
+    """
+
+    def __init__(self,
+                 match_state,
+                 match_type='and'):
+        r"""
+        Compile the match_state.
+
+        Description of argument(s):
+        match_state     See compare_states for details.  It may not be a
+                        return_state_constant name.
+        match_type      This may be 'and' or 'or'.
+        """
+
+        self.match_type = match_type
+        self.default_match = (match_type == 'and')
+        # The key of the entry which decided the result of the last call to
+        # match (None if no single entry decided it).
+        self.failed_key = None
+        self.__checks = []
+        for key, match_state_value in match_state.items():
+            # Blank match_state_value means "don't care".
+            if match_state_value == "":
+                continue
+            if key == expressions_key():
+                self.__checks.append((key, [compile_state_expression(expr)
+                                            for expr in match_state_value]))
+            elif isinstance(match_state_value, str):
+                self.__checks.append((key, re.compile(match_state_value)))
+            else:
+                # Let re.match report the bad value when matching, as
+                # compare_states always has.
+                self.__checks.append((key, match_state_value))
+
+    def match(self,
+              state,
+              match_state=None):
+        r"""
+        Compare the state dictionary with the compiled match state and return
+        the result.  The key of the entry which decided the result is saved
+        in self.failed_key.
+
+        Description of argument(s):
+        state           A state dictionary such as the one returned by the
+                        get_state function.
+        match_state     The original match state.  It is made available to
+                        expressions under the name "match_state".
+        """
+
+        self.failed_key = None
+        eval_locals = None
+        for key, check in self.__checks:
+            if key == expressions_key():
+                if eval_locals is None:
+                    eval_locals = {'state': state,
+                                   'match_state': match_state,
+                                   'match_type': self.match_type}
+                for code in check:
+                    # Use python interpreter to evaluate the expression.
+                    match = eval(code, globals(), eval_locals)
+                    if match != self.default_match:
+                        self.failed_key = key
+                        return match
+            else:
+                try:
+                    if hasattr(check, 'match'):
+                        match = (check.match(str(state[key])) is not None)
+                    else:
+                        match = (re.match(check, str(state[key])) is not None)
+                except KeyError:
+                    match = False
+                if match != self.default_match:
+                    self.failed_key = key
+                    return match
+
+        return self.default_match
+
+
+# Compiled state expressions keyed by expression string.
+compiled_state_expressions = {}
+# state_matcher objects keyed by (match_type, match_state content).
+state_matchers = {}
+STATE_MATCHER_CACHE_SIZE = 256
+
+
+def compile_state_expression(expr):
+    r"""
+    Return a code object for the expression (see compare_states for details on
+    expressions).  Code objects are cached by expression string.
+
+    Description of argument(s):
+    expr            An expression string (e.g.
+                    "int(float(state['uptime'])) < int(state['elapsed_boot_time'])").
+    """
+
+    code = compiled_state_expressions.get(expr)
+    if code is None:
+        code = compile(expr, '<state expression>', 'eval')
+        compiled_state_expressions[expr] = code
+    return code
+
+
+def get_state_matcher(match_state,
+                      match_type='and'):
+    r"""
+    Return a state_matcher object for the match_state.  Matchers are cached by
+    the content of the match_state so that callers which pass the same (or an
+    equal) match_state repeatedly get the already compiled matcher.
+
+    Description of argument(s):
+    match_state     See compare_states for details.  This may also be any
+                    string accepted by return_state_constant.
+    match_type      This may be 'and' or 'or'.
+
+    The key of the match_state entry which decided the result can be obtained
+    with get_state_matcher(match_state, match_type).failed_key.
+    """
+
+    try:
+        match_state = return_state_constant(match_state)
+    except TypeError:
+        pass
+
+    try:
+        cache_key = (match_type,
+                     tuple((key, tuple(value) if isinstance(value, list)
+                            else value) for key, value in match_state.items()))
+        matcher = state_matchers.get(cache_key)
+    except TypeError:
+        # The match_state has unhashable content so it cannot be cached.
+        cache_key = None
+        matcher = None
+    if matcher is not None:
+        return matcher
+
+    error_message = gv.valid_value(match_type, valid_values=['and', 'or'])
+    if error_message != "":
+        BuiltIn().fail(gp.sprint_error(error_message))
+
+    matcher = state_matcher(match_state, match_type)
+    if cache_key is not None:
+        if len(state_matchers) >= STATE_MATCHER_CACHE_SIZE:
+            state_matchers.clear()
+        state_matchers[cache_key] = matcher
+    return matcher
+
+
 def compare_states(state,
                    match_state,
                    match_type='and'):
@@ -371,37 +565,147 @@ def compare_states(state,
                     is less than its 'elapsed_boot_time' entry, it would
                     qualify as a match.
     match_type      This may be 'and' or 'or'.
-    """
 
-    error_message = gv.valid_value(match_type, valid_values=['and', 'or'])
-    if error_message != "":
-        BuiltIn().fail(gp.sprint_error(error_message))
+    The key of the match_state entry which decided the result can be obtained
+    with get_state_matcher(match_state, match_type).failed_key.
+    """
 
     try:
         match_state = return_state_constant(match_state)
     except TypeError:
         pass
 
-    default_match = (match_type == 'and')
-    for key, match_state_value in match_state.items():
-        # Blank match_state_value means "don't care".
-        if match_state_value == "":
-            continue
-        if key == expressions_key():
-            for expr in match_state_value:
-                # Use python interpreter to evaluate the expression.
-                match = eval(expr)
-                if match != default_match:
-                    return match
-        else:
-            try:
-                match = (re.match(match_state_value, str(state[key])) is not None)
-            except KeyError:
-                match = False
-            if match != default_match:
-                return match
+    # The match_state is compiled once and the resulting state_matcher is
+    # cached (see get_state_matcher).
+    return get_state_matcher(match_state, match_type).match(state, match_state)
 
-    return default_match
+
+def run_probe_cmd(cmd_buf):
+    r"""
+    Run a local probe command and return its return code, its output and the
+    number of seconds it took.
+
+    Unlike gen_cmd.shell_cmd, this function does not rely on signals and may
+    therefore be run from a worker thread.
+
+    Description of argument(s):
+    cmd_buf                         The shell command to run (e.g.
+                                    "ping -c 1 -w 2 bmc1").
+    """
+
+    start_time = time.time()
+    sub_proc = subprocess.Popen(cmd_buf, shell=True, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                universal_newlines=True)
+    out_buf, err_buf = sub_proc.communicate()
+    return sub_proc.returncode, out_buf, time.time() - start_time
+
+
+def start_ping_probes(openbmc_host, os_host, req_states):
+    r"""
+    Start the ping-related probes called for by req_states in background
+    threads and return a dictionary of probe name/future pairs which is to be
+    passed to finish_ping_probes.
+
+    Description of argument(s):
+    openbmc_host                    The DNS name or IP address of the BMC.
+    os_host                         The DNS name or IP address of the OS (may
+                                    be blank).
+    req_states                      See get_state prolog for details.
+    """
+
+    cmd_bufs = DotDict()
+    if 'ping' in req_states:
+        cmd_bufs['ping'] = "ping -c 1 -w 2 " + openbmc_host
+    if 'packet_loss' in req_states:
+        cmd_bufs['packet_loss'] = "ping -c 5 -w 5 " + openbmc_host +\
+            " | egrep 'packet loss' | sed -re 's/.* ([0-9]+)%.*/\\1/g'"
+    if os_host != "" and 'os_ping' in req_states:
+        cmd_bufs['os_ping'] = "ping -c 1 -w 2 " + os_host
+
+    probes = DotDict()
+    if not cmd_bufs:
+        return probes
+    executor = ThreadPoolExecutor(max_workers=len(cmd_bufs))
+    for probe, cmd_buf in cmd_bufs.items():
+        gp.dprint_issuing(cmd_buf)
+        probes[probe] = executor.submit(run_probe_cmd, cmd_buf)
+    # The threads exit once their probes are done.
+    executor.shutdown(wait=False)
+    return probes
+
+
+def finish_ping_probes(probes):
+    r"""
+    Wait for the probes started by start_ping_probes to finish, record their
+    latencies in state_probe_latency and return a dictionary of probe
+    name/(rc, out_buf) pairs.
+
+    Description of argument(s):
+    probes                          The dictionary returned by
+                                    start_ping_probes.
+    """
+
+    results = DotDict()
+    for probe, future in probes.items():
+        rc, out_buf, latency = future.result()
+        state_probe_latency[probe] = round(latency, 3)
+        results[probe] = (rc, out_buf)
+    return results
+
+
+def get_bmc_shell_states(req_states,
+                         quiet=None):
+    r"""
+    Get all shell-derived BMC sub states called for by req_states (uptime and,
+    if USE_BMC_EPOCH_TIME is set, epoch_seconds) using a single SSH command and
+    return them as a dictionary.  Sub states which could not be obtained are
+    left out of the dictionary.
+
+    Description of argument(s):
+    req_states                      See get_state prolog for details.
+    quiet                           Indicates whether status details should be
+                                    written to the console.
+    """
+
+    remote_cmd_bufs = []
+    if 'uptime' in req_states:
+        remote_cmd_bufs.append("read uptime filler 2>/dev/null < /proc/uptime"
+                               + " && [ ! -z \"${uptime}\" ]"
+                               + " && echo uptime=${uptime}")
+    if USE_BMC_EPOCH_TIME and ('epoch_seconds' in req_states
+                               or 'elapsed_boot_time' in req_states):
+        remote_cmd_bufs.append("date -u +epoch_seconds=%s")
+
+    shell_states = DotDict()
+    if not remote_cmd_bufs:
+        return shell_states
+
+    remote_cmd_buf = "bash -c '" + " ; ".join(remote_cmd_bufs) + "'"
+    gp.qprint_issuing(remote_cmd_buf, 0)
+    start_time = time.time()
+    # As in the serial uptime probe, sometimes reading uptime results in a
+    # blank value so the command is retried every 5 seconds for up to 10
+    # seconds until a non-blank uptime is obtained.
+    while True:
+        try:
+            stdout, stderr, rc = bsu.bmc_execute_command(remote_cmd_buf, quiet=1,
+                                                         ignore_err=1, test_mode=0,
+                                                         time_out=5)
+        except Exception:
+            stdout = ""
+
+        for line in stdout.split("\n"):
+            key, delim, value = line.partition("=")
+            if delim and value != "":
+                shell_states[key] = value
+        if 'uptime' not in req_states or 'uptime' in shell_states \
+                or time.time() - start_time + 5 > 10:
+            break
+        time.sleep(5)
+    state_probe_latency['bmc_shell'] = round(time.time() - start_time, 3)
+
+    return shell_states
 
 
 def get_os_state(os_host="",
@@ -409,7 +713,8 @@ def get_os_state(os_host="",
                  os_password="",
                  req_states=default_os_req_states,
                  os_up=True,
-                 quiet=None):
+                 quiet=None,
+                 os_ping_rc=None):
     r"""
     Get component states for the operating system such as ping, login,
     etc, put them into a dictionary and return them to the caller.
@@ -432,6 +737,8 @@ def get_os_state(os_host="",
     quiet        Indicates whether status details (e.g. curl commands) should
                  be written to the console.
                  Defaults to either global value of ${QUIET} or to 1.
+    os_ping_rc   The return code of an OS ping which the caller has already
+                 run.  If this is None, this function will run the ping itself.
     """
 
     quiet = int(gp.get_var_value(quiet, 0))
@@ -470,10 +777,11 @@ def get_os_state(os_host="",
     if os_up:
         if 'os_ping' in req_states:
             # See if the OS pings.
-            rc, out_buf = gc.shell_cmd("ping -c 1 -w 2 " + os_host,
-                                       print_output=0, show_err=0,
-                                       ignore_err=1)
-            if rc == 0:
+            if os_ping_rc is None:
+                os_ping_rc, out_buf = gc.shell_cmd("ping -c 1 -w 2 " + os_host,
+                                                   print_output=0, show_err=0,
+                                                   ignore_err=1)
+            if os_ping_rc == 0:
                 os_ping = 1
 
         # Programming note: All attributes which do not require an ssh login
@@ -484,12 +792,14 @@ def get_os_state(os_host="",
         must_login = (len(req_login) > 0)
 
         if must_login:
+            start_time = time.time()
             output, stderr, rc = bsu.os_execute_command("uptime", quiet=quiet,
                                                         ignore_err=1,
                                                         time_out=20,
                                                         os_host=os_host,
                                                         os_username=os_username,
                                                         os_password=os_password)
+            state_probe_latency['os_login'] = round(time.time() - start_time, 3)
             if rc == 0:
                 os_login = 1
                 os_run_cmd = 1
@@ -524,6 +834,12 @@ def get_state(openbmc_host="",
     start_boot_seconds.  elapsed_boot_time is the current time minus
     start_boot_seconds.
 
+    Note: If BATCH_STATE_PROBES is set, the shell-derived sub states are
+    obtained with one SSH command and the ping probes run concurrently with
+    the SSH and REST/Redfish requests.  Either way, the latency of each probe
+    (e.g. ping, uptime, redfish) is recorded and may be obtained by calling
+    get_state_probe_latency().
+
     Description of argument(s):
     openbmc_host      The DNS name or IP address of the BMC.
                       This defaults to global ${OPENBMC_HOST}.
@@ -609,26 +925,48 @@ def get_state(openbmc_host="",
     requested_host = ''
     attempts_left = ''
 
+    state_probe_latency.clear()
+
     # Get the component states.
-    if 'ping' in req_states:
+    if batch_state_probes:
+        # The ping probes run in the background while the SSH and REST/Redfish
+        # requests below are in progress.
+        ping_probes = start_ping_probes(openbmc_host, os_host, req_states)
+        shell_states = get_bmc_shell_states(req_states, quiet=quiet)
+        uptime = shell_states.get('uptime', '')
+        if 'epoch_seconds' in req_states or 'elapsed_boot_time' in req_states:
+            if USE_BMC_EPOCH_TIME:
+                epoch_seconds = shell_states.get('epoch_seconds', '')
+            else:
+                epoch_seconds = str(int(time.time()))
+        # Prevent the serial probes below from running.
+        serial_req_states = []
+    else:
+        serial_req_states = req_states
+
+    if 'ping' in serial_req_states:
         # See if the OS pings.
+        start_time = time.time()
         rc, out_buf = gc.shell_cmd("ping -c 1 -w 2 " + openbmc_host,
                                    print_output=0, show_err=0,
                                    ignore_err=1)
+        state_probe_latency['ping'] = round(time.time() - start_time, 3)
         if rc == 0:
             ping = 1
 
-    if 'packet_loss' in req_states:
+    if 'packet_loss' in serial_req_states:
         # See if the OS pings.
         cmd_buf = "ping -c 5 -w 5 " + openbmc_host +\
             " | egrep 'packet loss' | sed -re 's/.* ([0-9]+)%.*/\\1/g'"
+        start_time = time.time()
         rc, out_buf = gc.shell_cmd(cmd_buf,
                                    print_output=0, show_err=0,
                                    ignore_err=1)
+        state_probe_latency['packet_loss'] = round(time.time() - start_time, 3)
         if rc == 0:
             packet_loss = out_buf.rstrip("\n")
 
-    if 'uptime' in req_states:
+    if 'uptime' in serial_req_states:
         # Sometimes reading uptime results in a blank value. Call with
         # wait_until_keyword_succeeds to ensure a non-blank value is obtained.
         remote_cmd_buf = "bash -c 'read uptime filler 2>/dev/null < /proc/uptime" +\
@@ -638,6 +976,7 @@ def get_state(openbmc_host="",
                    'test_mode=0', 'time_out=5']
         gp.qprint_issuing(cmd_buf, 0)
         gp.qprint_issuing(remote_cmd_buf, 0)
+        start_time = time.time()
         try:
             stdout, stderr, rc =\
                 BuiltIn().wait_until_keyword_succeeds("10 sec", "5 sec",
@@ -646,9 +985,12 @@ def get_state(openbmc_host="",
                 uptime = stdout
         except AssertionError as my_assertion_error:
             pass
+        state_probe_latency['uptime'] = round(time.time() - start_time, 3)
 
-    if 'epoch_seconds' in req_states or 'elapsed_boot_time' in req_states:
+    if 'epoch_seconds' in serial_req_states or \
+            'elapsed_boot_time' in serial_req_states:
         date_cmd_buf = "date -u +%s"
+        start_time = time.time()
         if USE_BMC_EPOCH_TIME:
             cmd_buf = ["BMC Execute Command", date_cmd_buf, 'quiet=${1}']
             if not quiet:
@@ -665,6 +1007,7 @@ def get_state(openbmc_host="",
                                              print_output=0)
             if shell_rc == 0:
                 epoch_seconds = out_buf.rstrip("\n")
+        state_probe_latency['epoch_seconds'] = round(time.time() - start_time, 3)
 
     if 'elapsed_boot_time' in req_states:
         global start_boot_seconds
@@ -683,8 +1026,10 @@ def get_state(openbmc_host="",
             cmd_buf = ["Read Properties", SYSTEM_STATE_URI + "enumerate",
                        "quiet=${" + str(quiet) + "}", "timeout=30"]
             gp.dprint_issuing(cmd_buf)
+            start_time = time.time()
             status, ret_values = \
                 BuiltIn().run_keyword_and_ignore_error(*cmd_buf)
+            state_probe_latency['rest'] = round(time.time() - start_time, 3)
             if status == "PASS":
                 state['rest'] = '1'
             else:
@@ -733,6 +1078,7 @@ def get_state(openbmc_host="",
         if need_rf:
             cmd_buf = ["Redfish Get States"]
             gp.dprint_issuing(cmd_buf)
+            start_time = time.time()
             try:
                 status, ret_values = \
                     BuiltIn().run_keyword_and_ignore_error(*cmd_buf)
@@ -741,6 +1087,7 @@ def get_state(openbmc_host="",
                 gp.dprint_issuing("Retrying Redfish Get States")
                 status, ret_values = \
                     BuiltIn().run_keyword_and_ignore_error(*cmd_buf)
+            state_probe_latency['redfish'] = round(time.time() - start_time, 3)
 
             gp.dprint_vars(status, ret_values)
             if status == "PASS":
@@ -755,6 +1102,16 @@ def get_state(openbmc_host="",
                 if platform_arch_type != "x86":
                     state['boot_progress'] = ret_values['boot_progress']
 
+    os_ping_rc = None
+    if batch_state_probes:
+        ping_results = finish_ping_probes(ping_probes)
+        if 'ping' in ping_results and ping_results['ping'][0] == 0:
+            ping = 1
+        if 'packet_loss' in ping_results and ping_results['packet_loss'][0] == 0:
+            packet_loss = ping_results['packet_loss'][1].rstrip("\n")
+        if 'os_ping' in ping_results:
+            os_ping_rc = ping_results['os_ping'][0]
+
     for sub_state in req_states:
         if sub_state in state:
             continue
@@ -789,13 +1146,30 @@ def get_state(openbmc_host="",
                                 os_password=os_password,
                                 req_states=os_req_states,
                                 os_up=os_up,
-                                quiet=quiet)
+                                quiet=quiet,
+                                os_ping_rc=os_ping_rc)
         # Append os_state dictionary to ours.
         state.update(os_state)
 
     return state
 
 
+def get_state_probe_latency():
+    r"""
+    Return a copy of the per-probe latencies (in seconds) measured by the most
+    recent get_state call.
+
+    Example result:
+
+    state_probe_latency:
+      state_probe_latency[bmc_shell]:                 0.412
+      state_probe_latency[redfish]:                   0.633
+      state_probe_latency[ping]:                      0.004
+    """
+
+    return state_probe_latency.copy()
+
+
 exit_wait_early_message = ""
 
 
@@ -900,12 +1274,120 @@ def check_state(match_state,
     elif not invert and not match:
         fail_msg = "The current state of the machine does NOT match the" +\
                    " match state:\n" +\
-                   gp.sprint_varx("state", state)
+                   gp.sprint_varx("state", state) +\
+                   gp.sprint_varx("failed_key",
+                                  get_state_matcher(match_state).failed_key)
         BuiltIn().fail("\n" + gp.sprint_error(fail_msg))
 
     return state
 
 
+def get_wait_state_monitor(openbmc_host="",
+                           openbmc_username="",
+                           openbmc_password=""):
+    r"""
+    Return a running state_event_monitor object for the BMC (see
+    state_event_monitor.py for details).
+
+    Redfish SSE is used if REDFISH_SUPPORT_TRANS_STATE is set.  Otherwise,
+    D-Bus signals are received over the BMC's websocket.
+
+    Description of argument(s):
+    openbmc_host      The DNS name or IP address of the BMC.
+                      This defaults to global ${OPENBMC_HOST}.
+    openbmc_username  The username to be used to login to the BMC.
+                      This defaults to global ${OPENBMC_USERNAME}.
+    openbmc_password  The password to be used to login to the BMC.
+                      This defaults to global ${OPENBMC_PASSWORD}.
+    """
+
+    if openbmc_host == "":
+        openbmc_host = BuiltIn().get_variable_value("${OPENBMC_HOST}")
+    if openbmc_username == "":
+        openbmc_username = BuiltIn().get_variable_value("${OPENBMC_USERNAME}")
+    if openbmc_password == "":
+        openbmc_password = BuiltIn().get_variable_value("${OPENBMC_PASSWORD}")
+    https_port = BuiltIn().get_variable_value("${HTTPS_PORT}", default="443")
+    if str(https_port) != "443":
+        openbmc_host += ":" + str(https_port)
+
+    if redfish_support_trans_state:
+        protocol = 'sse'
+    else:
+        protocol = 'websocket'
+    return sem.get_state_event_monitor(openbmc_host, openbmc_username,
+                                       openbmc_password, protocol=protocol)
+
+
+def wait_until_state_event(monitor,
+                           wait_time,
+                           interval,
+                           cmd_buf,
+                           safety_interval=None):
+    r"""
+    Run the "Check State" keyword described by cmd_buf each time the monitor
+    reports a state change (or at least every safety_interval) until it
+    succeeds or until wait_time has elapsed.  Return the keyword's return
+    value.
+
+    While the monitor is not connected, the state is checked every interval
+    as if no monitor were in use and the monitor's connection error is printed
+    once per failure streak.
+
+    On timeout, an AssertionError is raised with the same message format
+    that wait_until_keyword_succeeds uses.
+
+    Description of argument(s):
+    monitor                         A state_event_monitor object.
+    wait_time                       The total amount of time to wait for the
+                                    desired state.
+    interval                        The amount of time between state checks
+                                    while the monitor is not connected.
+    cmd_buf                         The "Check State" keyword and its
+                                    arguments.
+    safety_interval                 The amount of time between state checks
+                                    when no events arrive while the monitor is
+                                    connected.  This defaults to interval.
+    """
+
+    wait_secs = timestr_to_secs(wait_time)
+    interval_secs = timestr_to_secs(interval)
+    if safety_interval is None:
+        safety_interval_secs = interval_secs
+    else:
+        safety_interval_secs = max(timestr_to_secs(safety_interval),
+                                   interval_secs)
+    end_time = time.time() + wait_secs
+    reported_error_streak_count = monitor.error_streak_count
+    if monitor.last_error:
+        # Report a failure streak which began before this call.
+        reported_error_streak_count -= 1
+    while True:
+        # Clear before checking so that an event which arrives during the
+        # check causes an immediate re-check.
+        monitor.clear()
+        status, ret_values = BuiltIn().run_keyword_and_ignore_error(*cmd_buf)
+        if status == "PASS":
+            return ret_values
+        time_left = end_time - time.time()
+        if time_left <= 0:
+            raise AssertionError("Keyword '" + cmd_buf[0] + "' failed after"
+                                 + " retrying for "
+                                 + secs_to_timestr(wait_secs)
+                                 + ". The last error was: " + str(ret_values))
+        if monitor.connected:
+            monitor.wait(min(safety_interval_secs, time_left))
+            continue
+        if monitor.last_error and \
+                monitor.error_streak_count != reported_error_streak_count:
+            reported_error_streak_count = monitor.error_streak_count
+            gp.print_timen("The " + monitor.protocol + " state event monitor"
+                           + " is not connected (" + monitor.last_error
+                           + ").  Checking every " + str(interval)
+                           + " until it connects.")
+        monitor.wait(min(interval_secs, time_left))
+
+
 def wait_state(match_state=(),
                wait_time="1 min",
                interval="1 second",
@@ -916,7 +1398,8 @@ def wait_state(match_state=(),
                os_host="",
                os_username="",
                os_password="",
-               quiet=None):
+               quiet=None,
+               event_driven=None):
     r"""
     Wait for the Open BMC machine's composite state to match the specified
     state.  On success, this keyword returns the machine's composite state as
@@ -953,21 +1436,48 @@ def wait_state(match_state=(),
     quiet             Indicates whether status details should be written to the
                       console.  Defaults to either global value of ${QUIET} or
                       to 1.
+    event_driven      Indicates that the state is to be re-checked whenever the
+                      BMC reports a state change rather than every interval.
+                      While the event monitor is connected, the state is also
+                      checked at least every EVENT_WAIT_SAFETY_INTERVAL (or
+                      interval, if longer) as a safety net.  While it is not
+                      connected, or if match_state includes sub states which
+                      BMC events do not report (e.g. ping or os_login), the
+                      state is checked every interval.  This defaults to
+                      global EVENT_DRIVEN_WAIT_STATE.
     """
 
     quiet = int(gp.get_var_value(quiet, 0))
+    if event_driven is None:
+        event_driven = event_driven_wait_state
+    event_driven = int(event_driven)
 
     try:
         match_state = return_state_constant(match_state)
     except TypeError:
         pass
 
+    if event_driven:
+        monitor = get_wait_state_monitor(openbmc_host, openbmc_username,
+                                         openbmc_password)
+        if [sub_state for sub_state in match_state
+                if sub_state in non_event_sub_states]:
+            safety_interval = interval
+        else:
+            safety_interval = event_wait_safety_interval
+
     if not quiet:
         if invert:
             alt_text = "cease to "
         else:
             alt_text = ""
-        gp.print_timen("Checking every " + str(interval) + " for up to "
+        if event_driven:
+            frequency_text = "on each " + monitor.protocol + " state event" +\
+                " (and at least every " + str(safety_interval) +\
+                " or, while not connected, every " + str(interval) + ")"
+        else:
+            frequency_text = "every " + str(interval)
+        gp.print_timen("Checking " + frequency_text + " for up to "
                        + str(wait_time) + " for the state of the machine to "
                        + alt_text + "match the state shown below.")
         gp.print_var(match_state)
@@ -990,8 +1500,12 @@ def wait_state(match_state=(),
                "quiet=${" + str(check_state_quiet) + "}"]
     gp.dprint_issuing(cmd_buf)
     try:
-        state = BuiltIn().wait_until_keyword_succeeds(wait_time, interval,
-                                                      *cmd_buf)
+        if event_driven:
+            state = wait_until_state_event(monitor, wait_time, interval,
+                                           cmd_buf, safety_interval)
+        else:
+            state = BuiltIn().wait_until_keyword_succeeds(wait_time, interval,
+                                                          *cmd_buf)
     except AssertionError as my_assertion_error:
         gp.printn()
         message = my_assertion_error.args[0]
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+r"""
+This module provides the state_event_monitor class which listens for BMC state change notifications so that
+state.wait_state can react to a state transition as soon as it happens rather than polling.
+"""
+
+import json
+import ssl
+import threading
+
+import requests
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+# The D-Bus paths whose property changes may indicate a host/chassis/BMC state transition.
+STATE_DBUS_PATHS = ["/xyz/openbmc_project/state"]
+REDFISH_SSE_URI = "/redfish/v1/EventService/SSE"
+
+# Seconds to wait before reconnecting after the event stream was lost (e.g. due to a BMC reboot).
+RECONNECT_INTERVAL = 5
+# Seconds a blocking read on the event stream may take before the stop flag is checked again.
+READ_TIMEOUT = 30
+
+# Monitors keyed by (host, protocol).
+monitors = {}
+monitors_lock = threading.Lock()
+
+
+class state_event_monitor(object):
+    r"""
+    Listen for state change notifications from a BMC in a background thread.
+
+    Two protocols are supported:
+    websocket   Subscribe to D-Bus PropertiesChanged signals under STATE_DBUS_PATHS via the BMC's
+                /subscribe websocket (see event_notification.py).
+    sse         Read the Redfish EventService server-sent event stream.
+
+    The notifications are not decoded.  Any notification, as well as any loss or re-establishment of the
+    connection, simply wakes the waiter which is then expected to re-check the state itself.
+
+    Example code:
+
+    monitor = state_event_monitor("bmc1", "root", "0penBmc", protocol="websocket")
+    monitor.start()
+    while not state_matches():
+        monitor.wait(10)
+    """
+
+    def __init__(self, host, username, password, protocol='websocket'):
+        r"""
+        Initialize instance variables.
+
+        Description of argument(s):
+        host                        The IP or host name (optionally followed by ":<port>") of the BMC.
+        username                    The username for the BMC.
+        password                    The password for the BMC.
+        protocol                    The event protocol to use ("websocket" or "sse").
+        """
+
+        self.__host = host
+        self.__username = username
+        self.__password = password
+        self.protocol = protocol
+        self.connected = False
+        self.event_count = 0
+        # The error which ended the most recent connection attempt ("" while connected).
+        self.last_error = ""
+        # The number of failure streaks so far.  A streak starts with the first failure after a successful
+        # connection (or after start) so a waiter can report each streak once.
+        self.error_streak_count = 0
+        self.__wake = threading.Event()
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__connection = None
+
+    def start(self):
+        r"""
+        Start the listener thread if it is not already running.
+        """
+
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run,
+                                         name="state_event_monitor_" + self.__host,
+                                         daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        r"""
+        Stop the listener thread.
+        """
+
+        self.__stop.set()
+        self.__close_connection()
+        self.__wake.set()
+
+    def clear(self):
+        r"""
+        Forget notifications received so far.  A caller should clear immediately before checking the state so
+        that no notification arriving during the check is lost.
+        """
+
+        self.__wake.clear()
+
+    def wait(self, timeout):
+        r"""
+        Wait until a notification arrives or until timeout seconds have elapsed.  Return True if woken by a
+        notification.
+
+        Description of argument(s):
+        timeout                     The maximum number of seconds to wait.
+        """
+
+        woken = self.__wake.wait(timeout)
+        self.__wake.clear()
+        return woken
+
+    def __notify(self):
+        self.event_count += 1
+        self.__wake.set()
+
+    def __close_connection(self):
+        connection = self.__connection
+        self.__connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def __run(self):
+        r"""
+        Listener thread body.  Keep (re)connecting until stopped.  Connection errors are recorded in
+        last_error for the waiter to report since this thread has no way to report them.
+        """
+
+        while not self.__stop.is_set():
+            try:
+                if self.protocol == 'sse':
+                    self.__listen_sse()
+                else:
+                    self.__listen_websocket()
+            except Exception as e:
+                if not self.last_error:
+                    self.error_streak_count += 1
+                self.last_error = type(e).__name__ + ": " + (str(e) or "no details")
+            else:
+                if not self.__stop.is_set() and not self.last_error:
+                    self.error_streak_count += 1
+                    self.last_error = "The event stream was closed by the BMC."
+            self.__close_connection()
+            if self.connected:
+                self.connected = False
+                # The state may have changed while nobody was listening.
+                self.__notify()
+            self.__stop.wait(RECONNECT_INTERVAL)
+
+    def __listen_websocket(self):
+        r"""
+        Subscribe to STATE_DBUS_PATHS over the BMC's websocket and wake the waiter on each notification.
+        """
+
+        if websocket is None:
+            raise ImportError("The websocket-client package is not installed.")
+        session = requests.session()
+        response = session.post('https://' + self.__host + '/login',
+                                headers={'Content-Type': 'application/json'},
+                                json={"data": [self.__username, self.__password]},
+                                verify=False, timeout=READ_TIMEOUT)
+        response.raise_for_status()
+        cookies = ";".join(key + "=" + value for key, value in session.cookies.get_dict().items())
+        self.__connection = websocket.create_connection("wss://" + self.__host + "/subscribe",
+                                                        sslopt={"cert_reqs": ssl.CERT_NONE},
+                                                        cookie=cookies, timeout=READ_TIMEOUT)
+        self.__connection.send(json.dumps({"paths": STATE_DBUS_PATHS}))
+        self.__mark_connected()
+        while not self.__stop.is_set():
+            try:
+                message = self.__connection.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            if not message:
+                # The server closed the connection.
+                return
+            self.__notify()
+
+    def __listen_sse(self):
+        r"""
+        Read the Redfish EventService SSE stream and wake the waiter on each event.
+        """
+
+        response = requests.get('https://' + self.__host + REDFISH_SSE_URI,
+                                auth=(self.__username, self.__password),
+                                headers={'Accept': 'text/event-stream'},
+                                verify=False, stream=True, timeout=(READ_TIMEOUT, None))
+        response.raise_for_status()
+        self.__connection = response
+        self.__mark_connected()
+        for line in response.iter_lines(decode_unicode=True):
+            if self.__stop.is_set():
+                return
+            if line and line.startswith('data:'):
+                self.__notify()
+
+    def __mark_connected(self):
+        self.connected = True
+        self.last_error = ""
+        # Transitions may have been missed while connecting.
+        self.__notify()
+
+
+def get_state_event_monitor(host, username, password, protocol='websocket'):
+    r"""
+    Return a running state_event_monitor for the given host and protocol, creating and starting it if
+    necessary.  Monitors are shared by all callers for the life of the process.
+
+    Description of argument(s):
+    host                            The IP or host name (optionally followed by ":<port>") of the BMC.
+    username                        The username for the BMC.
+    password                        The password for the BMC.
+    protocol                        The event protocol to use ("websocket" or "sse").
+    """
+
+    with monitors_lock:
+        monitor = monitors.get((host, protocol))
+        if monitor is None:
+            monitor = state_event_monitor(host, username, password, protocol=protocol)
+            monitors[(host, protocol)] = monitor
+        monitor.start()
+    return monitor
+
+
+def stop_state_event_monitors():
+    r"""
+    Stop all state event monitors.
+    """
+
+    with monitors_lock:
+        for monitor in monitors.values():
+            monitor.stop()
+        monitors.clear()
@@ -183,6 +183,13 @@ class tally_sheet:
 
         self.__table[row_key][field_key] -= 1
 
+    def return_table(self):
+        r"""
+        Return a copy of the table, i.e. an ordered dictionary of the rows keyed by row key.
+        """
+
+        return copy.deepcopy(self.__table)
+
     def calc(self):
         r"""
         Calculate totals and row calc fields.  Also, return totals_line dictionary.
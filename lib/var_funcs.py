@@ -247,7 +247,7 @@ def parse_key_value(string,
     if to_lower:
         key = key.lower()
     if underscores:
-        key = re.sub(r" ", "_", key)
+        key = key.replace(" ", "_")
 
     return key, value
 
@@ -434,7 +434,7 @@ def key_value_outbuf_to_dict(out_buf,
     """
 
     # Create key_var_list and remove null entries.
-    key_var_list = list(filter(None, out_buf.split("\n")))
+    key_var_list = [line for line in iter_lines(out_buf) if line]
     return key_value_list_to_dict(key_var_list, **args)
 
 
@@ -510,6 +510,127 @@ def key_value_outbuf_to_dicts(out_buf,
     return [key_value_outbuf_to_dict(x, **args) for x in re.split('\n[\n]+', out_buf)]
 
 
+def iter_lines(source):
+    r"""
+    Return a generator which yields the lines of source one at a time, without their line feeds.
+
+    This allows the iter_* parsing functions (below) to process large program output (e.g. from "ipmitool sdr
+    elist" or "ipmitool fru print") in one pass without first splitting it into a list of lines.
+
+    Description of argument(s):
+    source                          The text to be processed.  This may be a string or bytes buffer, an open
+                                    file, a socket or any iterable of lines (e.g. the stdout of a Popen
+                                    object).
+    """
+
+    if isinstance(source, bytes):
+        source = source.decode('utf-8', errors='replace')
+    if isinstance(source, str):
+        start = 0
+        while True:
+            end = source.find("\n", start)
+            if end == -1:
+                if start < len(source):
+                    yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+    if hasattr(source, 'makefile'):
+        # A socket.
+        source = source.makefile('r', encoding='utf-8', errors='replace')
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if line.endswith("\n"):
+            line = line[:-1]
+        yield line
+
+
+def iter_key_value_dicts(source,
+                         process_indent=0,
+                         **args):
+    r"""
+    Return a generator which yields one dictionary for each section of key/value lines in source.
+
+    Sections are delimited by one or more blank lines.  Only the lines of the current section are held in
+    memory.  Unlike key_value_outbuf_to_dicts, no dictionary is yielded for an empty section (e.g. for blank
+    lines at the end of source).
+
+    Example usage:
+
+    for user_info in iter_key_value_dicts(sub_proc.stdout):
+        print(user_info['user_name'])
+
+    See key_value_outbuf_to_dicts for an example of the dictionaries that are yielded.
+
+    Description of argument(s):
+    source                          The text to be processed.  (See docstring of iter_lines function for
+                                    details).
+    process_indent                  See docstring of key_value_list_to_dict function for details.
+    **args                          Arguments to be interpreted by parse_key_value.  (See docstring of
+                                    parse_key_value function for details).
+    """
+
+    section = []
+    for line in iter_lines(source):
+        if line:
+            section.append(line)
+        elif section:
+            yield key_value_list_to_dict(section, process_indent=process_indent, **args)
+            section = []
+    if section:
+        yield key_value_list_to_dict(section, process_indent=process_indent, **args)
+
+
+def records_to_columns(records):
+    r"""
+    Convert the dictionaries yielded by a parsing generator (e.g. iter_key_value_dicts or iter_report) to a
+    column-oriented dictionary and return it.
+
+    The result has one list of values per key.  A record which lacks a key that other records have gets a
+    value of None in that key's list.  Storing records this way avoids repeating the key names for every
+    record of a large listing.
+
+    Example:
+
+    Given these records:
+
+    records:
+      records[0]:
+        [sensor]:                 fan0
+        [status]:                 ok
+      records[1]:
+        [sensor]:                 fan1
+        [status]:                 ns
+
+    This function will return:
+
+    columns:
+      [sensor]:
+        [sensor][0]:              fan0
+        [sensor][1]:              fan1
+      [status]:
+        [status][0]:              ok
+        [status][1]:              ns
+
+    Description of argument(s):
+    records                         An iterable of dictionaries.
+    """
+
+    columns = collections.OrderedDict()
+    num_records = 0
+    for record in records:
+        for key, value in record.items():
+            if key not in columns:
+                columns[key] = [None] * num_records
+            columns[key].append(value)
+        num_records += 1
+        for values in columns.values():
+            if len(values) < num_records:
+                values.append(None)
+    return columns
+
+
 def create_field_desc_regex(line):
 
     r"""
@@ -725,8 +846,64 @@ def outbuf_to_report(out_buf,
                                     list_to_report function for details).
     """
 
-    report_list = list(filter(None, out_buf.split("\n")))
-    return list_to_report(report_list, **args)
+    return list(iter_report(out_buf, **args))
+
+
+def iter_report(source,
+                to_lower=1,
+                field_delim=None):
+    r"""
+    Return a generator which yields one dictionary for each data line of a text report.
+
+    This is the one-pass equivalent of outbuf_to_report.  Blank lines are ignored.  The first line must be a
+    header line and the second line may be a field descriptor line.  (See docstring of list_to_report
+    function for details).
+
+    Example usage:
+
+    for entry in iter_report(stdout):
+        print(entry['filesystem'])
+
+    Description of argument(s):
+    source                          The text to be processed.  (See docstring of iter_lines function for
+                                    details).
+    to_lower                        Change the resulting key names to lower case.
+    field_delim                     Indicates that there are field delimiters in the report lines (which
+                                    should be removed).
+    """
+
+    field_delim_regex = re.compile("\\|")
+    lines = (line for line in iter_lines(source) if line)
+    if field_delim is not None:
+        lines = (field_delim_regex.sub("", line) for line in lines)
+
+    header_line = next(lines, None)
+    if header_line is None:
+        return
+    if to_lower:
+        header_line = header_line.lower()
+    report_line = next(lines, None)
+    if report_line is None:
+        return
+
+    field_desc_regex = None
+    if re.match(r"^-[ -]*$", report_line):
+        # We have a field descriptor line.
+        field_desc_regex = re.compile(create_field_desc_regex(report_line))
+        pad_format_string = "%-" + str(len(report_line)) + "s"
+        # Pad the line with spaces on the right to facilitate processing with field_desc_regex.
+        columns = list(map(str.strip, field_desc_regex.findall(pad_format_string % header_line)[0]))
+        report_line = next(lines, None)
+    else:
+        columns = header_line.split()
+
+    while report_line is not None:
+        if field_desc_regex is None:
+            line = report_line.split()
+        else:
+            line = list(map(str.strip, field_desc_regex.findall(pad_format_string % report_line)[0]))
+        yield collections.OrderedDict(zip(columns, line))
+        report_line = next(lines, None)
 
 
 def nested_get(key_name, structure):
@@ -916,6 +1093,202 @@ def filter_struct(structure, filter_dict, regex=False, invert=False):
     return result
 
 
+class struct_query(object):
+    r"""
+    An index over a nested structure which answers repeated nested_get, match_struct and filter_struct
+    queries without re-scanning the structure.
+
+    The structure is walked once when the object is created.  For each first-level entry, the values of
+    every key found at any level within the entry are recorded, along with indexes of which entries have
+    which key and value.  Regular expressions are compiled once and each distinct value is searched once per
+    regular expression.  The results are the same as those of the corresponding functions, provided that the
+    structure is not modified after the object is created.
+
+    Example:
+
+    query = struct_query(properties)
+    healthy = query.filter("[('Health', 'OK')]")
+    enabled = query.filter("[('State', 'Enabled')]")
+    states = query.nested_get('State')
+    """
+
+    def __init__(self,
+                 structure):
+        r"""
+        Description of argument(s):
+        structure                   Any nested combination of lists or dictionaries.  See the prolog of
+                                    nested_get() for details.
+        """
+
+        self.structure = structure
+        if type(structure) is list:
+            self.entry_keys = list(range(len(structure)))
+            entries = structure
+        else:
+            self.entry_keys = list(structure.keys())
+            entries = structure.values()
+        # For each first-level entry, a dictionary mapping each key found within the entry to the list of its
+        # values (in the order in which nested_get would return them).
+        self.entry_values = [self.__walk(entry, collections.OrderedDict()) for entry in entries]
+        # Map each key to the set of numbers of the entries which contain it.
+        self.__key_index = {}
+        # Map each key to a dictionary mapping each hashable value of the key to the set of numbers of the
+        # entries which contain that key/value pair.
+        self.__value_index = {}
+        for ix, key_values in enumerate(self.entry_values):
+            for key, values in key_values.items():
+                self.__key_index.setdefault(key, set()).add(ix)
+                value_index = self.__value_index.setdefault(key, {})
+                for value in values:
+                    try:
+                        value_index.setdefault(value, set()).add(ix)
+                    except TypeError:
+                        # Unhashable values (e.g. sub-dictionaries) are found by scanning.
+                        pass
+        self.__nested_get_cache = {}
+        self.__regex_cache = {}
+
+    @staticmethod
+    def __walk(structure, key_values):
+        if type(structure) is list:
+            for entry in structure:
+                struct_query.__walk(entry, key_values)
+        elif gp.is_dict(structure):
+            for key, value in structure.items():
+                struct_query.__walk(value, key_values)
+                key_values.setdefault(key, []).append(value)
+        return key_values
+
+    def nested_get(self,
+                   key_name):
+        r"""
+        Return a list of all values from the structure that have the given key name.  See nested_get for
+        details.
+
+        Description of argument(s):
+        key_name                    The key name (e.g. 'last_name').
+        """
+
+        try:
+            return list(self.__nested_get_cache[key_name])
+        except KeyError:
+            pass
+        result = []
+        for ix in sorted(self.__key_index.get(key_name, ())):
+            result += self.entry_values[ix][key_name]
+        if type(self.structure) is not list and key_name in self.structure:
+            # The first-level value itself follows the values found within it.
+            ix = self.entry_keys.index(key_name)
+            position = sum(len(self.entry_values[jx].get(key_name, ())) for jx in range(ix + 1))
+            result.insert(position, self.structure[key_name])
+        self.__nested_get_cache[key_name] = result
+        return list(result)
+
+    def __regex_matches(self, key, pattern):
+        r"""
+        Return the set of numbers of the entries which have a value for key that matches pattern.
+        """
+
+        cache_key = (key, pattern)
+        if cache_key not in self.__regex_cache:
+            regex = re.compile(pattern)
+            matching_values = {}
+            entries = set()
+            for ix in self.__key_index.get(key, ()):
+                for value in self.entry_values[ix][key]:
+                    value_string = str(value)
+                    if value_string not in matching_values:
+                        matching_values[value_string] = regex.search(value_string) is not None
+                    if matching_values[value_string]:
+                        entries.add(ix)
+                        break
+            self.__regex_cache[cache_key] = entries
+        return self.__regex_cache[cache_key]
+
+    def __value_matches(self, key, value):
+        r"""
+        Return the set of numbers of the entries which have the given value for key.
+        """
+
+        try:
+            return self.__value_index.get(key, {}).get(value, set())
+        except TypeError:
+            return {ix for ix in self.__key_index.get(key, ()) if value in self.entry_values[ix][key]}
+
+    def __matching_entries(self, filter_dict, regex):
+        r"""
+        Return the set of numbers of the entries which match filter_dict.
+        """
+
+        entries = set(range(len(self.entry_keys)))
+        for key, value in filter_dict.items():
+            if value is None:
+                entries -= self.__key_index.get(key, set())
+            elif regex:
+                entries &= self.__regex_matches(key, value)
+            else:
+                entries &= self.__value_matches(key, value)
+            if not entries:
+                break
+        return entries
+
+    def match(self,
+              match_dict,
+              regex=False):
+        r"""
+        Return True or False to indicate whether the structure matches the match dictionary.  See
+        match_struct for details.
+
+        Description of argument(s):
+        match_dict                  See match_struct for details.
+        regex                       See match_struct for details.
+        """
+
+        for match_key, match_value in match_dict.items():
+            struct_key_values = self.nested_get(match_key)
+            if match_value is None:
+                if len(struct_key_values) != 0:
+                    return False
+                continue
+            if len(struct_key_values) == 0:
+                return False
+            if regex:
+                if not self.__regex_matches(match_key, match_value):
+                    if type(self.structure) is list or match_key not in self.structure \
+                            or not re.search(match_value, str(self.structure[match_key])):
+                        return False
+            elif match_value not in struct_key_values:
+                return False
+
+        return True
+
+    def filter(self,
+               filter_dict,
+               regex=False,
+               invert=False):
+        r"""
+        Filter the structure by removing any entries that do NOT contain the keys/values specified in
+        filter_dict and return the result.  See filter_struct for details.
+
+        Description of argument(s):
+        filter_dict                 See filter_struct for details.
+        regex                       See filter_struct for details.
+        invert                      See filter_struct for details.
+        """
+
+        filter_dict = fa.source_to_object(filter_dict)
+        entries = self.__matching_entries(filter_dict, regex)
+        if invert:
+            entries = set(range(len(self.entry_keys))) - entries
+
+        if type(self.structure) is list:
+            return [self.structure[ix] for ix in sorted(entries)]
+        result = collections.OrderedDict()
+        for ix in sorted(entries):
+            result[self.entry_keys[ix]] = self.structure[self.entry_keys[ix]]
+        return result
+
+
 def split_dict_on_key(split_key, dictionary):
     r"""
     Split a dictionary into two dictionaries based on the first occurrence of the split key and return the
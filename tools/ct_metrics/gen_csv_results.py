@@ -14,6 +14,9 @@ import robot.errors
 import re
 import stat
 import datetime
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from robot.api import ExecutionResult
 from robot.result.visitor import ResultVisitor
 from xml.etree import ElementTree
@@ -50,8 +53,9 @@ parser = argparse.ArgumentParser(
 parser.add_argument(
     '--source',
     '-s',
-    help='The output.xml robot test result file path.  This parameter is \
-          required.')
+    nargs='+',
+    help='The output.xml robot test result file path(s).  One .csv file is \
+          generated for each output.xml file.  This parameter is required.')
 
 parser.add_argument(
     '--dest',
@@ -91,6 +95,24 @@ parser.add_argument(
     help='Name of processor, e.g. "P9". This parameter is optional.',
     default="OPENPOWER")
 
+parser.add_argument(
+    '--stream',
+    type=int,
+    choices=[1, 0],
+    help='If this parameter is set to "1", each output.xml file is read in \
+          one streaming pass rather than loaded through the robot framework \
+          API.  This is much faster and uses little memory for large \
+          output.xml files.  The totals printed do not distinguish critical \
+          tests.',
+    default=0)
+
+parser.add_argument(
+    '--max_workers',
+    type=int,
+    help='The maximum number of output.xml files processed at the same time, \
+          each by its own process.  This applies only when --stream is set.',
+    default=4)
+
 
 # Populate stock_list with options we want.
 stock_list = [("test_mode", 0), ("quiet", 0), ("debug", 0)]
@@ -134,8 +156,9 @@ def validate_parms():
     accordingly.
     """
 
-    if not valid_file_path(source):
-        return False
+    for xml_file_path in source:
+        if not valid_file_path(xml_file_path):
+            return False
 
     if not valid_dir_path(dest):
         return False
@@ -146,11 +169,11 @@ def validate_parms():
 
 
 def parse_output_xml(xml_file_path, csv_dir_path, version_id, platform, level,
-                     test_phase, processor):
+                     test_phase, processor, csv_file_suffix=""):
     r"""
     Parse the robot-generated output.xml file and extract various test
     output data. Put the extracted information into a csv file in the "dest"
-    folder.
+    folder.  Return the path of the .csv file or "" if none was written.
 
     Description of argument(s):
     xml_file_path                   The path to a Robot-generated output.xml
@@ -163,6 +186,8 @@ def parse_output_xml(xml_file_path, csv_dir_path, version_id, platform, level,
     platform                        Platform of the openbmc system.
     level                           Release level of the OpenBMC system
                                     (e.g. "Master").
+    csv_file_suffix                 A string to be appended to the base name
+                                    of the .csv file (see stream_output_xml).
     """
 
     # Initialize tallies
@@ -246,14 +271,13 @@ def parse_output_xml(xml_file_path, csv_dir_path, version_id, platform, level,
         l_platform_type = l_system_info[1]
 
     # Driver version id and platform are mandatorily required for CSV file
-    # generation. If any one is not avaulable, exit CSV file generation
-    # process.
+    # generation. If any one is not avaulable, skip CSV file generation.
     if l_driver and l_platform_type:
         print("Driver and system info set.")
     else:
         print("Both driver and system info need to be set.\
                 CSV file is not generated.")
-        sys.exit()
+        return ""
 
     # Default header
     l_header = ['test_start', 'test_end', 'subsys', 'test_type',
@@ -266,7 +290,7 @@ def parse_output_xml(xml_file_path, csv_dir_path, version_id, platform, level,
     l_base_dir = csv_dir_path
     l_timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d-%H-%M-%S")
     # Example: 2017-02-20-08-47-22_Witherspoon.csv
-    l_csvfile = l_base_dir + l_timestamp + "_" + l_platform_type + ".csv"
+    l_csvfile = l_base_dir + l_timestamp + "_" + l_platform_type + csv_file_suffix + ".csv"
 
     print("Writing data into csv file:%s" % l_csvfile)
 
@@ -301,6 +325,7 @@ def parse_output_xml(xml_file_path, csv_dir_path, version_id, platform, level,
     # Set file permissions 666.
     perm = stat.S_IRUSR + stat.S_IWUSR + stat.S_IRGRP + stat.S_IWGRP + stat.S_IROTH + stat.S_IWOTH
     os.chmod(l_csvfile, perm)
+    return l_csvfile
 
 
 def xml_to_csv_time(xml_datetime):
@@ -354,6 +379,222 @@ def get_system_details(xml_file_path):
     return [str(bmc_version_id), str(bmc_platform)]
 
 
+def status_times(status_attrib):
+    r"""
+    Return the start and end times of a robot status element in %Y-%m-%d-%H-%M-%S format.
+
+    Description of argument(s):
+    status_attrib                   The attributes of a status element.  Robot framework versions before 7.0
+                                    record "starttime" and "endtime" (e.g. "20170206 05:05:19.342").  Later
+                                    versions record "start" (e.g. "2017-02-06T05:05:19.342000") and
+                                    "elapsed" in seconds.
+    """
+
+    if 'starttime' in status_attrib:
+        return xml_to_csv_time(status_attrib['starttime']), xml_to_csv_time(status_attrib['endtime'])
+    start = datetime.datetime.fromisoformat(status_attrib['start'])
+    end = start + datetime.timedelta(seconds=float(status_attrib.get('elapsed', 0)))
+    return start.strftime("%Y-%m-%d-%H-%M-%S"), end.strftime("%Y-%m-%d-%H-%M-%S")
+
+
+def iter_output_xml_tests(xml_file_path, run_info=None):
+    r"""
+    Read the robot-generated output.xml file in one streaming pass and yield a dictionary for each test with
+    the following keys: name, suite, status, start_time, end_time (see status_times) and tags.
+
+    Each element is discarded as soon as it has been read so memory use does not grow with the size of the
+    file.
+
+    Description of argument(s):
+    xml_file_path                   The path to a Robot-generated output.xml
+                                    file.
+    run_info                        A dictionary which, if given, is filled in
+                                    with the following keys: bmc_version_id and
+                                    bmc_platform (see get_system_details) and
+                                    start_time and end_time (the top suite's
+                                    raw start and end times).  Its values are
+                                    complete once the generator is exhausted.
+    """
+
+    if run_info is None:
+        run_info = {}
+    run_info.update(bmc_version_id="", bmc_platform="", start_time="", end_time="")
+
+    # The elements which have been started but not ended.
+    elements = []
+    suite_names = []
+    test = None
+    for event, elem in ElementTree.iterparse(xml_file_path, events=('start', 'end')):
+        if event == 'start':
+            elements.append(elem)
+            if elem.tag == 'suite':
+                suite_names.append(elem.get('name', ""))
+            elif elem.tag == 'test':
+                test = {'name': elem.get('name', ""), 'suite': suite_names[-1] if suite_names else "",
+                        'status': "", 'start_time': "", 'end_time': "", 'tags': []}
+            continue
+
+        elements.pop()
+        parent_tag = elements[-1].tag if elements else None
+        if elem.tag == 'msg' and elem.text:
+            # See get_system_details for examples of these messages.
+            if '${output} = VERSION_ID=' in elem.text:
+                run_info['bmc_version_id'] = str(elem.text.split("VERSION_ID=")[1])[1:-1]
+            if '${bmc_model} = ' in elem.text:
+                run_info['bmc_platform'] = elem.text.split(" = ")[1]
+        elif elem.tag == 'tag' and test is not None \
+                and (parent_tag == 'test' or (parent_tag == 'tags' and elements[-2].tag == 'test')):
+            test['tags'].append(elem.text or "")
+        elif elem.tag == 'status' and parent_tag == 'test':
+            test['status'] = elem.get('status', "")
+            test['start_time'], test['end_time'] = status_times(elem.attrib)
+        elif elem.tag == 'status' and parent_tag == 'suite' and len(suite_names) == 1:
+            run_info['start_time'] = elem.get('starttime', elem.get('start', ""))
+            run_info['end_time'] = elem.get('endtime', "")
+        elif elem.tag == 'test':
+            yield test
+            test = None
+        elif elem.tag == 'suite':
+            suite_names.pop()
+
+        if elements:
+            elements[-1].remove(elem)
+
+
+def stream_output_xml(xml_file_path, csv_dir_path, version_id, platform, level,
+                      test_phase, processor, subsystem, csv_file_suffix=""):
+    r"""
+    Read the robot-generated output.xml file in one streaming pass (see
+    iter_output_xml_tests) and write the same .csv file as parse_output_xml.
+    Return a tuple consisting of the path of the .csv file (or "" if none was
+    written) and the report which parse_output_xml would have printed.
+
+    The .csv rows are spooled to a temporary file as the tests are read
+    because the driver and platform which are part of each row may not be
+    known until the end of the output.xml file.
+
+    Description of argument(s):
+    xml_file_path                   The path to a Robot-generated output.xml
+                                    file.
+    csv_dir_path                    The path to the directory that is to
+                                    contain the .csv files generated by
+                                    this function.
+    version_id                      Version of the openbmc firmware
+                                    (e.g. "v2.1-215-g6e7eacb").
+    platform                        Platform of the openbmc system.
+    level                           Release level of the OpenBMC system
+                                    (e.g. "Master").
+    test_phase                      Name of the testing phase (e.g. "FVT").
+    processor                       Name of the processor (e.g. "P9").
+    subsystem                       Name of the subsystem (e.g. "OPENBMC").
+    csv_file_suffix                 A string to be appended to the base name
+                                    of the .csv file.  This keeps the names of
+                                    .csv files generated at the same time
+                                    distinct.
+    """
+
+    report = []
+    run_info = {}
+    total_passed = 0
+    total_failed = 0
+    with tempfile.TemporaryFile('w+', newline='') as spool_file:
+        spool_writer = csv.writer(spool_file, lineterminator='\n')
+        for test in iter_output_xml_tests(xml_file_path, run_info):
+            # Test Result pass=0 fail=1
+            if test['status'] == 'PASS':
+                total_passed += 1
+                l_test_result = 0
+            else:
+                total_failed += 1
+                l_test_result = 1
+            # Functional Area: Suite Name
+            l_func_area = test['suite'].split(' ', 1)[-1]
+            spool_writer.writerow([test['start_time'], test['end_time'], l_test_result, test['name'],
+                                   l_func_area])
+
+        report.append("--------------------------------------")
+        report.append("Total Test Count:\t %d" % (total_passed + total_failed))
+        report.append("Total Test Failed:\t %d" % total_failed)
+        report.append("Total Test Passed:\t %d" % total_passed)
+        report.append("Test Start Time:\t %s" % run_info['start_time'])
+        report.append("Test End Time:\t\t %s" % run_info['end_time'])
+        report.append("--------------------------------------")
+
+        l_pse_rel = 'Master'
+        if level:
+            l_pse_rel = level
+
+        if version_id and platform:
+            l_driver = version_id
+            l_platform_type = platform
+            report.append("BMC Version_id:%s" % version_id)
+            report.append("BMC Platform:%s" % platform)
+        else:
+            l_driver = str(run_info['bmc_version_id'])
+            l_platform_type = str(run_info['bmc_platform'])
+            report.append(sprint_vars(l_driver, l_platform_type).rstrip("\n"))
+
+        if not (l_driver and l_platform_type):
+            report.append("Both driver and system info need to be set.  CSV file is not generated.")
+            return "", "\n".join(report)
+        report.append("Driver and system info set.")
+
+        l_timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d-%H-%M-%S")
+        # Example: 2017-02-20-08-47-22_Witherspoon.csv
+        l_csvfile = csv_dir_path + l_timestamp + "_" + l_platform_type + csv_file_suffix + ".csv"
+        report.append("Writing data into csv file:%s" % l_csvfile)
+
+        spool_file.seek(0)
+        with open(l_csvfile, "w") as l_file:
+            l_writer = csv.writer(l_file, lineterminator='\n')
+            l_writer.writerow(['test_start', 'test_end', 'subsys', 'test_type',
+                               'test_result', 'test_name', 'pse_rel', 'driver',
+                               'env', 'proc', 'platform_type', 'test_func_area'])
+            for l_stime, l_etime, l_test_result, l_test_name, l_func_area in csv.reader(spool_file):
+                l_writer.writerow([l_stime, l_etime, subsystem, test_phase, l_test_result,
+                                   l_test_name, l_pse_rel, l_driver, 'HW', processor,
+                                   l_platform_type, l_func_area])
+
+    # Set file permissions 666.
+    perm = stat.S_IRUSR + stat.S_IWUSR + stat.S_IRGRP + stat.S_IWGRP + stat.S_IROTH + stat.S_IWOTH
+    os.chmod(l_csvfile, perm)
+    return l_csvfile, "\n".join(report)
+
+
+def stream_output_xml_files(xml_file_paths, csv_dir_path, version_id, platform, level,
+                            test_phase, processor, subsystem, max_workers=4):
+    r"""
+    Run stream_output_xml for each of the output.xml files, up to max_workers
+    of them at the same time in separate processes, and print each report.
+    Return the list of .csv files written.
+
+    Description of argument(s):
+    xml_file_paths                  A list of paths to Robot-generated
+                                    output.xml files.
+    max_workers                     The maximum number of worker processes.
+    See stream_output_xml for the other arguments.
+    """
+
+    args = (csv_dir_path, version_id, platform, level, test_phase, processor, subsystem)
+    if len(xml_file_paths) == 1:
+        results = [stream_output_xml(xml_file_paths[0], *args)]
+    else:
+        # The workers are forked since importing this program would run it.
+        with ProcessPoolExecutor(max_workers=max(int(max_workers), 1),
+                                 mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [executor.submit(stream_output_xml, xml_file_path, *args, "_" + str(ix))
+                       for ix, xml_file_path in enumerate(xml_file_paths)]
+            results = [future.result() for future in futures]
+
+    csv_file_paths = []
+    for xml_file_path, (csv_file_path, report) in zip(xml_file_paths, results):
+        print_var(xml_file_path)
+        print(report)
+        if csv_file_path:
+            csv_file_paths.append(csv_file_path)
+    return csv_file_paths
+
+
 def main():
 
     if not gen_get_options(parser, stock_list):
@@ -364,8 +605,19 @@ def main():
 
     qprint_pgm_header()
 
-    parse_output_xml(source, dest, version_id, platform, level,
-                     test_phase, processor)
+    if stream:
+        stream_output_xml_files(source, dest, version_id, platform, level,
+                                test_phase, processor, subsystem, max_workers)
+    else:
+        for ix, xml_file_path in enumerate(source):
+            # Files parsed within the same second would otherwise get the same
+            # .csv file name.
+            csv_file_suffix = "_" + str(ix) if len(source) > 1 else ""
+            if not parse_output_xml(xml_file_path, dest, version_id, platform,
+                                    level, test_phase, processor,
+                                    csv_file_suffix):
+                print_error("No .csv file was generated for "
+                            + xml_file_path + ".\n")
 
     return True
 